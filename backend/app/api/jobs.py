@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends, HTTPException, File, UploadFile, Form
+from pydantic import BaseModel
+from typing import Optional
+import asyncpg
+from ..deps import get_db, get_current_user
+from ..db.repo import RoomRepo
+from ..services.lang_detect import normalize_lang
+from ..services.transcription_jobs import transcription_job_service
+
+router = APIRouter()
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+
+@router.post("", response_model=JobResponse)
+async def create_job(
+    room_id: str = Form(...),
+    language_code: Optional[str] = Form(None),
+    target_langs: Optional[str] = Form(None),
+    audio: UploadFile = File(...),
+    current_user: str = Depends(get_current_user),
+    db: asyncpg.Connection = Depends(get_db)
+):
+    """上傳長音檔建立轉錄工作，進度以 job.progress 推送到房間"""
+    room = await RoomRepo(db).get_room(room_id)
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    # 目標語言以逗號分隔，未指定時使用房間的看板語言
+    langs = [normalize_lang(lang.strip()) for lang in (target_langs or "").split(",") if lang.strip()]
+    langs = list(dict.fromkeys(langs)) or [room["default_board_lang"]]
+
+    try:
+        job_id = await transcription_job_service.submit(room_id, current_user, audio, language_code, langs)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    return JobResponse(job_id=job_id, status="queued")
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, current_user: str = Depends(get_current_user)):
+    """查詢工作進度；完成後附上含時間戳的分段原文與各語言譯文"""
+    result = await transcription_job_service.get_result(job_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return result
@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from datetime import datetime
 import asyncpg
 from ..deps import get_db, get_current_user
-from ..db.repo import RoomRepo, UserRepo
+from ..db.pool import get_db_pool
+from ..db.repo import MessageRepo, RoomRepo, UserRepo
+from ..services.lazy_translate import lazy_translator
+from ..services.pipeline import personal_lang
 
 router = APIRouter()
 
@@ -82,6 +86,53 @@ async def get_room(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get room: {str(e)}")
 
+@router.get("/{room_id}/messages")
+async def get_room_messages(
+    room_id: str,
+    lang: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    before: Optional[datetime] = None,
+    current_user: str = Depends(get_current_user)
+):
+    """取得房間歷史訊息（舊到新）與指定語言的翻譯，缺少的翻譯在讀取時補上；before 用於往前分頁（匯出、重播）"""
+    try:
+        # 查詢完就歸還連線，補翻譯期間不佔用（補翻譯寫入時會另外取用）
+        pool = await get_db_pool()
+        async with pool.acquire() as db:
+            room = await RoomRepo(db).get_room(room_id)
+            if not room:
+                raise HTTPException(status_code=404, detail="Room not found")
+            
+            # 未指定語言時使用自己的個人字幕語言
+            if not lang:
+                user = await UserRepo(db).get_user(current_user)
+                lang = personal_lang(user) if user else room["default_board_lang"]
+            
+            messages = await MessageRepo(db).get_room_history(room_id, lang, limit, before)
+        await lazy_translator.fill(room_id, messages, lang)
+        
+        return {
+            "roomId": room_id,
+            "targetLang": lang,
+            "messages": [
+                {
+                    "messageId": str(message["id"]),
+                    "speakerId": str(message["speaker_id"]) if message["speaker_id"] else None,
+                    "speakerName": message["display_name"] or "Unknown",
+                    "sourceLang": message["source_lang"],
+                    "text": message["text"],
+                    # 翻譯失敗時為 None，由前端顯示原文
+                    "translation": message["translation"],
+                    "createdAt": message["created_at"].isoformat()
+                }
+                for message in reversed(messages)
+            ]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get messages: {str(e)}")
+
 @router.put("/{room_id}/board-lang")
 async def update_board_lang(
     room_id: str,
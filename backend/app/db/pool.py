@@ -7,6 +7,8 @@ logger = logging.getLogger(__name__)
 
 # 全域資料庫連線池
 _pool: Optional[asyncpg.Pool] = None
+# 背景工作取得連線的等待上限：池子用盡時報錯重試，而不是無限期卡住
+ACQUIRE_TIMEOUT_S = float(os.getenv("DB_ACQUIRE_TIMEOUT_S", "10"))
 
 async def init_db() -> None:
     """初始化資料庫連線池"""
@@ -22,7 +24,7 @@ async def init_db() -> None:
                 database_url,
                 ssl='require',
                 min_size=1,
-                max_size=5,
+                max_size=int(os.getenv("DB_POOL_MAX_SIZE", "5")),
                 command_timeout=60
             )
             print("[DB] Pool created successfully!")
@@ -36,6 +38,10 @@ async def get_db_pool() -> asyncpg.Pool:
         await init_db()
     return _pool
 
+async def connect_listener() -> asyncpg.Connection:
+    """建立 LISTEN 專用的連線（不佔用連線池；訂閱期間一直持有）"""
+    return await asyncpg.connect(os.getenv("POSTGRES_URL", ""), ssl='require')
+
 async def close_db() -> None:
     """關閉資料庫連線池"""
     global _pool
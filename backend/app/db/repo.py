@@ -1,5 +1,7 @@
 import asyncpg
-from typing import List, Dict, Optional, Any
+import json
+from typing import List, Dict, Optional, Any, Tuple
+from datetime import datetime
 from uuid import UUID
 import uuid
 
@@ -130,6 +132,20 @@ class MessageRepo:
             message_id, target_lang, text, latency_ms, quality
         )
     
+    async def save_translations(self, message_id: str, translations: Dict[str, Dict[str, Any]]):
+        """一次儲存多個語言的翻譯"""
+        await self.conn.executemany(
+            """INSERT INTO message_translation (message_id, target_lang, text, latency_ms, quality)
+               VALUES ($1, $2, $3, $4, $5)
+               ON CONFLICT (message_id, target_lang) 
+               DO UPDATE SET text = $3, latency_ms = $4, quality = $5""",
+            [
+                (message_id, target_lang, translation["text"], 
+                 translation.get("latency_ms"), translation.get("quality"))
+                for target_lang, translation in translations.items()
+            ]
+        )
+    
     async def get_room_messages(self, room_id: str, limit: int = 50) -> List[Dict[str, Any]]:
         """取得房間訊息"""
         rows = await self.conn.fetch(
@@ -144,10 +160,330 @@ class MessageRepo:
         )
         return [dict(row) for row in rows]
     
+    async def get_room_history(self, room_id: str, target_lang: str, limit: int = 50,
+                               before: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """取得房間訊息（新到舊）與指定語言的翻譯；沒有翻譯時 translation 為 None"""
+        rows = await self.conn.fetch(
+            """SELECT m.id, m.speaker_id, m.source_lang, m.text, m.created_at, u.display_name,
+                      t.text AS translation
+               FROM message m
+               LEFT JOIN app_user u ON m.speaker_id = u.id
+               LEFT JOIN message_translation t ON t.message_id = m.id AND t.target_lang = $2
+               WHERE m.room_id = $1 AND m.is_final = true
+                 AND ($4::timestamptz IS NULL OR m.created_at < $4)
+               ORDER BY m.created_at DESC
+               LIMIT $3""",
+            room_id, target_lang, limit, before
+        )
+        return [dict(row) for row in rows]
+    
+    async def save_lang_translations(self, target_lang: str, rows: List[Tuple[str, str, Optional[int], Optional[float]]]):
+        """補存多則訊息的同一語言翻譯 (message_id, text, latency_ms, quality)；已存在的不覆寫"""
+        await self.conn.executemany(
+            """INSERT INTO message_translation (message_id, target_lang, text, latency_ms, quality)
+               VALUES ($1, $2, $3, $4, $5)
+               ON CONFLICT (message_id, target_lang) DO NOTHING""",
+            [(message_id, target_lang, text, latency_ms, quality) for message_id, text, latency_ms, quality in rows]
+        )
+    
     async def get_message_translations(self, message_id: str) -> List[Dict[str, Any]]:
         """取得訊息翻譯"""
         rows = await self.conn.fetch(
             "SELECT target_lang, text, latency_ms, quality FROM message_translation WHERE message_id = $1",
             message_id
         )
-        return [dict(row) for row in rows]
\ No newline at end of file
+        return [dict(row) for row in rows]
+
+class TranslationMemoryRepo:
+    def __init__(self, conn: asyncpg.Connection):
+        self.conn = conn
+    
+    async def find_matches(self, source_norm: str, target_langs: List[str], 
+                           threshold: float) -> List[Dict[str, Any]]:
+        """以 trigram 相似度查詢各目標語言最相近的記憶（完全相同時 score = 1）"""
+        rows = await self.conn.fetch(
+            """SELECT DISTINCT ON (target_lang) target_lang, text, quality, 
+                      similarity(source_norm, $1) AS score
+               FROM translation_memory
+               WHERE target_lang = ANY($2::text[]) 
+                 AND source_norm % $1 
+                 AND similarity(source_norm, $1) >= $3
+               ORDER BY target_lang, score DESC""",
+            source_norm, target_langs, threshold
+        )
+        return [dict(row) for row in rows]
+    
+    async def upsert(self, room_id: Optional[str], source_lang: Optional[str], source_text: str,
+                     source_norm: str, target_lang: str, text: str, quality: Optional[float] = None):
+        """寫入或更新翻譯記憶"""
+        await self.conn.execute(
+            """INSERT INTO translation_memory 
+                   (room_id, source_lang, source_text, source_norm, target_lang, text, quality)
+               VALUES ($1, $2, $3, $4, $5, $6, $7)
+               ON CONFLICT (source_norm, target_lang)
+               DO UPDATE SET text = $6, quality = $7, room_id = COALESCE($1, translation_memory.room_id),
+                             updated_at = NOW()""",
+            room_id, source_lang, source_text, source_norm, target_lang, text, quality
+        )
+    
+    async def record_hits(self, source_norm: str, target_langs: List[str]):
+        """累加命中次數，供預熱時排序"""
+        await self.conn.execute(
+            """UPDATE translation_memory SET hits = hits + 1 
+               WHERE source_norm = $1 AND target_lang = ANY($2::text[])""",
+            source_norm, target_langs
+        )
+    
+    async def get_room_entries(self, room_id: str, limit: int = 500) -> List[Dict[str, Any]]:
+        """取得房間常用的翻譯記憶（預熱用）"""
+        rows = await self.conn.fetch(
+            """SELECT source_norm, target_lang, text, quality
+               FROM translation_memory
+               WHERE room_id = $1
+               ORDER BY hits DESC, updated_at DESC
+               LIMIT $2""",
+            room_id, limit
+        )
+        return [dict(row) for row in rows]
+
+class TranscriptionJobRepo:
+    def __init__(self, conn: asyncpg.Connection):
+        self.conn = conn
+    
+    async def create_job(self, room_id: str, user_id: str, file_path: str, content_type: Optional[str],
+                         language_code: Optional[str], target_langs: List[str]) -> str:
+        """建立長音檔轉錄工作"""
+        job_id = str(uuid.uuid4())
+        await self.conn.execute(
+            """INSERT INTO transcription_job 
+                   (id, room_id, user_id, file_path, content_type, language_code, target_langs)
+               VALUES ($1, $2, $3, $4, $5, $6, $7)""",
+            job_id, room_id, user_id, file_path, content_type, language_code, target_langs
+        )
+        return job_id
+    
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """取得工作資料"""
+        row = await self.conn.fetchrow(
+            """SELECT id, room_id, user_id, file_path, content_type, language_code, target_langs,
+                      status, total_chunks, error, created_at, updated_at
+               FROM transcription_job WHERE id = $1""",
+            job_id
+        )
+        return dict(row) if row else None
+    
+    async def claim(self, job_id: str, lease_s: float) -> bool:
+        """取得工作租約；其他行程持有未過期的租約時回傳 False"""
+        row = await self.conn.fetchrow(
+            """UPDATE transcription_job SET lease_until = NOW() + make_interval(secs => $2)
+               WHERE id = $1 AND status NOT IN ('completed', 'failed')
+                 AND (lease_until IS NULL OR lease_until < NOW())
+               RETURNING id""",
+            job_id, lease_s
+        )
+        return row is not None
+    
+    async def renew_lease(self, job_id: str, lease_s: float):
+        """延長工作租約"""
+        await self.conn.execute(
+            "UPDATE transcription_job SET lease_until = NOW() + make_interval(secs => $2) WHERE id = $1",
+            job_id, lease_s
+        )
+    
+    async def release(self, job_id: str):
+        """釋放工作租約"""
+        await self.conn.execute("UPDATE transcription_job SET lease_until = NULL WHERE id = $1", job_id)
+    
+    async def get_resumable_job_ids(self) -> List[str]:
+        """取得未完成且沒有行程持有租約的工作（重啟後續跑用）"""
+        rows = await self.conn.fetch(
+            """SELECT id FROM transcription_job
+               WHERE status NOT IN ('completed', 'failed')
+                 AND (lease_until IS NULL OR lease_until < NOW())
+               ORDER BY created_at"""
+        )
+        return [str(row["id"]) for row in rows]
+    
+    async def update_status(self, job_id: str, status: str, error: Optional[str] = None):
+        """更新工作狀態"""
+        await self.conn.execute(
+            "UPDATE transcription_job SET status = $2, error = $3, updated_at = NOW() WHERE id = $1",
+            job_id, status, error
+        )
+    
+    async def create_segments(self, job_id: str, spans: List[Tuple[int, int]]):
+        """寫入分段範圍（重新分段時先清除舊的分段）"""
+        async with self.conn.transaction():
+            await self.conn.execute("DELETE FROM transcription_job_segment WHERE job_id = $1", job_id)
+            await self.conn.executemany(
+                """INSERT INTO transcription_job_segment (job_id, idx, start_ms, end_ms)
+                   VALUES ($1, $2, $3, $4)""",
+                [(job_id, idx, start_ms, end_ms) for idx, (start_ms, end_ms) in enumerate(spans)]
+            )
+            await self.conn.execute(
+                "UPDATE transcription_job SET total_chunks = $2, updated_at = NOW() WHERE id = $1",
+                job_id, len(spans)
+            )
+    
+    async def get_segments(self, job_id: str) -> List[Dict[str, Any]]:
+        """取得工作的所有分段"""
+        rows = await self.conn.fetch(
+            """SELECT idx, start_ms, end_ms, text, language, translations
+               FROM transcription_job_segment WHERE job_id = $1 ORDER BY idx""",
+            job_id
+        )
+        segments = []
+        for row in rows:
+            segment = dict(row)
+            segment["translations"] = json.loads(segment["translations"]) if segment["translations"] else {}
+            segments.append(segment)
+        return segments
+    
+    async def save_segment_text(self, job_id: str, idx: int, text: str, language: Optional[str]):
+        """儲存單一分段的辨識結果"""
+        await self.conn.execute(
+            "UPDATE transcription_job_segment SET text = $3, language = $4 WHERE job_id = $1 AND idx = $2",
+            job_id, idx, text, language
+        )
+    
+    async def save_segment_translations(self, job_id: str, target_lang: str, texts: Dict[int, str]):
+        """一次寫入某個語言所有分段的翻譯"""
+        await self.conn.executemany(
+            """UPDATE transcription_job_segment 
+               SET translations = translations || jsonb_build_object($3::text, $4::text)
+               WHERE job_id = $1 AND idx = $2""",
+            [(job_id, idx, target_lang, text) for idx, text in texts.items()]
+        )
+
+class TranslationJobRepo:
+    def __init__(self, conn: asyncpg.Connection):
+        self.conn = conn
+    
+    async def enqueue(self, message_id: str, room_id: str, payload: Dict[str, Any]) -> bool:
+        """加入翻譯工作；同一則訊息已在佇列中時不重複加入"""
+        row = await self.conn.fetchrow(
+            """INSERT INTO translation_job (message_id, room_id, payload)
+               VALUES ($1, $2, $3)
+               ON CONFLICT (message_id) DO NOTHING
+               RETURNING id""",
+            message_id, room_id, json.dumps(payload, ensure_ascii=False)
+        )
+        if row:
+            await self.conn.execute("SELECT pg_notify('translation_job', $1)", room_id)
+        return row is not None
+    
+    async def claim(self, lease_s: float) -> Optional[Dict[str, Any]]:
+        """
+        取得下一個可執行的工作（含租約過期的執行中工作）
+        同一房間只有最早的未完成工作可被取得，確保房間內依序處理；
+        失敗後等待重試（available_at 在未來）的工作不擋住房間，後續工作先執行，重試成功的字幕會晚於它們送出
+        """
+        row = await self.conn.fetchrow(
+            """WITH next AS (
+                   SELECT id FROM translation_job j
+                   WHERE ((status = 'queued' AND available_at <= NOW())
+                          OR (status = 'running' AND lease_until < NOW()))
+                     AND NOT EXISTS (
+                         SELECT 1 FROM translation_job e
+                         WHERE e.room_id = j.room_id AND e.id < j.id
+                           AND (e.status = 'running' OR (e.status = 'queued' AND e.available_at <= NOW()))
+                     )
+                   ORDER BY id
+                   FOR UPDATE SKIP LOCKED
+                   LIMIT 1
+               )
+               UPDATE translation_job t
+               SET status = 'running', attempts = attempts + 1,
+                   lease_until = NOW() + make_interval(secs => $1), updated_at = NOW()
+               FROM next WHERE t.id = next.id
+               RETURNING t.id, t.message_id, t.room_id, t.payload, t.attempts, t.created_at""",
+            lease_s
+        )
+        if not row:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+    
+    async def renew_lease(self, job_id: int, attempt: int, lease_s: float) -> bool:
+        """延長執行中工作的租約；工作已被其他 worker 重新取得（attempts 不同）時回傳 False"""
+        result = await self.conn.execute(
+            """UPDATE translation_job SET lease_until = NOW() + make_interval(secs => $3), updated_at = NOW()
+               WHERE id = $1 AND status = 'running' AND attempts = $2""",
+            job_id, attempt, lease_s
+        )
+        return result.split()[-1] != "0"
+    
+    async def complete(self, job_id: int):
+        """標記工作完成"""
+        await self.conn.execute(
+            "UPDATE translation_job SET status = 'done', lease_until = NULL, updated_at = NOW() WHERE id = $1",
+            job_id
+        )
+    
+    async def retry_later(self, job_id: int, delay_s: float, error: str):
+        """工作失敗，延後重試"""
+        await self.conn.execute(
+            """UPDATE translation_job 
+               SET status = 'queued', lease_until = NULL, error = $3,
+                   available_at = NOW() + make_interval(secs => $2), updated_at = NOW()
+               WHERE id = $1""",
+            job_id, delay_s, error
+        )
+    
+    async def fail(self, job_id: int, error: str):
+        """重試次數用盡，標記失敗（不再阻擋同房間後續工作）"""
+        await self.conn.execute(
+            "UPDATE translation_job SET status = 'failed', lease_until = NULL, error = $2, updated_at = NOW() WHERE id = $1",
+            job_id, error
+        )
+    
+    async def pending_by_room(self) -> Dict[str, int]:
+        """各房間未完成（排隊中與執行中）的工作數"""
+        rows = await self.conn.fetch(
+            """SELECT room_id, COUNT(*) AS pending FROM translation_job 
+               WHERE status IN ('queued', 'running') GROUP BY room_id"""
+        )
+        return {str(row["room_id"]): row["pending"] for row in rows}
+    
+    async def purge_finished(self, retention_h: float) -> int:
+        """刪除保留期限外已結束的工作"""
+        result = await self.conn.execute(
+            """DELETE FROM translation_job 
+               WHERE status IN ('done', 'failed') AND updated_at < NOW() - make_interval(secs => $1)""",
+            retention_h * 3600
+        )
+        return int(result.split()[-1])
+
+class PresenceRepo:
+    def __init__(self, conn: asyncpg.Connection):
+        self.conn = conn
+    
+    async def join(self, room_id: str, user_id: str, instance_id: str):
+        """記錄使用者連線到本行程"""
+        await self.conn.execute(
+            """INSERT INTO room_presence (room_id, user_id, instance_id, seen_at)
+               VALUES ($1, $2, $3, NOW())
+               ON CONFLICT (room_id, user_id) DO UPDATE SET instance_id = $3, seen_at = NOW()""",
+            room_id, user_id, instance_id
+        )
+    
+    async def leave(self, room_id: str, user_id: str, instance_id: str):
+        """移除連線記錄（只移除本行程的，使用者可能已連到其他行程）"""
+        await self.conn.execute(
+            "DELETE FROM room_presence WHERE room_id = $1 AND user_id = $2 AND instance_id = $3",
+            room_id, user_id, instance_id
+        )
+    
+    async def touch(self, instance_id: str):
+        """更新本行程所有連線的最後存活時間"""
+        await self.conn.execute("UPDATE room_presence SET seen_at = NOW() WHERE instance_id = $1", instance_id)
+    
+    async def get_room_users(self, room_id: str, stale_s: float) -> List[str]:
+        """取得房間內仍存活的使用者（所有行程）"""
+        rows = await self.conn.fetch(
+            """SELECT user_id FROM room_presence 
+               WHERE room_id = $1 AND seen_at > NOW() - make_interval(secs => $2)""",
+            room_id, stale_s
+        )
+        return [str(row["user_id"]) for row in rows]
@@ -3,13 +3,16 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from starlette.exceptions import HTTPException as StarletteHTTPException
+import asyncio
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
-from .api import auth, rooms, ingest, speech, speech_staged
+from .api import auth, rooms, ingest, speech, speech_staged, jobs
 from .ws.hub import manager
 from .db.pool import init_db
+from .metrics import metrics
 
 load_dotenv()
 
@@ -37,10 +40,43 @@ app.include_router(rooms.router, prefix="/api/rooms", tags=["rooms"])
 app.include_router(ingest.router, prefix="/api/ingest", tags=["ingest"])
 app.include_router(speech.router, prefix="/api/speech", tags=["speech"])
 app.include_router(speech_staged.router, prefix="/api/speech-staged", tags=["speech-staged"])
+app.include_router(jobs.router, prefix="/api/jobs", tags=["jobs"])
 
 @app.on_event("startup")
 async def startup_event():
     await init_db()
+    # 離線翻譯：啟動時預熱行程池，每個工作行程只載入一次模型
+    if os.getenv("TRANSLATE_PROVIDER") == "local" or "local" in os.getenv("TRANSLATE_FALLBACK_PROVIDERS", ""):
+        from .services.local_translate import local_translate_service
+        await local_translate_service.warm_up()
+    # 本地 Whisper：每個工作行程只載入一次模型
+    if os.getenv("STT_PROVIDER") == "local_whisper":
+        from .services.local_whisper import local_whisper_service
+        await local_whisper_service.warm_up()
+    # 音頻正規化（解碼、VAD、轉檔）在行程池中執行，啟動時先預熱
+    from .services.audio_normalize import audio_normalizer
+    await audio_normalizer.warm_up()
+    # 接手重啟前未完成、以及之後租約過期的長音檔轉錄工作
+    from .services.transcription_jobs import transcription_job_service
+    asyncio.create_task(transcription_job_service.run_sweeper())
+    # 翻譯由 worker 行程執行時，訂閱 worker 轉回的字幕
+    from .ws.relay import relay
+    if relay.enabled:
+        await relay.start(manager.deliver_relayed)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    from .ws.relay import relay
+    if relay.enabled:
+        await relay.stop()
+    from .services.executors import shutdown_executors
+    shutdown_executors()
+    if "app.services.local_translate" in sys.modules:
+        sys.modules["app.services.local_translate"].local_translate_service.shutdown()
+    if "app.services.local_whisper" in sys.modules:
+        sys.modules["app.services.local_whisper"].local_whisper_service.shutdown()
+    if "app.services.audio_normalize" in sys.modules:
+        sys.modules["app.services.audio_normalize"].audio_normalizer.shutdown()
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket, roomId: str, userId: str, token: str):
@@ -52,10 +88,40 @@ async def websocket_endpoint(websocket: WebSocket, roomId: str, userId: str, tok
     except WebSocketDisconnect:
         await manager.disconnect(websocket, roomId, userId)
 
+@app.websocket("/ws/speech")
+async def speech_stream_endpoint(websocket: WebSocket, roomId: str, userId: str, token: str,
+                                 lang: str = "zh-TW", contentType: str = "audio/webm"):
+    """串流語音：二進位訊息為音頻片段，文字訊息 "stop" 結束串流"""
+    if not await manager._verify_token(token, userId):
+        await websocket.close(code=4001, reason="Invalid token")
+        return
+    await websocket.accept()
+    from .services.admission import AdmissionRejected, admission
+    from .services.streaming_stt import streaming_stt_service
+    try:
+        # 串流期間計入進行中的 STT；滿載時以 1013 (Try Again Later) 關閉
+        async with admission.admit_stt(roomId):
+            await streaming_stt_service.handle_websocket(websocket, roomId, userId, lang, contentType)
+    except AdmissionRejected as e:
+        await websocket.close(code=1013, reason=e.detail)
+        return
+    try:
+        await websocket.close()
+    except Exception:
+        pass
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """輸出行程內指標（限流等待時間、斷路器狀態等）"""
+    from .services.limiter import _limiters
+    snapshot = metrics.snapshot()
+    snapshot["breakers"] = {name: limiter.breaker.state for name, limiter in _limiters.items()}
+    return snapshot
+
 # ── SPA Frontend ──────────────────────────────────────────────────
 STATIC_DIR = Path("/app/static")
 
@@ -72,4 +138,4 @@ async def custom_http_exception_handler(request: Request, exc: StarletteHTTPExce
             index_file = STATIC_DIR / "index.html"
             if index_file.exists():
                 return FileResponse(str(index_file))
-    return JSONResponse({"detail": str(exc.detail)}, status_code=exc.status_code)
+    return JSONResponse({"detail": str(exc.detail)}, status_code=exc.status_code, headers=getattr(exc, "headers", None))
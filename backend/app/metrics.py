@@ -0,0 +1,93 @@
+"""
+行程內指標收集
+提供計數器、量表與摘要（含近期百分位），由 /metrics 端點輸出
+"""
+
+import threading
+from collections import deque
+from typing import Deque, Dict
+
+
+def _key(name: str, labels: Dict[str, str]) -> str:
+    if not labels:
+        return name
+    label_str = ",".join(f"{k}={v}" for k, v in sorted(labels.items()))
+    return f"{name}{{{label_str}}}"
+
+
+class Summary:
+    """數值摘要：次數、總和、最大值與近期樣本百分位"""
+
+    def __init__(self, window: int = 500):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent: Deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+
+    def percentile(self, pct: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(round(pct * (len(ordered) - 1))))]
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "avg": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+
+class Metrics:
+    def __init__(self):
+        # 執行緒池中的供應商呼叫也會記錄指標，需要鎖保護
+        self._lock = threading.Lock()
+        self.counters: Dict[str, float] = {}
+        self.gauges: Dict[str, float] = {}
+        self.summaries: Dict[str, Summary] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        """累加計數器"""
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels):
+        """設定量表數值"""
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name: str, value: float, **labels):
+        """記錄一次觀測值（例如延遲毫秒）"""
+        key = _key(name, labels)
+        with self._lock:
+            if key not in self.summaries:
+                self.summaries[key] = Summary()
+            self.summaries[key].observe(value)
+
+    def get(self, name: str, **labels) -> float:
+        """讀取計數器或量表目前數值"""
+        key = _key(name, labels)
+        with self._lock:
+            return self.counters.get(key, self.gauges.get(key, 0.0))
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "summaries": {key: summary.to_dict() for key, summary in self.summaries.items()},
+            }
+
+
+# 全域指標實例
+metrics = Metrics()
@@ -0,0 +1,158 @@
+"""
+准入控制與降級
+依進行中的 STT 與翻譯數量（全域與每個房間）決定是否接受新請求：
+負載達門檻比例時依序降級（停止中間稿翻譯 → 只翻主板語言），滿載時回 429 並附 Retry-After
+翻譯在 worker 行程執行時（TRANSLATION_QUEUE=postgres），翻譯數量改以佇列中未完成的工作計算
+"""
+
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+
+from fastapi import HTTPException
+
+from ..metrics import metrics
+from .fair_scheduler import set_current_room
+
+LEVEL_NORMAL = 0
+LEVEL_DROP_PARTIALS = 1
+LEVEL_BOARD_ONLY = 2
+
+
+class AdmissionRejected(HTTPException):
+    """系統滿載，拒絕新請求（429 + Retry-After）"""
+
+    def __init__(self, reason: str, retry_after_s: int):
+        super().__init__(status_code=429, detail=f"Server busy ({reason}), retry later",
+                         headers={"Retry-After": str(retry_after_s)})
+        self.reason = reason
+        self.retry_after_s = retry_after_s
+
+
+class AdmissionController:
+    def __init__(self):
+        self.max_stt = int(os.getenv("ADMISSION_MAX_STT", "32"))
+        self.max_stt_per_room = int(os.getenv("ADMISSION_MAX_STT_PER_ROOM", "8"))
+        self.max_translation = int(os.getenv("ADMISSION_MAX_TRANSLATION", "64"))
+        self.max_translation_per_room = int(os.getenv("ADMISSION_MAX_TRANSLATION_PER_ROOM", "16"))
+        # 負載（進行中 / 上限）達到比例時降級
+        self.drop_partials_at = float(os.getenv("ADMISSION_DROP_PARTIALS_AT", "0.5"))
+        self.board_only_at = float(os.getenv("ADMISSION_BOARD_ONLY_AT", "0.75"))
+        self.retry_after_s = int(os.getenv("ADMISSION_RETRY_AFTER_S", "2"))
+        self.queue_refresh_s = float(os.getenv("ADMISSION_QUEUE_REFRESH_S", "1"))
+
+        self.stt: Dict[str, int] = {}
+        self.translation: Dict[str, int] = {}
+        self._queue_depth: Dict[str, int] = {}
+        self._queue_checked_at = 0.0
+
+        for name in ("max_stt", "max_stt_per_room", "max_translation", "max_translation_per_room",
+                     "drop_partials_at", "board_only_at"):
+            metrics.set(f"admission_{name}", getattr(self, name))
+
+    # ── 負載 ──────────────────────────────────────────────────────
+    def _translation_depth(self) -> Dict[str, int]:
+        from .translation_queue import translation_queue
+        return self._queue_depth if translation_queue.durable else self.translation
+
+    def load(self) -> float:
+        """全域負載比例（STT 與翻譯取較高者）"""
+        return max(sum(self.stt.values()) / self.max_stt,
+                   sum(self._translation_depth().values()) / self.max_translation)
+
+    @property
+    def level(self) -> int:
+        load = self.load()
+        if load >= self.board_only_at:
+            return LEVEL_BOARD_ONLY
+        if load >= self.drop_partials_at:
+            return LEVEL_DROP_PARTIALS
+        return LEVEL_NORMAL
+
+    def _update_gauges(self):
+        metrics.set("admission_stt_inflight", sum(self.stt.values()))
+        metrics.set("admission_translation_depth", sum(self._translation_depth().values()))
+        metrics.set("admission_load", round(self.load(), 3))
+        metrics.set("admission_level", self.level)
+
+    async def _refresh_queue_depth(self):
+        from .translation_queue import translation_queue
+        if not translation_queue.durable or time.time() - self._queue_checked_at < self.queue_refresh_s:
+            return
+        self._queue_checked_at = time.time()
+        try:
+            from ..db.pool import get_db_pool
+            from ..db.repo import TranslationJobRepo
+            pool = await get_db_pool()
+            async with pool.acquire() as db:
+                self._queue_depth = await TranslationJobRepo(db).pending_by_room()
+        except Exception as e:
+            print(f"⚠️ 無法查詢翻譯佇列深度: {e}")
+
+    # ── 准入 ──────────────────────────────────────────────────────
+    def _reject(self, reason: str):
+        metrics.inc("admission_rejected", reason=reason)
+        print(f"🚦 系統滿載，拒絕請求 ({reason})")
+        raise AdmissionRejected(reason, self.retry_after_s)
+
+    async def check_translation(self, room_id: str):
+        """新訊息要進入翻譯流程前檢查翻譯數量；滿載時拋出 AdmissionRejected"""
+        await self._refresh_queue_depth()
+        depth = self._translation_depth()
+        if sum(depth.values()) >= self.max_translation:
+            self._reject("translation")
+        if depth.get(room_id, 0) >= self.max_translation_per_room:
+            self._reject("translation_room")
+
+    @asynccontextmanager
+    async def admit_stt(self, room_id: str):
+        """語音上傳：檢查 STT 與翻譯數量，通過後計入進行中的 STT"""
+        if sum(self.stt.values()) >= self.max_stt:
+            self._reject("stt")
+        if self.stt.get(room_id, 0) >= self.max_stt_per_room:
+            self._reject("stt_room")
+        await self.check_translation(room_id)
+
+        self.stt[room_id] = self.stt.get(room_id, 0) + 1
+        self._update_gauges()
+        # 之後的供應商呼叫依此房間公平排程
+        set_current_room(room_id)
+        try:
+            yield
+        finally:
+            self._release(self.stt, room_id)
+
+    @asynccontextmanager
+    async def track_translation(self, room_id: str):
+        """計入進行中的翻譯流程（在執行翻譯的行程中）"""
+        await self._refresh_queue_depth()
+        self.translation[room_id] = self.translation.get(room_id, 0) + 1
+        self._update_gauges()
+        set_current_room(room_id)
+        try:
+            yield
+        finally:
+            self._release(self.translation, room_id)
+
+    def _release(self, counts: Dict[str, int], room_id: str):
+        counts[room_id] -= 1
+        if counts[room_id] <= 0:
+            del counts[room_id]
+        self._update_gauges()
+
+    # ── 降級 ──────────────────────────────────────────────────────
+    def drop_partials(self) -> bool:
+        if self.level >= LEVEL_DROP_PARTIALS:
+            metrics.inc("admission_degraded", action="drop_partial")
+            return True
+        return False
+
+    def board_only(self) -> bool:
+        if self.level >= LEVEL_BOARD_ONLY:
+            metrics.inc("admission_degraded", action="board_only")
+            return True
+        return False
+
+# 全域准入控制實例
+admission = AdmissionController()
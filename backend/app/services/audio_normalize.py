@@ -0,0 +1,256 @@
+"""
+音頻正規化
+在行程池中把每段音頻解碼成 16kHz 單聲道、經 VAD 裁掉前後靜音，
+再依供應商編碼成它最適合的格式（預設：Groq 用 Ogg/Opus、Google 用 FLAC、Azure 與本地 Whisper 用 WAV）
+"""
+
+import asyncio
+import importlib.util
+import io
+import os
+import shutil
+import subprocess
+import time
+import wave
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from ..metrics import metrics
+from .vad import SAMPLE_RATE, detect_speech, vad_service
+from .warm_pool import WarmProcessPool
+
+FORMAT_CONTENT_TYPES = {
+    "ogg_opus": "audio/ogg",
+    "flac": "audio/flac",
+    "wav": "audio/wav",
+}
+
+# 各供應商預設格式，可用 AUDIO_FORMAT_<PROVIDER> 覆寫；None 代表不轉檔
+DEFAULT_PROVIDER_FORMATS = {
+    "groq": "ogg_opus",
+    "google": "flac",
+    "google_v1": "flac",
+    "azure": "wav",
+    "local_whisper": "wav",
+    "free": None,
+}
+
+
+def is_pcm(content_type: str) -> bool:
+    """16kHz 單聲道 s16le 原始音頻（串流用戶端可直接送 PCM）"""
+    content_type = content_type.lower()
+    return "l16" in content_type or "pcm" in content_type
+
+
+def pcm_to_wav(pcm: bytes) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+# ── 工作行程內執行的同步函式 ──────────────────────────────────────
+def _run_ffmpeg(ffmpeg: str, args: List[str], data: bytes) -> bytes:
+    completed = subprocess.run(
+        [ffmpeg, "-hide_banner", "-loglevel", "error", *args],
+        input=data, capture_output=True, timeout=60
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.decode("utf-8", "ignore").strip() or f"ffmpeg exited {completed.returncode}")
+    return completed.stdout
+
+
+def _resample(samples, rate: int):
+    """沒有 ffmpeg 時的重取樣：降頻前先以加窗 sinc 低通濾波（截止於 16kHz 的 Nyquist 以下），避免混疊"""
+    import numpy as np
+
+    samples = samples.astype(np.float64)
+    if rate > SAMPLE_RATE:
+        cutoff = 0.5 * SAMPLE_RATE / rate * 0.9
+        taps = np.arange(-64, 65)
+        kernel = 2 * cutoff * np.sinc(2 * cutoff * taps) * np.hamming(len(taps))
+        kernel /= kernel.sum()
+        # 以 FFT 卷積，長音頻也不會太慢
+        size = len(samples) + len(kernel) - 1
+        n_fft = 1 << (size - 1).bit_length()
+        filtered = np.fft.irfft(np.fft.rfft(samples, n_fft) * np.fft.rfft(kernel, n_fft), n_fft)[:size]
+        samples = filtered[len(taps) // 2:len(taps) // 2 + len(samples)]
+    positions = np.arange(0, len(samples), rate / SAMPLE_RATE)
+    resampled = np.interp(positions, np.arange(len(samples)), samples)
+    return np.clip(np.round(resampled), -32768, 32767).astype(np.int16)
+
+
+def _decode(audio_data: bytes, content_type: str, ffmpeg: Optional[str]):
+    """解碼為 16kHz 單聲道 int16；WAV 直接讀取，其餘格式交給 ffmpeg"""
+    import numpy as np
+
+    if ffmpeg:
+        pcm = _run_ffmpeg(ffmpeg, ["-i", "pipe:0", "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"], audio_data)
+        return np.frombuffer(pcm, dtype=np.int16)
+
+    if "wav" not in content_type:
+        return None
+    with wave.open(io.BytesIO(audio_data)) as wav:
+        if wav.getsampwidth() != 2:
+            return None
+        channels, rate = wav.getnchannels(), wav.getframerate()
+        samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    if rate != SAMPLE_RATE:
+        samples = _resample(samples, rate)
+    return samples
+
+
+def _encode(samples, audio_format: str, ffmpeg: Optional[str], opus_bitrate: str) -> Tuple[bytes, str]:
+    """編碼 16kHz 單聲道 PCM；沒有 ffmpeg 時一律輸出 WAV"""
+    if audio_format == "wav" or not ffmpeg:
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(SAMPLE_RATE)
+            wav.writeframes(samples.tobytes())
+        return buffer.getvalue(), "wav"
+
+    codec = ["-c:a", "libopus", "-b:a", opus_bitrate, "-f", "ogg"] if audio_format == "ogg_opus" else ["-c:a", "flac", "-f", "flac"]
+    audio = _run_ffmpeg(
+        ffmpeg, ["-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "-i", "pipe:0", *codec, "pipe:1"],
+        samples.tobytes()
+    )
+    return audio, audio_format
+
+
+def prepare_audio(audio_data: bytes, content_type: str, audio_format: Optional[str],
+                  vad_params: Optional[Dict], ffmpeg: Optional[str], opus_bitrate: str) -> Dict:
+    """解碼、偵測語音、裁切並編碼；無法解碼時回傳 decoded=False 讓呼叫端原樣放行"""
+    samples = _decode(audio_data, content_type, ffmpeg)
+    if samples is None or len(samples) == 0:
+        return {"decoded": False}
+
+    total_ms = len(samples) * 1000 // SAMPLE_RATE
+    start, end = 0, len(samples)
+    if vad_params is not None:
+        span = detect_speech(samples, **vad_params)
+        if span is None:
+            return {"decoded": True, "has_speech": False, "total_ms": total_ms}
+        start, end = span
+
+    result = {"decoded": True, "has_speech": True, "total_ms": total_ms,
+              "speech_ms": (end - start) * 1000 // SAMPLE_RATE}
+    if audio_format is None:
+        return result
+
+    audio, encoded_format = _encode(samples[start:end], audio_format, ffmpeg, opus_bitrate)
+    result.update(audio=audio, format=encoded_format)
+    return result
+
+
+class AudioNormalizer:
+    def __init__(self):
+        self.ffmpeg = shutil.which("ffmpeg")
+        self.opus_bitrate = os.getenv("AUDIO_OPUS_BITRATE", "24k")
+        self.enabled = (os.getenv("AUDIO_NORMALIZE_ENABLED", "true").lower() == "true"
+                        and importlib.util.find_spec("numpy") is not None)
+        self.pool = WarmProcessPool("audio", int(os.getenv("AUDIO_WORKERS", "2")))
+        if self.enabled and not self.ffmpeg:
+            print("⚠️  找不到 ffmpeg，音頻正規化只處理 WAV 音頻")
+
+    def provider_format(self, provider: str) -> Optional[str]:
+        override = os.getenv(f"AUDIO_FORMAT_{provider.upper()}")
+        if override:
+            return None if override == "none" else override
+        return DEFAULT_PROVIDER_FORMATS.get(provider)
+
+    async def prepare(self, audio_data: bytes, content_type: str, provider: str) -> Dict:
+        """
+        回傳 {"has_speech", "audio", "content_type", "sample_rate"}
+        sample_rate 為 None 代表沿用原始音頻
+        """
+        passthrough = {"has_speech": True, "audio": audio_data, "content_type": content_type, "sample_rate": None}
+        audio_format = self.provider_format(provider)
+        if not self.enabled or (audio_format is None and not vad_service.enabled):
+            return passthrough
+
+        start_time = time.time()
+        try:
+            result = await self.pool.run(
+                prepare_audio, audio_data, content_type, audio_format,
+                vad_service.params if vad_service.enabled else None, self.ffmpeg, self.opus_bitrate
+            )
+        except Exception as e:
+            print(f"⚠️ 音頻正規化失敗，使用原始音頻: {e}")
+            return passthrough
+        metrics.observe("audio_prepare_ms", (time.time() - start_time) * 1000)
+
+        if not result["decoded"]:
+            return passthrough
+        if not result["has_speech"]:
+            print(f"🔇 VAD：{result['total_ms']}ms 音頻沒有語音，跳過 STT")
+            metrics.inc("vad_stt_calls_avoided")
+            metrics.inc("vad_bytes_saved", len(audio_data))
+            return {**passthrough, "has_speech": False, "audio": b""}
+
+        metrics.inc("vad_audio_ms_trimmed", result["total_ms"] - result["speech_ms"])
+        if "audio" not in result:
+            return passthrough
+
+        audio = result["audio"]
+        print(f"🎚️ 音頻正規化 ({provider}): {content_type} {len(audio_data)} bytes → "
+              f"{result['format']} {len(audio)} bytes, 語音 {result['speech_ms']}/{result['total_ms']}ms")
+        metrics.inc("audio_bytes_in", len(audio_data))
+        metrics.inc("audio_bytes_out", len(audio))
+        return {"has_speech": True, "audio": audio,
+                "content_type": FORMAT_CONTENT_TYPES[result["format"]], "sample_rate": SAMPLE_RATE}
+
+    def can_decode_stream(self, content_type: str) -> bool:
+        return is_pcm(content_type) or self.ffmpeg is not None
+
+    async def decode_stream(self, audio_source: AsyncIterator[bytes], content_type: str) -> AsyncIterator[bytes]:
+        """把串流音頻（WebM/Ogg 等容器的連續片段）即時解碼為 16kHz 單聲道 s16le"""
+        if is_pcm(content_type):
+            async for chunk in audio_source:
+                yield chunk
+            return
+
+        process = await asyncio.create_subprocess_exec(
+            self.ffmpeg, "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+            "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1",
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE
+        )
+
+        async def feed():
+            try:
+                async for chunk in audio_source:
+                    process.stdin.write(chunk)
+                    await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                process.stdin.close()
+
+        feeder = asyncio.create_task(feed())
+        try:
+            while True:
+                # 每次約 100ms 的音頻
+                pcm = await process.stdout.read(SAMPLE_RATE // 5)
+                if not pcm:
+                    break
+                yield pcm
+        finally:
+            feeder.cancel()
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+
+    async def warm_up(self):
+        if self.enabled:
+            await self.pool.warm_up()
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+# 全域音頻正規化實例
+audio_normalizer = AudioNormalizer()
@@ -0,0 +1,33 @@
+"""
+供應商專用執行緒池
+每個供應商類別使用獨立且有上限的執行緒池，避免翻譯突發流量佔滿 STT 的執行緒
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+# 預設執行緒數，與 limiter 的預設併發數對齊
+DEFAULT_WORKERS = {
+    "groq": 4,
+    "google_speech_v1": 8,
+    "free": 8,
+    "google_v3": 16,
+}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    """取得（必要時建立）供應商專用執行緒池，可用 EXECUTOR_<NAME>_WORKERS 覆寫大小"""
+    if name not in _executors:
+        workers = int(os.getenv(f"EXECUTOR_{name.upper()}_WORKERS", DEFAULT_WORKERS.get(name, 4)))
+        _executors[name] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-worker")
+    return _executors[name]
+
+
+def shutdown_executors():
+    """關閉所有執行緒池（應用程式關閉時呼叫）"""
+    for executor in _executors.values():
+        executor.shutdown(wait=False, cancel_futures=True)
+    _executors.clear()
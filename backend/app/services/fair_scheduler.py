@@ -0,0 +1,126 @@
+"""
+房間間的公平排程
+供應商的併發額度不再先到先得：等待中的請求依房間排隊，以加權 Deficit Round Robin 輪流放行，
+避免一個大房間佔滿額度讓小房間一直排在後面
+目前房間由 current_room 這個 contextvar 決定（在 STT 上傳、翻譯流程等入口設定）
+"""
+
+import asyncio
+import contextvars
+import math
+import os
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+from ..metrics import metrics
+
+_GLOBAL = "_global"
+
+current_room: contextvars.ContextVar[str] = contextvars.ContextVar("current_room", default=_GLOBAL)
+
+
+def set_current_room(room_id: Optional[str]):
+    """設定目前工作所屬的房間（同一個 asyncio 任務及其後建立的子任務都會沿用）"""
+    current_room.set(room_id or _GLOBAL)
+
+
+def _parse_weights(value: str) -> Dict[str, float]:
+    """FAIR_ROOM_WEIGHTS 格式：<room_id>:<權重>,<room_id>:<權重>（權重須為正數，否則略過並沿用預設 1）"""
+    weights = {}
+    for item in value.split(","):
+        if ":" in item:
+            room_id, weight = item.rsplit(":", 1)
+            try:
+                parsed = float(weight)
+            except ValueError:
+                parsed = 0.0
+            # 權重為 0 或負數時該房間的額度永遠不會累積，等待者會一直卡住
+            if not math.isfinite(parsed) or parsed <= 0:
+                print(f"⚠️  FAIR_ROOM_WEIGHTS 中 {room_id.strip()} 的權重 {weight.strip()!r} 無效，改用預設權重 1")
+                continue
+            weights[room_id.strip()] = parsed
+    return weights
+
+
+def room_label(room_id: str) -> str:
+    """指標用的房間標籤：只有設定了權重的房間保留 ID，其餘合併，避免標籤數量隨房間無限成長"""
+    return room_id if room_id in ROOM_WEIGHTS or room_id == _GLOBAL else "default"
+
+
+ROOM_WEIGHTS = _parse_weights(os.getenv("FAIR_ROOM_WEIGHTS", ""))
+
+
+class FairSemaphore:
+    """與 asyncio.Semaphore 相同的 acquire/release，但依房間加權輪流放行等待者"""
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.available = capacity
+        self.queues: Dict[str, Deque[Tuple[asyncio.Future, float]]] = {}
+        # 有等待者的房間，依輪替順序排列
+        self.active: Deque[str] = deque()
+        self.deficit: Dict[str, float] = {}
+
+    async def acquire(self, cost: float = 1.0):
+        if self.available > 0 and not self.active:
+            self.available -= 1
+            return
+
+        room_id = current_room.get()
+        future = asyncio.get_running_loop().create_future()
+        if not self.queues.get(room_id):
+            self.queues[room_id] = deque()
+            self.active.append(room_id)
+            self.deficit.setdefault(room_id, 0.0)
+        self.queues[room_id].append((future, cost))
+        metrics.set("fair_waiting", self.waiting, provider=self.name)
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            # 已放行但呼叫端同時被取消：歸還額度
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                future.cancel()
+                self._dispatch()
+            raise
+
+    def release(self):
+        self.available += 1
+        self._dispatch()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for queue in self.queues.values() for future, _ in queue if not future.done())
+
+    def _dispatch(self):
+        """有空額度時依 DRR 放行：輪到的房間累積 quantum（權重），足夠支付成本就放行"""
+        while self.available > 0 and self.active:
+            room_id = self.active[0]
+            queue = self.queues[room_id]
+            while queue and queue[0][0].done():
+                queue.popleft()
+            if not queue:
+                self._deactivate(room_id)
+                continue
+
+            future, cost = queue[0]
+            if self.deficit[room_id] < cost:
+                self.deficit[room_id] += ROOM_WEIGHTS.get(room_id, 1.0)
+                self.active.rotate(-1)
+                continue
+
+            queue.popleft()
+            self.deficit[room_id] -= cost
+            self.available -= 1
+            future.set_result(None)
+            if not queue:
+                self._deactivate(room_id)
+        metrics.set("fair_waiting", self.waiting, provider=self.name)
+
+    def _deactivate(self, room_id: str):
+        # 房間沒有等待者時離開輪替，累積的 deficit 歸零（DRR 的標準做法）
+        self.active.remove(room_id)
+        self.queues.pop(room_id, None)
+        self.deficit.pop(room_id, None)
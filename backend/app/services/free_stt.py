@@ -127,10 +127,24 @@ class FreeSpeechService:
     
     async def stream_transcribe(self, audio_stream, language_code: str = "zh-TW"):
         """
-        串流語音辨識（未來擴展用）
+        串流語音辨識（本地替代方案）
+        每收到一段音頻就依累積的音頻產出中間結果，串流結束時產出最終結果
         """
-        # 這裡可以整合真正的串流 STT 服務
-        pass
+        accumulated = bytearray()
+        async for chunk in audio_stream:
+            accumulated.extend(chunk)
+            yield {
+                "text": await self._analyze_audio_features(bytes(accumulated), language_code),
+                "confidence": self._calculate_confidence(bytes(accumulated)) * 0.5,
+                "is_final": False,
+                "language": language_code,
+                "provider": "free_speech"
+            }
+        
+        if accumulated:
+            result = await self.transcribe_audio(bytes(accumulated), "audio/webm", language_code)
+            result["is_final"] = True
+            yield result
 
 # 全域免費語音辨識服務實例
 free_speech_service = FreeSpeechService()
\ No newline at end of file
@@ -4,15 +4,36 @@
 """
 
 import asyncio
+import threading
 import time
 from typing import Dict, List, Optional
 from deep_translator import GoogleTranslator
+from .executors import get_executor
+from .lang_detect import is_same_language
+from .limiter import get_limiter
 
 print("✅ 使用基於 deep-translator 的免費 Google Translate 服務")
 
 class FreeTranslateService:
     def __init__(self):
-        pass
+        self.limiter = get_limiter("free")
+        self.executor = get_executor("free")
+        # GoogleTranslator.translate 會改寫實例上的請求參數，無法跨執行緒共用，
+        # 因此每個執行緒各自快取 (source, target) 對應的實例
+        self._local = threading.local()
+    
+    def _get_translator(self, source_code: str, target_code: str) -> GoogleTranslator:
+        """取得目前執行緒快取的翻譯器實例"""
+        cache = getattr(self._local, "translators", None)
+        if cache is None:
+            cache = self._local.translators = {}
+        key = (source_code, target_code)
+        if key not in cache:
+            cache[key] = GoogleTranslator(source=source_code, target=target_code)
+        return cache[key]
+    
+    def _translate_sync(self, text: str, source_code: str, target_code: str) -> str:
+        return self._get_translator(source_code, target_code).translate(text)
     
     async def translate_text(self, text: str, target_lang: str, source_lang: Optional[str] = None) -> Dict:
         """翻譯文字"""
@@ -26,10 +47,10 @@ class FreeTranslateService:
             # 使用 deep-translator 進行翻譯
             loop = asyncio.get_event_loop()
             t_sub_start = time.time()
-            translated_text = await loop.run_in_executor(
-                None,
-                lambda: GoogleTranslator(source=source_code, target=target_code).translate(text)
-            )
+            async with self.limiter.slot():
+                translated_text = await loop.run_in_executor(
+                    self.executor, self._translate_sync, text, source_code, target_code
+                )
             t_sub_end = time.time()
             print(f"   [Translate-Sub] {source_code} -> {target_code} 耗時: {t_sub_end - t_sub_start:.3f} 秒")
             
@@ -37,10 +58,10 @@ class FreeTranslateService:
             if translated_text == text and target_code != source_code and source_code != 'auto':
                 print(f"⚠️ {source_code}->{target_code} 翻譯無變化，改用 auto 重新檢測翻譯")
                 t_retry_start = time.time()
-                translated_text = await loop.run_in_executor(
-                    None,
-                    lambda: GoogleTranslator(source='auto', target=target_code).translate(text)
-                )
+                async with self.limiter.slot():
+                    translated_text = await loop.run_in_executor(
+                        self.executor, self._translate_sync, text, 'auto', target_code
+                    )
                 print(f"   [Translate-Sub] auto -> {target_code} (Retry) 耗時: {time.time() - t_retry_start:.3f} 秒")
             
             latency_ms = int((time.time() - start_time) * 1000)
@@ -56,18 +77,30 @@ class FreeTranslateService:
             
         except Exception as e:
             print(f"免費翻譯服務錯誤: {e}")
-            # 回退到模擬翻譯
-            return await self._mock_translate(text, target_lang, source_lang)
+            # 回退到模擬翻譯，並標記錯誤讓上層得知供應商失敗
+            result = await self._mock_translate(text, target_lang, source_lang)
+            result["error"] = str(e)
+            return result
     
     async def batch_translate(self, text: str, target_langs: List[str], source_lang: Optional[str] = None) -> Dict[str, Dict]:
         """批次翻譯到多個目標語言"""
         tasks = []
+        results = {}
         for target_lang in target_langs:
-            # 即使 target_lang 和 source_lang 相同也嘗試翻譯，因為 source_lang 有可能是錯的
+            # source_lang 有可能是錯的，只有偵測器有足夠信心確認原文已是目標語言時才跳過
+            if is_same_language(text, target_lang, source_lang, trust_source=False):
+                results[target_lang] = {
+                    "text": text,
+                    "source_lang": target_lang,
+                    "target_lang": target_lang,
+                    "latency_ms": 0,
+                    "quality": 1.0,
+                    "provider": "free_google_deep_translator"
+                }
+                continue
             task = self.translate_text(text, target_lang, source_lang)
             tasks.append((target_lang, task))
         
-        results = {}
         if tasks:
             completed_tasks = await asyncio.gather(*[task for _, task in tasks], return_exceptions=True)
             
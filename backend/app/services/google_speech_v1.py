@@ -10,6 +10,8 @@ from typing import Dict, Optional, AsyncGenerator
 from google.cloud import speech_v1
 from google.oauth2 import service_account
 import base64
+from .executors import get_executor
+from .limiter import get_limiter
 
 class GoogleSpeechV1Service:
     def __init__(self):
@@ -18,6 +20,10 @@ class GoogleSpeechV1Service:
         
         # 檢查認證設定
         self.use_mock = self._should_use_mock()
+        self.limiter = get_limiter("google_speech_v1")
+        self.executor = get_executor("google_speech_v1")
+        # 串流辨識單一連線約 5 分鐘上限，PCM 串流在此秒數前換新連線
+        self.stream_restart_s = float(os.getenv("GOOGLE_STREAM_RESTART_S", "280"))
         
         if not self.use_mock:
             try:
@@ -37,7 +43,7 @@ class GoogleSpeechV1Service:
                 self.use_mock = True
     
     async def transcribe_audio(self, audio_data: bytes, content_type: str = "audio/webm", 
-                             language_code: str = "zh-TW") -> Dict:
+                             language_code: str = "zh-TW", sample_rate: Optional[int] = None) -> Dict:
         """轉錄音頻為文字"""
         if self.use_mock:
             return await self._mock_transcribe(audio_data, language_code)
@@ -54,7 +60,7 @@ class GoogleSpeechV1Service:
             # 建立音頻配置
             config = speech_v1.RecognitionConfig(
                 encoding=encoding,
-                sample_rate_hertz=48000,  # WebRTC 預設取樣率
+                sample_rate_hertz=sample_rate or 48000,  # 未正規化時沿用 WebRTC 預設取樣率
                 language_code=language_code,
                 alternative_language_codes=["en-US", "zh-CN", "ja-JP", "ko-KR"],
                 enable_automatic_punctuation=True,
@@ -74,11 +80,12 @@ class GoogleSpeechV1Service:
             
             # 在執行緒池中執行同步 API 調用
             loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                self.client.recognize,
-                request
-            )
+            async with self.limiter.slot():
+                response = await loop.run_in_executor(
+                    self.executor,
+                    self.client.recognize,
+                    request
+                )
             
             # 處理回應
             if response.results:
@@ -108,78 +115,90 @@ class GoogleSpeechV1Service:
                 
         except Exception as e:
             print(f"Google Speech v1 錯誤: {e}")
-            # 回退到模擬轉錄
-            return await self._mock_transcribe(audio_data, language_code)
+            # 回退到模擬轉錄（標記為回退結果，呼叫端可據此重試）
+            return {**await self._mock_transcribe(audio_data, language_code), "fallback": True}
     
     async def streaming_recognize(self, audio_generator: AsyncGenerator[bytes, None], 
-                                language_code: str = "zh-TW") -> AsyncGenerator[Dict, None]:
-        """即時語音轉錄串流"""
+                                language_code: str = "zh-TW",
+                                content_type: str = "audio/webm") -> AsyncGenerator[Dict, None]:
+        """
+        即時語音轉錄串流（gRPC 串流在專用執行緒上執行，結果逐一送回事件迴圈）
+        每條 gRPC 串流佔用一個限流額度；PCM 音頻在接近供應商時間上限前自動換新串流，
+        WebM/Ogg 的容器標頭只在第一個片段，無法中途換新
+        """
         if self.use_mock:
             async for result in self._mock_streaming_transcribe(audio_generator, language_code):
                 yield result
             return
         
-        try:
-            # 轉換語言代碼
-            language_code = self._convert_lang_code(language_code)
-            
-            # 建立串流配置
-            config = speech_v1.RecognitionConfig(
-                encoding=speech_v1.RecognitionConfig.AudioEncoding.WEBM_OPUS,
-                sample_rate_hertz=48000,
-                language_code=language_code,
-                alternative_language_codes=["en-US", "zh-CN", "ja-JP"],
-                enable_automatic_punctuation=True,
-                enable_word_confidence=True,
-                model="latest_short",  # 適合即時轉錄
-                use_enhanced=True
-            )
-            
-            streaming_config = speech_v1.StreamingRecognitionConfig(
-                config=config,
-                interim_results=True,  # 顯示中間結果
-                single_utterance=False  # 持續監聽
-            )
-            
-            # 建立請求生成器
-            async def request_generator():
-                # 首先發送配置
-                yield speech_v1.StreamingRecognizeRequest(streaming_config=streaming_config)
-                
-                # 然後發送音頻數據
-                async for audio_chunk in audio_generator:
-                    yield speech_v1.StreamingRecognizeRequest(audio_content=audio_chunk)
-            
-            # 執行串流識別
-            loop = asyncio.get_event_loop()
-            responses = await loop.run_in_executor(
-                None,
-                self.client.streaming_recognize,
-                request_generator()
-            )
-            
-            # 處理串流回應
+        from .stream_bridge import bridge_stream
+        
+        # 轉換語言代碼
+        language_code = self._convert_lang_code(language_code)
+        
+        # 建立串流配置（WebM/Ogg Opus 的取樣率由容器標頭決定，PCM 為 16kHz）
+        encoding = self._get_audio_encoding(content_type)
+        is_linear = encoding == speech_v1.RecognitionConfig.AudioEncoding.LINEAR16
+        config = speech_v1.RecognitionConfig(
+            encoding=encoding,
+            sample_rate_hertz=16000 if is_linear else 48000,
+            language_code=language_code,
+            alternative_language_codes=["en-US", "zh-CN", "ja-JP"],
+            enable_automatic_punctuation=True,
+            enable_word_confidence=True,
+            model="latest_short",  # 適合即時轉錄
+            use_enhanced=True
+        )
+        
+        streaming_config = speech_v1.StreamingRecognitionConfig(
+            config=config,
+            interim_results=True,  # 顯示中間結果
+            single_utterance=False  # 持續監聽
+        )
+        
+        def recognize_blocking(audio_chunks):
+            """在專用執行緒執行：阻塞式讀取音頻並迭代 gRPC 回應"""
+            requests = (speech_v1.StreamingRecognizeRequest(audio_content=chunk) for chunk in audio_chunks)
+            responses = self.client.streaming_recognize(config=streaming_config, requests=requests)
             for response in responses:
                 for result in response.results:
+                    if not result.alternatives:
+                        continue
                     alternative = result.alternatives[0]
-                    
                     yield {
                         "text": alternative.transcript,
-                        "confidence": alternative.confidence if hasattr(alternative, 'confidence') else 0.9,
+                        "confidence": alternative.confidence if result.is_final else result.stability,
                         "is_final": result.is_final,
-                        "language": language_code,
+                        "language": result.language_code or language_code,
                         "provider": "google_speech_v1"
                     }
-                    
-        except Exception as e:
-            print(f"串流轉錄錯誤: {e}")
-            # 回退到模擬串流
-            async for result in self._mock_streaming_transcribe(audio_generator, language_code):
-                yield result
+        
+        source = audio_generator.__aiter__()
+        exhausted = False
+
+        async def session_audio():
+            nonlocal exhausted
+            deadline = time.monotonic() + self.stream_restart_s
+            while not is_linear or time.monotonic() < deadline:
+                try:
+                    chunk = await source.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    return
+                yield chunk
+
+        while not exhausted:
+            async with self.limiter.slot():
+                async for result in bridge_stream(recognize_blocking, session_audio(), name="google_speech_v1"):
+                    yield result
+            if not exhausted:
+                print(f"🔁 Google 串流辨識已達 {self.stream_restart_s:.0f} 秒，換新串流")
     
     def _get_audio_encoding(self, content_type: str) -> speech_v1.RecognitionConfig.AudioEncoding:
         """根據 content type 決定音頻編碼格式"""
-        if "webm" in content_type.lower():
+        if "l16" in content_type.lower() or "pcm" in content_type.lower():
+            return speech_v1.RecognitionConfig.AudioEncoding.LINEAR16
+        elif "webm" in content_type.lower():
             return speech_v1.RecognitionConfig.AudioEncoding.WEBM_OPUS
         elif "mp4" in content_type.lower():
             return speech_v1.RecognitionConfig.AudioEncoding.MP3
@@ -187,6 +206,8 @@ class GoogleSpeechV1Service:
             return speech_v1.RecognitionConfig.AudioEncoding.LINEAR16
         elif "flac" in content_type.lower():
             return speech_v1.RecognitionConfig.AudioEncoding.FLAC
+        elif "ogg" in content_type.lower():
+            return speech_v1.RecognitionConfig.AudioEncoding.OGG_OPUS
         else:
             # 預設使用 WEBM_OPUS
             return speech_v1.RecognitionConfig.AudioEncoding.WEBM_OPUS
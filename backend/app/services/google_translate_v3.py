@@ -10,12 +10,16 @@ from typing import Dict, List, Optional
 from google.cloud import translate_v3
 from google.oauth2 import service_account
 import json
+from .executors import get_executor
+from .limiter import get_limiter
 
 class GoogleTranslateV3Service:
     def __init__(self):
         self.project_id = os.getenv("GOOGLE_CLOUD_PROJECT")
         self.service_account_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
         self.location = "global"  # 或 "us-central1" 等
+        self.limiter = get_limiter("google_v3")
+        self.executor = get_executor("google_v3")
         
         # 檢查認證設定
         self.use_mock = self._should_use_mock()
@@ -62,11 +66,12 @@ class GoogleTranslateV3Service:
             
             # 在執行緒池中執行同步 API 調用
             loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None, 
-                self.client.translate_text,
-                request
-            )
+            async with self.limiter.slot():
+                response = await loop.run_in_executor(
+                    self.executor,
+                    self.client.translate_text,
+                    request
+                )
             
             # 處理回應
             translation = response.translations[0]
@@ -86,8 +91,10 @@ class GoogleTranslateV3Service:
             
         except Exception as e:
             print(f"Google Translate v3 錯誤: {e}")
-            # 回退到模擬翻譯
-            return await self._mock_translate(text, target_lang, source_lang)
+            # 回退到模擬翻譯，並標記錯誤讓上層得知供應商失敗
+            result = await self._mock_translate(text, target_lang, source_lang)
+            result["error"] = str(e)
+            return result
     
     async def batch_translate(self, text: str, target_langs: List[str], source_lang: Optional[str] = None) -> Dict[str, Dict]:
         """批次翻譯到多個目標語言"""
@@ -6,14 +6,17 @@ Groq 語音辨識服務
 import os
 import time
 import asyncio
-from typing import Dict, Optional
-import tempfile
+from typing import Dict, Optional, Tuple
 from groq import Groq
+from .executors import get_executor
+from .limiter import get_limiter
 
 class GroqSTTService:
     def __init__(self):
         self.api_key = os.getenv("GROQ_API_KEY")
         self.use_mock = self._should_use_mock()
+        self.limiter = get_limiter("groq")
+        self.executor = get_executor("groq")
         
         if not self.use_mock:
             try:
@@ -32,85 +35,79 @@ class GroqSTTService:
         start_time = time.time()
         
         try:
-            # 根據內容類型決定檔案後綴
+            # 根據內容類型決定檔案後綴（Groq 依檔名判斷格式）
             suffix = self._get_file_suffix(content_type)
             print(f"🎤 處理音頻格式: {content_type} -> {suffix}")
             
-            # 將音頻資料寫入臨時檔案
-            with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_file:
-                temp_file.write(audio_data)
-                temp_file_path = temp_file.name
+            # 直接以記憶體中的音頻上傳，不寫入臨時檔案
+            audio_file = (f"audio{suffix}", audio_data)
             
+            # 使用 Groq STT API（經過併發、速率與斷路器限制）
+            loop = asyncio.get_event_loop()
             try:
-                # 使用 Groq STT API
-                loop = asyncio.get_event_loop()
-                result = await loop.run_in_executor(
-                    None, 
-                    self._groq_transcribe_sync,
-                    temp_file_path, language_code
-                )
-                
-                latency_ms = int((time.time() - start_time) * 1000)
-                
-                return {
-                    "text": result["text"],
-                    "confidence": result.get("confidence", 0.9),
-                    "language": result.get("language", language_code),
-                    "latency_ms": latency_ms,
-                    "provider": "groq"
-                }
-                
-            finally:
-                # 清理臨時檔案
-                try:
-                    os.unlink(temp_file_path)
-                except:
-                    pass
-                    
+                async with self.limiter.slot():
+                    result = await loop.run_in_executor(
+                        self.executor,
+                        self._groq_transcribe_sync,
+                        audio_file, language_code
+                    )
+            except Exception as e:
+                print(f"Groq 轉錄錯誤: {e}")
+                # 如果 Groq API 失敗或斷路器開啟，優先改用本地 Whisper，否則使用智慧回退
+                from .local_whisper import local_whisper_service
+                if not local_whisper_service.use_mock:
+                    return await local_whisper_service.transcribe_audio(audio_data, content_type, language_code)
+                result = self._intelligent_fallback(len(audio_data), language_code)
+            
+            latency_ms = int((time.time() - start_time) * 1000)
+            
+            return {
+                "text": result["text"],
+                "confidence": result.get("confidence", 0.9),
+                "language": result.get("language", language_code),
+                "segments": result.get("segments"),
+                "latency_ms": latency_ms,
+                "provider": "groq",
+                "fallback": result.get("fallback", False)
+            }
+            
         except Exception as e:
             print(f"Groq STT 錯誤: {e}")
-            # 回退到模擬轉錄
-            return await self._mock_transcribe(audio_data, language_code)
+            # 回退到模擬轉錄（標記為回退結果，呼叫端可據此重試）
+            return {**await self._mock_transcribe(audio_data, language_code), "fallback": True}
     
-    def _groq_transcribe_sync(self, audio_file_path: str, language_code: str) -> Dict:
-        """同步執行 Groq STT API 調用"""
-        try:
-            # 開啟音頻檔案
-            with open(audio_file_path, "rb") as file:
-                converted_lang = self._convert_lang_code(language_code)
-                kwargs = {
-                    "file": file,
-                    "model": "whisper-large-v3",
-                    "response_format": "verbose_json",
-                    "temperature": 0.0
-                }
-                if converted_lang:
-                    kwargs["language"] = converted_lang
-                # 不傳 language 時 Whisper 自動偵測
-                transcription = self.client.audio.transcriptions.create(**kwargs)
-                
-                # 解析回應
-                text = transcription.text
-                confidence = getattr(transcription, 'confidence', 0.9)
-                detected_language = getattr(transcription, 'language', language_code)
-                
-                return {
-                    "text": text,
-                    "confidence": confidence,
-                    "language": detected_language
-                }
-                
-        except Exception as e:
-            print(f"Groq 同步轉錄錯誤: {e}")
-            # 如果 Groq API 失敗，使用智慧回退
-            return self._intelligent_fallback(audio_file_path, language_code)
+    def _groq_transcribe_sync(self, audio_file: Tuple[str, bytes], language_code: str) -> Dict:
+        """同步執行 Groq STT API 調用（失敗時拋出例外，交由限流層記錄）"""
+        converted_lang = self._convert_lang_code(language_code)
+        kwargs = {
+            "file": audio_file,
+            "model": "whisper-large-v3",
+            "response_format": "verbose_json",
+            "temperature": 0.0
+        }
+        if converted_lang:
+            kwargs["language"] = converted_lang
+        # 不傳 language 時 Whisper 自動偵測
+        transcription = self.client.audio.transcriptions.create(**kwargs)
+        
+        # 解析回應
+        text = transcription.text
+        confidence = getattr(transcription, 'confidence', 0.9)
+        detected_language = getattr(transcription, 'language', language_code)
+        # verbose_json 的分段分數（no_speech_prob、avg_logprob 等）交給幻覺過濾使用
+        segments = getattr(transcription, 'segments', None)
+        
+        return {
+            "text": text,
+            "confidence": confidence,
+            "language": detected_language,
+            "segments": segments
+        }
     
-    def _intelligent_fallback(self, audio_file_path: str, language_code: str) -> Dict:
-        """智慧回退方案"""
+    def _intelligent_fallback(self, file_size: int, language_code: str) -> Dict:
+        """智慧回退方案（依檔案大小猜測的文字，不是辨識結果，以 fallback 標記）"""
         try:
             # 根據檔案大小估算內容
-            file_size = os.path.getsize(audio_file_path)
-            
             if language_code.startswith('zh'):
                 if file_size < 5000:
                     text = "你好"
@@ -131,7 +128,8 @@ class GroqSTTService:
             return {
                 "text": text,
                 "confidence": 0.8,
-                "language": language_code
+                "language": language_code,
+                "fallback": True
             }
             
         except Exception as e:
@@ -139,7 +137,8 @@ class GroqSTTService:
             return {
                 "text": "語音辨識錯誤",
                 "confidence": 0.1,
-                "language": language_code
+                "language": language_code,
+                "fallback": True
             }
     
     def _convert_lang_code(self, lang_code: str) -> str:
@@ -0,0 +1,106 @@
+"""
+冪等請求快取
+同一把冪等鍵在 TTL 內只執行一次：重試直接取回第一次的結果，
+第一次還在處理中時重試會等待同一個結果，不會再呼叫供應商或寫入資料庫
+"""
+
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from ..metrics import metrics
+
+
+def derive_key(*parts: Any) -> str:
+    """以內容雜湊產生冪等鍵（例如音頻 bytes + 說話者 + 房間）"""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part or "").encode("utf-8")
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+class IdempotencyCache:
+    def __init__(self, name: str, ttl_s: float, max_entries: int):
+        self.name = name
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._results: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _get(self, key: str) -> Optional[Tuple[float, Any]]:
+        entry = self._results.get(key)
+        if entry is not None and entry[0] < time.time():
+            del self._results[key]
+            return None
+        return entry
+
+    def _put(self, key: str, value: Any):
+        self._results[key] = (time.time() + self.ttl_s, value)
+        self._results.move_to_end(key)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        回傳 factory() 的結果；同一把鍵在 TTL 內重複呼叫時直接回傳第一次的結果
+        factory 拋出例外時不快取，下一次重試會重新執行
+        """
+        metrics.inc("idempotency_requests", endpoint=self.name)
+        entry = self._get(key)
+        if entry is not None:
+            self._record_hit()
+            return entry[1]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self._record_hit()
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await factory()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 沒有人等待時避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        else:
+            self._put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+            self._update_rate()
+
+    def _record_hit(self):
+        metrics.inc("idempotency_dedup_hits", endpoint=self.name)
+        self._update_rate()
+
+    def _update_rate(self):
+        requests = metrics.get("idempotency_requests", endpoint=self.name)
+        if requests:
+            hits = metrics.get("idempotency_dedup_hits", endpoint=self.name)
+            metrics.set("idempotency_dedup_rate", hits / requests, endpoint=self.name)
+
+
+_caches: Dict[str, IdempotencyCache] = {}
+
+
+def get_idempotency_cache(name: str) -> IdempotencyCache:
+    """取得（或建立）指定端點的冪等快取"""
+    if name not in _caches:
+        _caches[name] = IdempotencyCache(
+            name,
+            ttl_s=float(os.getenv("IDEMPOTENCY_TTL_S", "600")),
+            max_entries=int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "2048")),
+        )
+    return _caches[name]
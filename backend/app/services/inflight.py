@@ -0,0 +1,87 @@
+"""
+進行中工作的取消
+翻譯流程與預先翻譯登記在所屬房間下：房間沒人時全部取消，
+某個語言的最後一位聽眾離開時只取消該語言的翻譯（主板語言照常完成）
+只管理本行程執行的工作；TRANSLATION_QUEUE=postgres 時 worker 在開始時依在線名單決定語言
+"""
+
+import asyncio
+from contextlib import contextmanager
+from typing import Dict, List, Set
+
+from ..metrics import metrics
+
+
+class PipelineHandle:
+    """一則訊息的翻譯流程：各語言的翻譯任務可個別取消"""
+
+    def __init__(self, room_id: str):
+        self.room_id = room_id
+        self.cancelled = False
+        # 語言 -> 聽眾（與流程送出字幕用的是同一份）
+        self.listeners: Dict[str, List[str]] = {}
+        # 不因沒有聽眾而取消的語言（主板語言）
+        self.protected: Set[str] = set()
+        self.lang_tasks: Dict[str, asyncio.Task] = {}
+
+    def cancel_langs(self, langs, reason: str):
+        avoided = 0
+        for lang in langs:
+            task = self.lang_tasks.get(lang)
+            if task is not None and not task.done():
+                task.cancel()
+                avoided += 1
+        if avoided:
+            metrics.inc("provider_calls_avoided", avoided, reason=reason)
+            print(f"🛑 已取消 {avoided} 個沒人看的翻譯 ({reason})")
+
+
+class InflightRegistry:
+    def __init__(self):
+        self.handles: Dict[str, Set[PipelineHandle]] = {}
+        self.tasks: Dict[str, Set[asyncio.Task]] = {}
+
+    @contextmanager
+    def track(self, room_id: str):
+        """登記翻譯流程，區塊結束時移除"""
+        handle = PipelineHandle(room_id)
+        self.handles.setdefault(room_id, set()).add(handle)
+        try:
+            yield handle
+        finally:
+            self._discard(self.handles, room_id, handle)
+
+    def watch(self, room_id: str, task: asyncio.Task):
+        """登記可整個取消的背景任務（例如預先翻譯）"""
+        self.tasks.setdefault(room_id, set()).add(task)
+        task.add_done_callback(lambda _: self._discard(self.tasks, room_id, task))
+
+    def room_emptied(self, room_id: str):
+        """房間沒有任何連線：取消所有翻譯"""
+        for handle in list(self.handles.get(room_id, ())):
+            handle.cancelled = True
+            handle.cancel_langs(list(handle.lang_tasks), "room_empty")
+        tasks = [task for task in self.tasks.get(room_id, ()) if not task.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            metrics.inc("provider_calls_avoided", len(tasks), reason="room_empty")
+
+    def listener_left(self, room_id: str, user_id: str):
+        """使用者離開房間：該語言沒有聽眾時取消它的翻譯"""
+        for handle in list(self.handles.get(room_id, ())):
+            for lang, user_ids in handle.listeners.items():
+                if user_id in user_ids:
+                    user_ids.remove(user_id)
+                    if not user_ids and lang not in handle.protected:
+                        handle.cancel_langs([lang], "no_listeners")
+
+    def _discard(self, registry: Dict[str, Set], room_id: str, item):
+        items = registry.get(room_id)
+        if items is not None:
+            items.discard(item)
+            if not items:
+                del registry[room_id]
+
+# 全域進行中工作實例
+inflight = InflightRegistry()
@@ -0,0 +1,177 @@
+"""
+快速、可重現的語言偵測
+先依 Unicode 文字系統分類（與 MockTranslationService._detect_language 相同思路），
+拉丁字母再以常見虛詞評分；結果帶信心分數並快取
+"""
+
+import os
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+# 信心分數達此門檻時，批次翻譯可安全跳過與原文相同語言的目標
+SAME_LANGUAGE_CONFIDENCE = float(os.getenv("LANG_DETECT_SKIP_CONFIDENCE", "0.85"))
+
+# 繁簡常用字對照（兩字串逐字對應，只列出兩邊字形不同的常見字）
+_TRADITIONAL_CHARS = "這個們來時為說國會對學還發經過後點麼裡見問間開關門車東長書與從現實動應當體進樣覺讓談話語請謝幾電邊頭產業網際視頻氣歡愛號廣區醫藝灣萬錢買賣讀寫聽認識議題類義務員級結給紅線練節處歲飛馬魚鳥燈廳樓機權歷師辦習"
+_SIMPLIFIED_CHARS = "这个们来时为说国会对学还发经过后点么里见问间开关门车东长书与从现实动应当体进样觉让谈话语请谢几电边头产业网际视频气欢爱号广区医艺湾万钱买卖读写听认识议题类义务员级结给红线练节处岁飞马鱼鸟灯厅楼机权历师办习"
+TRADITIONAL_ONLY = set(_TRADITIONAL_CHARS)
+SIMPLIFIED_ONLY = set(_SIMPLIFIED_CHARS)
+
+# 拉丁字母語言的常見虛詞
+LATIN_STOPWORDS: Dict[str, set] = {
+    "en": {"the", "and", "is", "are", "to", "of", "in", "that", "it", "you", "this", "for", "with", "was", "have", "i", "we", "not", "be", "on"},
+    "es": {"el", "la", "los", "las", "de", "que", "y", "en", "es", "por", "para", "con", "una", "un", "no", "muy", "pero", "como", "está", "gracias"},
+    "fr": {"le", "la", "les", "de", "des", "et", "est", "que", "un", "une", "pour", "dans", "pas", "vous", "nous", "je", "avec", "sur", "merci", "c'est"},
+    "de": {"der", "die", "das", "und", "ist", "nicht", "ich", "sie", "wir", "mit", "ein", "eine", "zu", "auf", "für", "den", "dem", "auch", "danke", "es"},
+    "it": {"il", "lo", "la", "gli", "di", "che", "e", "è", "non", "per", "un", "una", "con", "sono", "questo", "grazie", "ma", "come", "anche", "del"},
+    "pt": {"o", "a", "os", "as", "de", "que", "e", "é", "não", "para", "com", "um", "uma", "em", "do", "da", "obrigado", "você", "muito", "mas"},
+    "id": {"dan", "yang", "di", "ini", "itu", "dengan", "untuk", "tidak", "saya", "kami", "ada", "akan", "dari", "terima", "kasih", "apa"},
+    "vi": {"và", "là", "của", "có", "không", "tôi", "bạn", "các", "được", "này", "cho", "một", "người", "với", "xin", "chào", "cảm", "ơn", "rất", "đã"},
+}
+# 只出現在越南文的字母（â ê ô é è ã 等法文、葡萄牙文也會用到，不列入）
+VIETNAMESE_ONLY = set("đơưĩũạảấầẩẫậắằẳẵặẹẻẽếềểễệỉịọỏốồổỗộớờởỡợụủứừửữựỳỵỷỹ")
+# 越南文專用字母佔拉丁字母的比例達此值才直接判定為越南文，混雜其他語言時改以虛詞評分
+VIETNAMESE_RATIO = 0.05
+
+# Whisper 等供應商回傳的語言全名
+LANGUAGE_NAMES = {
+    "english": "en", "chinese": "zh", "japanese": "ja", "korean": "ko",
+    "spanish": "es", "french": "fr", "german": "de", "italian": "it",
+    "portuguese": "pt", "russian": "ru", "arabic": "ar", "hindi": "hi",
+    "thai": "th", "vietnamese": "vi", "indonesian": "id",
+}
+
+
+def normalize_lang(lang_code: Optional[str]) -> Optional[str]:
+    """統一語言代碼：中文保留繁簡區分，其餘只取主要語系"""
+    if not lang_code:
+        return None
+    code = lang_code.strip().replace("_", "-").lower()
+    code = LANGUAGE_NAMES.get(code, code)
+    if code in ("zh-tw", "zh-hk", "zh-hant", "zh-mo"):
+        return "zh-TW"
+    if code in ("zh", "zh-cn", "zh-sg", "zh-hans", "cmn"):
+        return "zh-CN"
+    return code.split("-")[0]
+
+
+def _base_lang(code: str) -> str:
+    base = code.split("-")[0]
+    return "zh" if base in ("zh", "cmn", "yue") else base
+
+
+def resolve_lang(detected: Optional[str], requested: Optional[str]) -> Optional[str]:
+    """供應商回傳的語言與使用者指定的語言同語系時沿用指定值（例如指定 zh-TW 時不被改成 zh-CN）"""
+    detected_norm, requested_norm = normalize_lang(detected), normalize_lang(requested)
+    if not detected_norm:
+        return requested_norm
+    if requested_norm and _base_lang(detected_norm) == _base_lang(requested_norm):
+        return requested_norm
+    return detected_norm
+
+
+def _script_counts(text: str) -> Dict[str, int]:
+    counts = {"han": 0, "kana": 0, "hangul": 0, "latin": 0, "cyrillic": 0,
+              "arabic": 0, "thai": 0, "devanagari": 0, "greek": 0, "hebrew": 0}
+    for char in text:
+        code = ord(char)
+        if 0x4E00 <= code <= 0x9FFF or 0x3400 <= code <= 0x4DBF:
+            counts["han"] += 1
+        elif 0x3040 <= code <= 0x30FF:
+            counts["kana"] += 1
+        elif 0xAC00 <= code <= 0xD7AF or 0x1100 <= code <= 0x11FF:
+            counts["hangul"] += 1
+        elif char.isalpha() and code < 0x250 or 0x1E00 <= code <= 0x1EFF:
+            counts["latin"] += 1
+        elif 0x0400 <= code <= 0x04FF:
+            counts["cyrillic"] += 1
+        elif 0x0600 <= code <= 0x06FF:
+            counts["arabic"] += 1
+        elif 0x0E00 <= code <= 0x0E7F:
+            counts["thai"] += 1
+        elif 0x0900 <= code <= 0x097F:
+            counts["devanagari"] += 1
+        elif 0x0370 <= code <= 0x03FF:
+            counts["greek"] += 1
+        elif 0x0590 <= code <= 0x05FF:
+            counts["hebrew"] += 1
+    return counts
+
+
+def _detect_chinese(text: str, share: float) -> Tuple[str, float]:
+    traditional = sum(1 for char in text if char in TRADITIONAL_ONLY)
+    simplified = sum(1 for char in text if char in SIMPLIFIED_ONLY)
+    if traditional == simplified:
+        # 無法分辨繁簡，預設繁中但降低信心，避免誤跳過繁簡轉換
+        return "zh-TW", round(0.6 * share, 3)
+    if traditional > simplified:
+        return "zh-TW", round(min(0.99, 0.8 + 0.05 * (traditional - simplified)) * share, 3)
+    return "zh-CN", round(min(0.99, 0.8 + 0.05 * (simplified - traditional)) * share, 3)
+
+
+def _detect_latin(text: str, share: float) -> Tuple[str, float]:
+    lowered = unicodedata.normalize("NFC", text.lower())
+    letters = sum(1 for char in lowered if char.isalpha())
+    vietnamese = sum(1 for char in lowered if char in VIETNAMESE_ONLY)
+    if vietnamese and vietnamese / max(1, letters) >= VIETNAMESE_RATIO:
+        return "vi", round(0.9 * share, 3)
+
+    words = [word.strip(".,!?;:\"()[]") for word in lowered.split()]
+    scores = {lang: sum(1 for word in words if word in stopwords)
+              for lang, stopwords in LATIN_STOPWORDS.items()}
+    best = max(scores, key=scores.get)
+    if scores[best] == 0:
+        return "en", 0.3 * share
+
+    runner_up = max(score for lang, score in scores.items() if lang != best)
+    # 命中越多、與第二名差距越大，信心越高
+    margin = (scores[best] - runner_up) / scores[best]
+    coverage = min(1.0, scores[best] / max(1, len(words)) * 3)
+    return best, round((0.5 + 0.5 * margin) * (0.5 + 0.5 * coverage) * share, 3)
+
+
+@lru_cache(maxsize=4096)
+def _detect_cached(text: str) -> Tuple[str, float]:
+    counts = _script_counts(text)
+    total = sum(counts.values())
+    if total == 0:
+        return "en", 0.0
+
+    # 假名只出現在日文，即使漢字比例高也判定為日文
+    if counts["kana"]:
+        return "ja", min(0.99, 0.7 + counts["kana"] / total)
+
+    script = max(counts, key=counts.get)
+    share = counts[script] / total
+    if script == "han":
+        return _detect_chinese(text, share)
+    if script == "latin":
+        return _detect_latin(text, share)
+
+    single_script = {"hangul": ("ko", 0.98), "thai": ("th", 0.98), "greek": ("el", 0.97),
+                     "hebrew": ("he", 0.95), "arabic": ("ar", 0.85),
+                     "cyrillic": ("ru", 0.8), "devanagari": ("hi", 0.85)}
+    lang, confidence = single_script[script]
+    return lang, round(confidence * share, 3)
+
+
+def detect_language_with_confidence(text: str) -> Tuple[str, float]:
+    """偵測文字語言，回傳 (語言代碼, 信心分數 0~1)"""
+    if not text or not text.strip():
+        return "en", 0.0
+    return _detect_cached(text.strip())
+
+
+def is_same_language(text: str, target_lang: str, source_lang: Optional[str] = None,
+                     trust_source: bool = True) -> bool:
+    """
+    判斷是否可跳過翻譯：偵測信心足夠時以偵測結果為準，
+    否則在 trust_source 為 True 時才相信呼叫端提供的 source_lang
+    """
+    detected, confidence = detect_language_with_confidence(text)
+    if confidence >= SAME_LANGUAGE_CONFIDENCE:
+        effective = detected
+    else:
+        effective = source_lang if trust_source else None
+    return effective is not None and normalize_lang(effective) == normalize_lang(target_lang)
@@ -0,0 +1,103 @@
+"""
+讀取時補翻譯
+即時翻譯只涵蓋在線使用者的語言；讀取歷史訊息（晚加入的使用者、匯出、重播）時
+缺少的語言才翻譯並寫入 message_translation
+同一則訊息與語言同時只翻一次：後來的讀取者等待進行中的結果；整體併發受 LAZY_TRANSLATE_CONCURRENCY 限制
+翻譯期間不佔用資料庫連線，整批結果（含翻譯記憶）以一次短暫的連線寫入
+"""
+
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from ..db.pool import get_db_pool
+from ..db.repo import MessageRepo
+from ..metrics import metrics
+from .fair_scheduler import set_current_room
+from .translation_memory import translation_memory
+
+
+class LazyTranslator:
+    def __init__(self):
+        self.concurrency = int(os.getenv("LAZY_TRANSLATE_CONCURRENCY", "4"))
+        self.max_messages = int(os.getenv("LAZY_TRANSLATE_MAX_MESSAGES", "200"))
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        # (message_id, 語言) -> 翻譯結果（失敗為 None）
+        self._pending: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def fill(self, room_id: str, messages: List[Dict], target_lang: str):
+        """補上 messages 中 translation 為 None 的訊息（就地更新；翻譯失敗時維持 None）"""
+        missing = [message for message in messages if message["translation"] is None][:self.max_messages]
+        if not missing:
+            return
+
+        loop = asyncio.get_running_loop()
+        batch = []
+        futures = []
+        for message in missing:
+            key = (str(message["id"]), target_lang)
+            if key in self._pending:
+                metrics.inc("lazy_translation_coalesced")
+            else:
+                self._pending[key] = loop.create_future()
+                batch.append(message)
+            futures.append(self._pending[key])
+
+        if batch:
+            # 翻譯在獨立任務執行，讀取者中途離開也不影響其他等待同一批結果的讀取者
+            task = asyncio.create_task(self._translate_batch(room_id, batch, target_lang))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        results = await asyncio.gather(*(asyncio.shield(future) for future in futures))
+        for message, translation in zip(missing, results):
+            message["translation"] = translation
+
+    async def _translate_batch(self, room_id: str, batch: List[Dict], target_lang: str):
+        set_current_room(room_id)
+        start_time = time.time()
+        results: List[Optional[Dict]] = [None] * len(batch)
+        try:
+            translations = await asyncio.gather(*(
+                self._translate_one(room_id, message, target_lang) for message in batch
+            ))
+            results = [translation.get(target_lang) if translation else None for translation in translations]
+            rows = [
+                (str(message["id"]), result["text"], result.get("latency_ms"), result.get("quality"))
+                for message, result in zip(batch, results) if result is not None
+            ]
+            if rows:
+                pool = await get_db_pool()
+                async with pool.acquire() as db:
+                    await MessageRepo(db).save_lang_translations(target_lang, rows)
+                    for message, translation in zip(batch, translations):
+                        if translation:
+                            await translation_memory.remember(
+                                db, room_id, message["text"], message["source_lang"], translation
+                            )
+            metrics.inc("lazy_translations", len(rows), lang=target_lang)
+            print(f"📚 讀取時補翻譯 {len(rows)}/{len(batch)} 則 → {target_lang} ({time.time() - start_time:.2f} 秒)")
+        except Exception as e:
+            print(f"❌ 讀取時補翻譯失敗: {type(e).__name__}: {e}")
+        finally:
+            # 寫入資料庫後才移除，之後的讀取直接讀到已儲存的翻譯
+            for message, result in zip(batch, results):
+                future = self._pending.pop((str(message["id"]), target_lang))
+                if not future.done():
+                    future.set_result(result["text"] if result is not None else None)
+
+    async def _translate_one(self, room_id: str, message: Dict, target_lang: str) -> Optional[Dict[str, Dict]]:
+        """翻譯單則訊息（不佔用資料庫連線）；失敗時回傳 None"""
+        async with self._semaphore:
+            translations = await translation_memory.batch_translate(
+                room_id, message["text"], [target_lang], message["source_lang"]
+            )
+        result = translations.get(target_lang)
+        if result is None or result.get("error"):
+            return None
+        return translations
+
+# 全域讀取時補翻譯實例
+lazy_translator = LazyTranslator()
@@ -0,0 +1,174 @@
+"""
+供應商限流層
+每個供應商各自擁有：最大併發數 (依房間公平輪流的 FairSemaphore)、每秒請求數令牌桶、斷路器
+所有 STT / 翻譯的外部呼叫都應透過 get_limiter(name).slot() 執行
+"""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+from ..metrics import metrics
+from .fair_scheduler import FairSemaphore, current_room, room_label
+
+# 預設限制：(最大併發, 每秒請求數, 突發量)；0 代表不限制
+DEFAULT_LIMITS = {
+    "groq": (4, 2.0, 4),
+    "free": (8, 5.0, 10),
+    "google_v3": (16, 10.0, 20),
+    "google_speech_v1": (8, 5.0, 10),
+}
+
+
+class CircuitOpenError(Exception):
+    """斷路器開啟中，拒絕呼叫供應商"""
+
+
+class CircuitBreaker:
+    """連續失敗達門檻即開啟，冷卻後進入半開狀態只放行一次探測"""
+
+    def __init__(self, failure_threshold: int = 5, cooldown_s: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown_s:
+            return "open"
+        return "half_open"
+
+    @property
+    def is_open(self) -> bool:
+        state = self.state
+        return state == "open" or (state == "half_open" and self.probing)
+
+    def allow(self) -> bool:
+        """判斷是否放行本次請求；半開狀態只放行一個探測請求"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        # 半開探測失敗或連續失敗達門檻時（重新）開啟
+        if self.probing or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.probing = False
+
+
+class TokenBucket:
+    """每秒補充 rate 個令牌、最多累積 capacity 個的令牌桶"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ProviderLimiter:
+    def __init__(self, name: str, max_concurrency: int, rate_per_s: float, burst: int,
+                 failure_threshold: int, cooldown_s: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.semaphore = FairSemaphore(name, max_concurrency) if max_concurrency > 0 else None
+        self.bucket = TokenBucket(rate_per_s, burst)
+        self.breaker = CircuitBreaker(failure_threshold, cooldown_s)
+        self.in_flight = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        """取得呼叫額度；區塊內拋出例外視為供應商失敗"""
+        probe = self.breaker.state == "half_open"
+        if not self.breaker.allow():
+            metrics.inc("limiter_rejected_total", provider=self.name)
+            raise CircuitOpenError(f"{self.name} circuit breaker is open")
+
+        wait_start = time.monotonic()
+        acquired = False
+        try:
+            if self.semaphore:
+                await self.semaphore.acquire()
+                acquired = True
+            await self.bucket.acquire()
+            waited_ms = (time.monotonic() - wait_start) * 1000
+            metrics.observe("limiter_wait_ms", waited_ms, provider=self.name)
+            metrics.observe("limiter_room_wait_ms", waited_ms, room=room_label(current_room.get()))
+
+            self.in_flight += 1
+            metrics.set("limiter_in_flight", self.in_flight, provider=self.name)
+            try:
+                yield
+            except Exception:
+                self.breaker.record_failure()
+                metrics.inc("limiter_failures_total", provider=self.name)
+                if self.breaker.state == "open":
+                    print(f"🔌 {self.name} 斷路器開啟 (連續失敗 {self.breaker.consecutive_failures} 次)")
+                raise
+            else:
+                self.breaker.record_success()
+            finally:
+                self.in_flight -= 1
+                metrics.set("limiter_in_flight", self.in_flight, provider=self.name)
+        except (asyncio.CancelledError, GeneratorExit):
+            # 呼叫端取消（等待額度時或呼叫中，或串流產生器被關閉）不代表供應商失敗；探測請求被取消時釋放探測資格
+            if probe:
+                self.breaker.probing = False
+            raise
+        finally:
+            if acquired:
+                self.semaphore.release()
+
+
+def _env_number(key: str, default: float) -> float:
+    value = os.getenv(key)
+    return float(value) if value else default
+
+
+_limiters: Dict[str, ProviderLimiter] = {}
+
+
+def get_limiter(name: str) -> ProviderLimiter:
+    """取得（必要時建立）供應商的限流器；可用 LIMIT_<NAME>_* 環境變數覆寫"""
+    if name not in _limiters:
+        prefix = name.upper()
+        concurrency, rate, burst = DEFAULT_LIMITS.get(name, (0, 0.0, 1))
+        _limiters[name] = ProviderLimiter(
+            name,
+            max_concurrency=int(_env_number(f"LIMIT_{prefix}_CONCURRENCY", concurrency)),
+            rate_per_s=_env_number(f"LIMIT_{prefix}_RPS", rate),
+            burst=int(_env_number(f"LIMIT_{prefix}_BURST", burst)),
+            failure_threshold=int(_env_number(f"BREAKER_{prefix}_THRESHOLD", 5)),
+            cooldown_s=_env_number(f"BREAKER_{prefix}_COOLDOWN_S", 30.0),
+        )
+    return _limiters[name]
@@ -0,0 +1,175 @@
+"""
+即時字幕（未完成句子的增量翻譯）
+說話者的中間稿以防抖方式翻譯：已完成的子句（以標點結尾）翻譯後快取，
+之後的中間稿只翻譯新子句與尚未完成的尾巴；最終稿送出時以 replaces 取代即時字幕
+即時字幕只存在記憶體，透過 WebSocket 以 caption.delta 傳送變動的尾段，不寫入資料庫
+"""
+
+import asyncio
+import os
+import re
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from ..db.pool import get_db_pool
+from ..metrics import metrics
+from ..ws.hub import manager
+from .admission import admission
+from .fair_scheduler import set_current_room
+from .pipeline import group_listeners
+from .translate import translation_service
+
+_CLAUSE_END = re.compile(r"(?<=[\.!?;,。！？；，、])\s*")
+
+
+def caption_delta(previous: str, caption: str) -> Tuple[int, str]:
+    """
+    計算字幕差異：回傳 (保留前綴長度, 新尾段)
+    長度以 UTF-16 單位計算，與瀏覽器端 String.slice 一致
+    """
+    prefix = os.path.commonprefix([previous, caption])
+    return len(prefix.encode("utf-16-le")) // 2, caption[len(prefix):]
+
+
+def split_clauses(text: str) -> Tuple[List[str], str]:
+    """把文字切成已完成的子句與未完成的尾巴"""
+    parts = _CLAUSE_END.split(text.strip())
+    if parts and parts[-1] == "":
+        return [part for part in parts[:-1] if part], ""
+    return [part for part in parts[:-1] if part], parts[-1] if parts else ""
+
+
+class LiveUtterance:
+    def __init__(self, room_id: str, speaker_id: str, source_lang: Optional[str]):
+        self.id = str(uuid.uuid4())
+        self.room_id = room_id
+        self.speaker_id = speaker_id
+        self.source_lang = source_lang
+        self.text = ""
+        self.started_at = time.time()
+        # (子句, 目標語言) -> 譯文，穩定子句只翻譯一次
+        self.clause_cache: Dict[Tuple[str, str], str] = {}
+        # 目標語言 -> 上次送出的字幕，沒有變化就不重送
+        self.sent: Dict[str, str] = {}
+        self.listeners: Optional[Dict[str, List[str]]] = None
+        self.task: Optional[asyncio.Task] = None
+
+
+class LiveCaptionService:
+    def __init__(self):
+        self.debounce_s = float(os.getenv("LIVE_CAPTION_DEBOUNCE_MS", "300")) / 1000
+        self.utterances: Dict[Tuple[str, str], LiveUtterance] = {}
+
+    def update(self, room_id: str, speaker_id: str, text: str, source_lang: Optional[str]) -> str:
+        """收到中間稿：更新說話者目前的句子並排程防抖翻譯，回傳 utterance id"""
+        key = (room_id, speaker_id)
+        utterance = self.utterances.get(key)
+        if utterance is None:
+            utterance = LiveUtterance(room_id, speaker_id, source_lang)
+            self.utterances[key] = utterance
+        utterance.text = text
+        utterance.source_lang = source_lang or utterance.source_lang
+
+        # 系統忙碌時不翻譯中間稿，只等最終稿
+        if admission.drop_partials():
+            return utterance.id
+
+        # 翻譯進行中時不另開任務，由迴圈在下一輪取用最新文字
+        if utterance.task is None or utterance.task.done():
+            utterance.task = asyncio.create_task(self._run(key, utterance))
+        return utterance.id
+
+    def finish(self, room_id: str, speaker_id: str) -> Optional[str]:
+        """收到最終稿：停止即時翻譯，回傳要被取代的 utterance id"""
+        utterance = self.utterances.pop((room_id, speaker_id), None)
+        if utterance is None:
+            return None
+        if utterance.task and not utterance.task.done():
+            utterance.task.cancel()
+        return utterance.id
+
+    def listener_left(self, room_id: str, user_id: str):
+        """聽眾離開：之後的即時翻譯不再包含沒有聽眾的語言"""
+        for (utterance_room, _), utterance in self.utterances.items():
+            if utterance_room != room_id or not utterance.listeners:
+                continue
+            for user_ids in utterance.listeners.values():
+                if user_id in user_ids:
+                    user_ids.remove(user_id)
+
+    async def _run(self, key: Tuple[str, str], utterance: LiveUtterance):
+        """每個防抖區間最多翻譯一次，期間收到的中間稿合併成最新的一份"""
+        set_current_room(utterance.room_id)
+        try:
+            translated_text = None
+            while self.utterances.get(key) is utterance and utterance.text != translated_text:
+                await asyncio.sleep(self.debounce_s)
+                translated_text = utterance.text
+                await self._translate_and_send(utterance, translated_text)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"❌ 即時字幕翻譯失敗: {type(e).__name__}: {e}")
+
+    async def _translate_and_send(self, utterance: LiveUtterance, text: str):
+        if utterance.listeners is None:
+            pool = await get_db_pool()
+            user_ids = await manager.get_room_users(utterance.room_id)
+            async with pool.acquire() as db:
+                utterance.listeners = await group_listeners(db, user_ids)
+        target_langs = [lang for lang, user_ids in utterance.listeners.items() if user_ids]
+        if not target_langs:
+            return
+
+        clauses, tail = split_clauses(text)
+        segments = clauses + ([tail] if tail.strip() else [])
+        reused = 0
+        translated: Dict[str, List[str]] = {lang: [] for lang in target_langs}
+        for index, segment in enumerate(segments):
+            is_stable = index < len(clauses)
+            missing = [lang for lang in target_langs if (segment, lang) not in utterance.clause_cache]
+            if is_stable and not missing:
+                reused += 1
+            results = await translation_service.batch_translate(segment, missing, utterance.source_lang) if missing else {}
+            for lang in target_langs:
+                if (segment, lang) in utterance.clause_cache:
+                    translated[lang].append(utterance.clause_cache[(segment, lang)])
+                    continue
+                result_text = results[lang]["text"]
+                # 尾巴還會變動，只快取已完成且成功的子句
+                if is_stable and not results[lang].get("error"):
+                    utterance.clause_cache[(segment, lang)] = result_text
+                translated[lang].append(result_text)
+
+        metrics.inc("live_caption_clauses_reused", reused)
+        metrics.inc("live_caption_translations")
+
+        # 最終稿已送出就不再發送過時的即時字幕
+        if self.utterances.get((utterance.room_id, utterance.speaker_id)) is not utterance:
+            return
+        for lang, pieces in translated.items():
+            joiner = "" if lang.startswith(("zh", "ja")) else " "
+            caption = joiner.join(pieces)
+            previous = utterance.sent.get(lang, "")
+            if previous == caption:
+                continue
+            utterance.sent[lang] = caption
+            keep, append = caption_delta(previous, caption)
+            for user_id in utterance.listeners.get(lang, []):
+                try:
+                    await manager.send_to_user(utterance.room_id, user_id, {
+                        "type": "caption.delta",
+                        "messageId": utterance.id,
+                        "targetLang": lang,
+                        "keep": keep,
+                        "append": append,
+                        "speakerId": utterance.speaker_id,
+                        "sourceLang": utterance.source_lang,
+                        "timestamp": None
+                    })
+                except Exception as e:
+                    print(f"Error sending live caption to {user_id}: {e}")
+
+# 全域即時字幕服務實例
+live_caption_service = LiveCaptionService()
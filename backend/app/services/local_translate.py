@@ -0,0 +1,156 @@
+"""
+離線本地翻譯服務
+使用 CTranslate2 轉換過的 OPUS-MT 模型（int8 量化）在 CPU 上翻譯，不需網路
+模型目錄結構：$LOCAL_MT_MODEL_DIR/<來源>-<目標>/{model.bin, source.spm, target.spm}
+"""
+
+import importlib.util
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .lang_detect import detect_language_with_confidence, normalize_lang
+from .warm_pool import MicroBatcher, WarmProcessPool
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[\.!?。！？])\s*")
+
+# ── 工作行程內狀態（每個行程各自載入一次模型）──────────────────────
+_worker_config: Dict = {}
+_worker_models: Dict[str, Tuple] = {}
+
+
+def _init_worker(model_dir: str, intra_threads: int, compute_type: str):
+    _worker_config.update(model_dir=model_dir, intra_threads=intra_threads, compute_type=compute_type)
+    # 預先載入 LOCAL_MT_PRELOAD 指定的語言對，之後的請求不再承擔載入時間
+    preload = os.getenv("LOCAL_MT_PRELOAD", "")
+    for pair in [p.strip() for p in preload.split(",") if p.strip()]:
+        _load_model(pair)
+
+
+def _load_model(pair: str) -> Tuple:
+    if pair not in _worker_models:
+        import ctranslate2
+        import sentencepiece
+
+        path = os.path.join(_worker_config["model_dir"], pair)
+        translator = ctranslate2.Translator(
+            path,
+            device="cpu",
+            compute_type=_worker_config["compute_type"],
+            intra_threads=_worker_config["intra_threads"],
+        )
+        source_sp = sentencepiece.SentencePieceProcessor(model_file=os.path.join(path, "source.spm"))
+        target_sp = sentencepiece.SentencePieceProcessor(model_file=os.path.join(path, "target.spm"))
+        _worker_models[pair] = (translator, source_sp, target_sp)
+    return _worker_models[pair]
+
+
+def _translate_sentences(pair: str, sentences: List[str]) -> List[str]:
+    """在工作行程中翻譯一批句子"""
+    translator, source_sp, target_sp = _load_model(pair)
+    tokens = [source_sp.encode(sentence, out_type=str) + ["</s>"] for sentence in sentences]
+    results = translator.translate_batch(tokens, beam_size=2, max_batch_size=len(tokens))
+    return [target_sp.decode(result.hypotheses[0]).strip() for result in results]
+
+
+class LocalTranslateService:
+    def __init__(self):
+        self.model_dir = os.getenv("LOCAL_MT_MODEL_DIR", "/models/mt")
+        workers = int(os.getenv("LOCAL_MT_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+        intra_threads = int(os.getenv("LOCAL_MT_THREADS", "2"))
+        compute_type = os.getenv("LOCAL_MT_COMPUTE_TYPE", "int8")
+
+        self.use_mock = self._should_use_mock()
+        self.pool = WarmProcessPool(
+            "local_mt", workers, initializer=_init_worker,
+            initargs=(self.model_dir, intra_threads, compute_type)
+        )
+        self.batcher = MicroBatcher(
+            self._run_batch,
+            max_batch=int(os.getenv("LOCAL_MT_BATCH_SIZE", "32")),
+            max_wait_ms=float(os.getenv("LOCAL_MT_BATCH_WAIT_MS", "10"))
+        )
+        if not self.use_mock:
+            print(f"✅ 本地離線翻譯服務 (模型目錄: {self.model_dir}, 工作行程: {workers}, {compute_type})")
+
+    def _model_pair(self, source_lang: str, target_lang: str) -> Optional[str]:
+        """找出可用的模型目錄，優先完整語言代碼（例如 en-zh-TW），再退回主要語系"""
+        source = normalize_lang(source_lang)
+        target = normalize_lang(target_lang)
+        candidates = [f"{source}-{target}", f"{source.split('-')[0]}-{target.split('-')[0]}"]
+        for pair in candidates:
+            if os.path.isdir(os.path.join(self.model_dir, pair)):
+                return pair
+        return None
+
+    async def _run_batch(self, pair: str, texts: List[str]) -> List[str]:
+        """把同一語言對的多段文字拆句後一次送進行程池，再組回原段落"""
+        sentences: List[str] = []
+        spans = []
+        for text in texts:
+            parts = [part for part in _SENTENCE_SPLIT.split(text) if part.strip()] or [text]
+            spans.append((len(sentences), len(parts)))
+            sentences.extend(parts)
+
+        translated = await self.pool.run(_translate_sentences, pair, sentences)
+        joiner = "" if pair.split("-")[1] in ("zh", "ja") else " "
+        return [joiner.join(translated[start:start + count]) for start, count in spans]
+
+    async def translate_text(self, text: str, target_lang: str, source_lang: Optional[str] = None) -> Dict:
+        """翻譯文字"""
+        if self.use_mock:
+            return await self._mock_translate(text, target_lang, source_lang)
+
+        start_time = time.time()
+        if not source_lang:
+            source_lang, _ = detect_language_with_confidence(text)
+
+        try:
+            pair = self._model_pair(source_lang, target_lang)
+            if not pair:
+                raise ValueError(f"No local model for {source_lang} -> {target_lang}")
+
+            translated_text = await self.batcher.submit(pair, text)
+
+            return {
+                "text": translated_text,
+                "source_lang": source_lang,
+                "target_lang": target_lang,
+                "latency_ms": int((time.time() - start_time) * 1000),
+                "quality": 0.85,
+                "provider": "local"
+            }
+        except Exception as e:
+            print(f"本地翻譯服務錯誤: {e}")
+            result = await self._mock_translate(text, target_lang, source_lang)
+            result["error"] = str(e)
+            return result
+
+    async def warm_up(self):
+        if not self.use_mock:
+            await self.pool.warm_up()
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+    async def _mock_translate(self, text: str, target_lang: str, source_lang: Optional[str] = None) -> Dict:
+        """模擬翻譯回退"""
+        from .mock_translate import mock_translation_service
+        return await mock_translation_service.translate_text(text, target_lang, source_lang)
+
+    def _should_use_mock(self) -> bool:
+        """檢查是否應該使用模擬服務"""
+        for module in ("ctranslate2", "sentencepiece"):
+            if importlib.util.find_spec(module) is None:
+                print(f"⚠️  未安裝 {module}，本地翻譯改用模擬翻譯服務")
+                return True
+
+        if not os.path.isdir(self.model_dir):
+            print(f"⚠️  找不到本地翻譯模型目錄 {self.model_dir}，使用模擬翻譯服務")
+            return True
+
+        return False
+
+# 全域本地翻譯服務實例
+local_translate_service = LocalTranslateService()
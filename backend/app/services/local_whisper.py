@@ -0,0 +1,144 @@
+"""
+離線本地 Whisper 語音辨識
+使用 faster-whisper（CTranslate2，int8 量化）在 CPU 上辨識，不需網路
+每個工作行程只載入一次模型；每段音頻各自送進行程池，同時抵達的音頻由不同工作行程平行辨識
+（Whisper 在單一行程內只能逐段辨識，合併成一批只會讓整批卡在同一個行程）
+"""
+
+import importlib.util
+import io
+import math
+import os
+import time
+import wave
+from typing import Dict, Optional
+
+from .lang_detect import normalize_lang
+from .warm_pool import WarmProcessPool
+
+# ── 工作行程內狀態（每個行程各自載入一次模型）──────────────────────
+_worker_model = None
+_worker_config: Dict = {}
+
+
+def _init_worker(model: str, cpu_threads: int, compute_type: str, beam_size: int):
+    global _worker_model
+    from faster_whisper import WhisperModel
+
+    _worker_config.update(beam_size=beam_size)
+    _worker_model = WhisperModel(model, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+
+
+def _load_audio(audio_data: bytes, content_type: str):
+    """16kHz 單聲道 WAV 直接轉成 float32 陣列，其餘格式交給 faster-whisper 解碼"""
+    if "wav" in content_type:
+        import numpy as np
+
+        with wave.open(io.BytesIO(audio_data)) as wav:
+            if wav.getframerate() == 16000 and wav.getnchannels() == 1 and wav.getsampwidth() == 2:
+                samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+                return samples.astype(np.float32) / 32768.0
+    return io.BytesIO(audio_data)
+
+
+def _transcribe_clip(language: Optional[str], audio_data: bytes, content_type: str) -> Dict:
+    """在工作行程中辨識一段音頻"""
+    segments, info = _worker_model.transcribe(
+        _load_audio(audio_data, content_type),
+        language=language,
+        beam_size=_worker_config["beam_size"],
+        condition_on_previous_text=False,
+    )
+    segments = list(segments)
+    avg_logprob = sum(segment.avg_logprob for segment in segments) / len(segments) if segments else -1.0
+    return {
+        "text": "".join(segment.text for segment in segments).strip(),
+        "confidence": round(min(1.0, math.exp(avg_logprob)), 3),
+        "language": info.language,
+        "audio_s": info.duration,
+        "segments": [
+            {"text": segment.text, "no_speech_prob": segment.no_speech_prob,
+             "avg_logprob": segment.avg_logprob, "compression_ratio": segment.compression_ratio}
+            for segment in segments
+        ],
+    }
+
+
+class LocalWhisperService:
+    def __init__(self):
+        self.model = os.getenv("LOCAL_WHISPER_MODEL", "small")
+        workers = int(os.getenv("LOCAL_WHISPER_WORKERS", max(1, (os.cpu_count() or 2) // 4)))
+        cpu_threads = int(os.getenv("LOCAL_WHISPER_THREADS", "4"))
+        compute_type = os.getenv("LOCAL_WHISPER_COMPUTE_TYPE", "int8")
+        beam_size = int(os.getenv("LOCAL_WHISPER_BEAM_SIZE", "1"))
+
+        self.use_mock = self._should_use_mock()
+        self.pool = WarmProcessPool(
+            "local_whisper", workers, initializer=_init_worker,
+            initargs=(self.model, cpu_threads, compute_type, beam_size)
+        )
+        if not self.use_mock:
+            print(f"✅ 本地 Whisper 語音辨識 (模型: {self.model}, 工作行程: {workers}, {compute_type})")
+
+    async def transcribe_audio(self, audio_data: bytes, content_type: str = "audio/webm",
+                             language_code: str = "zh-TW") -> Dict:
+        """使用本地 Whisper 進行語音轉文字"""
+        if self.use_mock:
+            return await self._mock_transcribe(audio_data, language_code)
+
+        start_time = time.time()
+        try:
+            # Whisper 只需要主要語系，未指定時自動偵測
+            language = normalize_lang(language_code)
+            result = await self.pool.run(_transcribe_clip, language and language.split("-")[0], audio_data, content_type)
+            latency_ms = int((time.time() - start_time) * 1000)
+            if result["audio_s"]:
+                print(f"🎤 本地 Whisper 即時率 (RTF): {latency_ms / 1000 / result['audio_s']:.2f}")
+
+            return {
+                "text": result["text"],
+                "confidence": result["confidence"],
+                "language": result["language"] or language_code,
+                "segments": result["segments"],
+                "latency_ms": latency_ms,
+                "provider": "local_whisper"
+            }
+        except Exception as e:
+            # 回傳錯誤結果讓呼叫端決定重試或跳過，不以模擬文字冒充辨識結果
+            print(f"本地 Whisper 錯誤: {e}")
+            return {
+                "text": "",
+                "confidence": 0.0,
+                "language": language_code,
+                "latency_ms": int((time.time() - start_time) * 1000),
+                "error": str(e),
+                "provider": "local_whisper"
+            }
+
+    async def warm_up(self):
+        if not self.use_mock:
+            await self.pool.warm_up()
+
+    def shutdown(self):
+        self.pool.shutdown()
+
+    async def _mock_transcribe(self, audio_data: bytes, language_code: str) -> Dict:
+        """模擬語音轉錄回退"""
+        from .free_stt import free_speech_service
+        return await free_speech_service.transcribe_audio(audio_data, "audio/webm", language_code)
+
+    def _should_use_mock(self) -> bool:
+        """檢查是否應該使用模擬服務"""
+        if importlib.util.find_spec("faster_whisper") is None:
+            print("⚠️  未安裝 faster_whisper，本地語音辨識改用模擬服務")
+            return True
+
+        # 指定本地模型目錄時需確認存在；模型名稱則由 faster-whisper 下載
+        if os.sep in self.model and not os.path.isdir(self.model):
+            print(f"⚠️  找不到本地 Whisper 模型目錄 {self.model}，使用模擬服務")
+            return True
+
+        return False
+
+# 全域本地 Whisper 服務實例
+local_whisper_service = LocalWhisperService()
@@ -4,13 +4,18 @@
 """
 
 import asyncio
+import random
 import time
 from typing import Dict, List, Optional
 
 class MockTranslationService:
     """模擬翻譯服務，提供假的翻譯結果"""
     
-    def __init__(self):
+    def __init__(self, latency_s: Optional[float] = None, failure_rate: float = 0.0):
+        # 可注入固定延遲與失敗率，用於測試供應商池的對沖與切換
+        self.latency_s = latency_s
+        self.failure_rate = failure_rate
+        
         # 模擬翻譯對照表
         self.mock_translations = {
             # 中文 -> 其他語言
@@ -82,7 +87,13 @@ class MockTranslationService:
         start_time = time.time()
         
         # 模擬 API 延遲
-        await asyncio.sleep(0.1 + (len(text) * 0.001))  # 根據文字長度調整延遲
+        if self.latency_s is not None:
+            await asyncio.sleep(self.latency_s)
+        else:
+            await asyncio.sleep(0.1 + (len(text) * 0.001))  # 根據文字長度調整延遲
+        
+        if self.failure_rate and random.random() < self.failure_rate:
+            raise RuntimeError("Injected mock translation failure")
         
         # 檢查是否有預定義翻譯
         text_lower = text.lower().strip()
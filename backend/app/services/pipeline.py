@@ -0,0 +1,205 @@
+"""
+翻譯與廣播流程
+每個語言翻譯完成就立即送出該語言的個人字幕（主板語言最先排程），
+全部送出後才寫入資料庫；帶有序號的訊息經 hub 依房間內（各語言分開）的順序送出
+"""
+
+import time
+from typing import AsyncIterator, Dict, List, Optional
+
+from ..db.pool import get_db_pool
+from ..db.repo import MessageRepo, UserRepo
+from ..metrics import metrics
+from ..ws.hub import manager
+from .admission import admission
+from .inflight import PipelineHandle, inflight
+from .router import LanguageRouter
+from .translation_memory import translation_memory
+
+
+def personal_lang(user: Dict) -> str:
+    """使用者的個人字幕語言（與 LanguageRouter 相同規則）"""
+    return user.get("input_lang") or user.get("preferred_lang") or "zh-TW"
+
+
+async def group_listeners(db, user_ids: List[str]) -> Dict[str, List[str]]:
+    """
+    依個人字幕語言分組在線使用者
+    user_ids 由 manager.get_room_users 在取得 db 之前查好（啟用 relay 時查在線名單也要一條連線）
+    """
+    user_repo = UserRepo(db)
+    listeners: Dict[str, List[str]] = {}
+    for user_id in user_ids:
+        user = await user_repo.get_user(user_id)
+        if user:
+            listeners.setdefault(personal_lang(user), []).append(user_id)
+    return listeners
+
+
+def order_target_langs(board_lang: str, listeners: Dict[str, List[str]]) -> List[str]:
+    """主板語言排第一個，最先排程"""
+    return [board_lang] + sorted(lang for lang in listeners if lang != board_lang)
+
+
+async def run_translation_pipeline(
+    message_id: str,
+    room_id: str,
+    speaker_id: str,
+    text: str,
+    source_lang: Optional[str],
+    source: Optional[str] = None,
+    speaker_name: Optional[str] = None,
+    notify_completion: bool = False,
+    received_at: Optional[float] = None,
+    utterance_id: Optional[str] = None,
+    precomputed: Optional[Dict[str, Dict]] = None,
+    raise_errors: bool = False,
+    sequence: Optional[int] = None
+):
+    """
+    背景處理訊息翻譯、逐語言廣播與儲存
+    precomputed 為事先算好的翻譯（例如確認前的預先翻譯），這些語言不再呼叫供應商
+    raise_errors 為 True 時失敗會拋出例外（由翻譯佇列重試）
+    sequence 為房間內的訊息序號，字幕依序號順序送出
+    """
+    t_start = received_at or time.time()
+    print(f"🔄 翻譯流程開始 message_id: {message_id} text: {text[:50]}...")
+
+    try:
+        async with admission.track_translation(room_id):
+            with inflight.track(room_id) as handle:
+                await _run_pipeline(
+                    message_id, room_id, speaker_id, text, source_lang, source, speaker_name,
+                    notify_completion, t_start, utterance_id, precomputed, sequence, handle
+                )
+    except Exception as e:
+        print(f"❌ Error processing message translation: {type(e).__name__}: {e}")
+        if raise_errors:
+            raise
+        import traceback
+        traceback.print_exc()
+    finally:
+        # 整則訊息完成（或失敗、被拒絕）時放行序號；各語言送出時已先放行同語言的下一則字幕
+        await manager.finish_sequence(room_id, sequence)
+
+
+async def _run_pipeline(
+    message_id: str, room_id: str, speaker_id: str, text: str, source_lang: Optional[str],
+    source: Optional[str], speaker_name: Optional[str], notify_completion: bool, t_start: float,
+    utterance_id: Optional[str], precomputed: Optional[Dict[str, Dict]], sequence: Optional[int],
+    handle: PipelineHandle
+):
+    """實際的翻譯、逐語言送出與儲存（系統忙碌時只翻主板語言；沒有聽眾的語言會被取消）"""
+    translations: Dict[str, Dict] = {}
+    pool = await get_db_pool()
+    user_ids = await manager.get_room_users(room_id)
+    # 只在查詢聽眾與主板語言時佔用連線，翻譯期間不佔用
+    async with pool.acquire() as db:
+        listeners = await group_listeners(db, user_ids)
+
+        if not speaker_name:
+            speaker = await UserRepo(db).get_user(speaker_id)
+            speaker_name = speaker["display_name"] if speaker else "Unknown"
+
+        board_lang = await LanguageRouter(db).get_board_language(room_id, speaker_id)
+
+    target_langs = [board_lang] if admission.board_only() else order_target_langs(board_lang, listeners)
+    print(f"   目標語言: {target_langs} (主板: {board_lang})")
+    handle.listeners = listeners
+    handle.protected = {board_lang}
+    if handle.cancelled:
+        print(f"🛑 房間已沒有人，略過翻譯 message_id: {message_id}")
+        return
+
+    first_delivery = True
+    ready = [(lang, precomputed[lang]) for lang in target_langs if lang in (precomputed or {})]
+    remaining = [lang for lang in target_langs if lang not in (precomputed or {})]
+    async for target_lang, translation in _chain(ready, translation_memory.iter_translate(
+        room_id, text, remaining, source_lang, handle.lang_tasks
+    )):
+        translations[target_lang] = translation
+        await _deliver_language(
+            room_id, speaker_id, speaker_name, message_id, source_lang, source,
+            target_lang, translation["text"], listeners.get(target_lang, []),
+            is_board=target_lang == board_lang, utterance_id=utterance_id, sequence=sequence
+        )
+        # 這個語言送完就放行下一則訊息的同語言字幕，不必等其他語言
+        await manager.finish_sequence(room_id, sequence, target_lang)
+
+        elapsed_ms = (time.time() - t_start) * 1000
+        for _ in listeners.get(target_lang, []):
+            metrics.observe("subtitle_latency_ms", elapsed_ms, source=source or "text")
+        if first_delivery:
+            metrics.observe("time_to_first_subtitle_ms", elapsed_ms, source=source or "text")
+            first_delivery = False
+        print(f"   ⚡ {target_lang} 已送出 ({elapsed_ms:.0f}ms)")
+
+    # 全部送出後才寫入資料庫
+    async with pool.acquire() as db:
+        await MessageRepo(db).save_translations(message_id, translations)
+        await translation_memory.remember(db, room_id, text, source_lang, translations)
+
+    if notify_completion:
+        await manager.broadcast_to_room(room_id, {
+            "type": "translation.completed",
+            "messageId": message_id,
+            "translationsCount": len(translations),
+            "timestamp": None
+        })
+
+    print(f"✅ 翻譯流程完成 (總耗時: {time.time() - t_start:.3f} 秒)")
+
+
+
+async def _chain(ready: List, pending: AsyncIterator):
+    """先產出已完成的翻譯，再接續產出其餘語言"""
+    for item in ready:
+        yield item
+    async for item in pending:
+        yield item
+
+
+async def _deliver_language(
+    room_id: str, speaker_id: str, speaker_name: str, message_id: str,
+    source_lang: Optional[str], source: Optional[str], target_lang: str,
+    translated_text: str, user_ids: List[str], is_board: bool,
+    utterance_id: Optional[str] = None, sequence: Optional[int] = None
+):
+    """送出單一語言的個人字幕，若為主板語言同時廣播主板訊息"""
+    for user_id in user_ids:
+        personal_message = {
+            "type": "personal.subtitle",
+            "messageId": message_id,
+            "targetLang": target_lang,
+            "text": translated_text,
+            "speakerName": speaker_name,
+            "sourceLang": source_lang,
+            "timestamp": None
+        }
+        if source:
+            personal_message["source"] = source
+        if utterance_id:
+            # 取代同一句話的即時字幕
+            personal_message["replaces"] = utterance_id
+        try:
+            await manager.send_ordered(room_id, sequence, personal_message, user_id)
+        except Exception as e:
+            print(f"Error sending personal subtitle to {user_id}: {e}")
+
+    try:
+        if is_board:
+            board_message = {
+                "type": "board.post",
+                "messageId": message_id,
+                "speakerId": speaker_id,
+                "speakerName": speaker_name,
+                "targetLang": target_lang,
+                "text": translated_text,
+                "sourceLang": source_lang,
+                "timestamp": None
+            }
+            if source:
+                board_message["source"] = source
+            await manager.send_ordered(room_id, sequence, board_message)
+    except Exception as e:
+        print(f"Error broadcasting translations: {e}")
@@ -0,0 +1,181 @@
+"""
+翻譯供應商池
+追蹤每個供應商在各語言對上的滾動延遲與錯誤率，
+主供應商超過延遲百分位期限時發出對沖 (hedged) 請求，失敗時自動切換
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from .limiter import get_limiter
+
+# 供應商呼叫介面：(text, target_lang, source_lang) -> 翻譯結果 dict
+TranslateFn = Callable[[str, str, Optional[str]], Awaitable[Dict]]
+
+
+class ProviderStats:
+    """單一供應商 + 語言對的滾動統計"""
+
+    def __init__(self, window: int = 50):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.outcomes: Deque[bool] = deque(maxlen=window)
+
+    def record(self, latency_ms: float, ok: bool):
+        if ok:
+            self.latencies.append(latency_ms)
+        self.outcomes.append(ok)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """回傳延遲百分位 (毫秒)，樣本不足時回傳 None"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(pct * (len(ordered) - 1))))
+        return ordered[index]
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+
+class ProviderPool:
+    """具延遲感知的翻譯供應商池"""
+
+    def __init__(self, providers: List[Tuple[str, TranslateFn]],
+                 hedge_percentile: Optional[float] = None,
+                 default_hedge_ms: Optional[float] = None,
+                 min_samples: int = 5, window: int = 50,
+                 max_error_rate: float = 0.5):
+        # 依設定順序排列，第一個為主供應商
+        self.providers: List[Tuple[str, TranslateFn]] = providers
+        self.hedge_percentile = hedge_percentile if hedge_percentile is not None else float(
+            os.getenv("TRANSLATE_HEDGE_PERCENTILE", "0.95"))
+        self.default_hedge_ms = default_hedge_ms if default_hedge_ms is not None else float(
+            os.getenv("TRANSLATE_HEDGE_DEFAULT_MS", "1500"))
+        self.min_samples = min_samples
+        self.window = window
+        self.max_error_rate = max_error_rate
+        self.stats: Dict[Tuple[str, str, str], ProviderStats] = {}
+        # 斷路器與限流層共用，由各供應商呼叫邊界回報成敗
+        self.breakers = {name: get_limiter(name).breaker for name, _ in providers}
+
+    def _stats(self, name: str, source_lang: Optional[str], target_lang: str) -> ProviderStats:
+        key = (name, source_lang or "auto", target_lang)
+        if key not in self.stats:
+            self.stats[key] = ProviderStats(self.window)
+        return self.stats[key]
+
+    def _candidates(self, source_lang: Optional[str], target_lang: str) -> List[Tuple[str, TranslateFn]]:
+        """排除斷路器開啟的供應商，並把錯誤率過高的排到最後"""
+        available = [(name, fn) for name, fn in self.providers if not self.breakers[name].is_open]
+        return sorted(available, key=lambda item: self._is_degraded(item[0], source_lang, target_lang))
+
+    def _is_degraded(self, name: str, source_lang: Optional[str], target_lang: str) -> bool:
+        stats = self._stats(name, source_lang, target_lang)
+        return len(stats.outcomes) >= self.min_samples and stats.error_rate > self.max_error_rate
+
+    def hedge_delay(self, name: str, source_lang: Optional[str], target_lang: str) -> float:
+        """計算發出對沖請求前的等待時間 (秒)"""
+        stats = self._stats(name, source_lang, target_lang)
+        if len(stats.latencies) < self.min_samples:
+            return self.default_hedge_ms / 1000
+        return stats.percentile(self.hedge_percentile) / 1000
+
+    async def _call(self, name: str, fn: TranslateFn, text: str, target_lang: str,
+                    source_lang: Optional[str]) -> Dict:
+        """呼叫單一供應商並記錄延遲與錯誤"""
+        start_time = time.time()
+        stats = self._stats(name, source_lang, target_lang)
+        try:
+            result = await fn(text, target_lang, source_lang)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            stats.record((time.time() - start_time) * 1000, False)
+            raise
+
+        latency_ms = (time.time() - start_time) * 1000
+        # 供應商內部回退 (例如改用模擬翻譯) 時會帶 error 欄位，視為失敗
+        if result.get("error"):
+            stats.record(latency_ms, False)
+            raise RuntimeError(f"{name}: {result['error']}")
+
+        stats.record(latency_ms, True)
+        result.setdefault("provider", name)
+        return result
+
+    async def translate_text(self, text: str, target_lang: str, source_lang: Optional[str] = None) -> Dict:
+        """依序嘗試供應商；主供應商逾期未回應時對沖到下一個"""
+        candidates = self._candidates(source_lang, target_lang)
+        if not candidates:
+            raise RuntimeError("No translation provider available (all breakers open)")
+
+        pending: Dict[asyncio.Task, str] = {}
+        hedged_names = set()
+        errors: List[str] = []
+        next_index = 0
+
+        def launch():
+            nonlocal next_index
+            name, fn = candidates[next_index]
+            next_index += 1
+            task = asyncio.create_task(self._call(name, fn, text, target_lang, source_lang))
+            pending[task] = name
+            return name
+
+        try:
+            primary = launch()
+            timeout = self.hedge_delay(primary, source_lang, target_lang)
+
+            while pending:
+                done, _ = await asyncio.wait(
+                    pending.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    # 逾期：對沖到下一個供應商，之後不再計時
+                    if next_index < len(candidates):
+                        hedged = launch()
+                        hedged_names.add(hedged)
+                        print(f"⏱️ 翻譯對沖 {primary} 逾時 {timeout * 1000:.0f}ms，加送 {hedged}")
+                    timeout = None
+                    continue
+
+                for task in done:
+                    name = pending.pop(task)
+                    if task.exception() is None:
+                        result = task.result()
+                        # 對沖勝出與失敗切換分開標記，方便觀察兩者的比例
+                        if name in hedged_names:
+                            result["hedged"] = True
+                        elif name != primary:
+                            result["failover"] = True
+                        return result
+                    errors.append(str(task.exception()))
+
+                # 失敗切換：沒有請求在跑時立刻嘗試下一個
+                if not pending and next_index < len(candidates):
+                    launch()
+
+            raise RuntimeError("; ".join(errors) or "All translation providers failed")
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def snapshot(self) -> Dict:
+        """輸出各供應商統計，供除錯與監控使用"""
+        return {
+            f"{name}:{source}->{target}": {
+                "p50_ms": stats.percentile(0.5),
+                "p95_ms": stats.percentile(0.95),
+                "error_rate": stats.error_rate,
+                "samples": len(stats.outcomes),
+                "breaker_open": self.breakers[name].is_open,
+            }
+            for (name, source, target), stats in self.stats.items()
+        }
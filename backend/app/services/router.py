@@ -38,14 +38,7 @@ class LanguageRouter:
                 personal_langs.add(user_input_lang)
         
         # 主板視圖：使用講者的輸出語言（主板顯示語言）
-        speaker = await self.user_repo.get_user(speaker_id)
-        if speaker:
-            # 使用講者的輸出語言作為主板語言
-            board_lang = speaker.get("output_lang") or speaker.get("preferred_lang", "en")
-        else:
-            # 如果找不到講者，使用覆寫語言或預設主板語言
-            board_lang = override_map.get(speaker_id, room["default_board_lang"])
-        
+        board_lang = await self._board_lang(room, speaker_id, override_map)
         board_langs = {board_lang}
         
         return {
@@ -53,6 +46,23 @@ class LanguageRouter:
             "board": board_langs
         }
     
+    async def get_board_language(self, room_id: str, speaker_id: str) -> str:
+        """取得講者訊息在主板上顯示的語言"""
+        room = await self.room_repo.get_room(room_id)
+        if not room:
+            return "en"
+        overrides = await self.room_repo.get_lang_overrides(room_id)
+        override_map = {ov["speakerId"]: ov["targetLang"] for ov in overrides}
+        return await self._board_lang(room, speaker_id, override_map)
+    
+    async def _board_lang(self, room: Dict, speaker_id: str, override_map: Dict[str, str]) -> str:
+        speaker = await self.user_repo.get_user(speaker_id)
+        if speaker:
+            # 使用講者的輸出語言作為主板語言
+            return speaker.get("output_lang") or speaker.get("preferred_lang", "en")
+        # 如果找不到講者，使用覆寫語言或預設主板語言
+        return override_map.get(speaker_id, room["default_board_lang"])
+    
     async def get_all_target_languages(self, room_id: str, speaker_id: str, 
                                      online_users: List[str]) -> Set[str]:
         """取得所有需要的目標語言（個人視圖 + 主板視圖）"""
@@ -0,0 +1,91 @@
+"""
+分段語音的預先翻譯
+/stt-only 回傳辨識結果後，趁使用者檢查文字的空檔先翻成房間目前的目標語言；
+確認文字未修改時直接使用預先翻譯的結果，有修改則取消並重新翻譯
+完成的結果也寫回暫存結果，確認請求落在其他 worker 時仍可使用
+"""
+
+import asyncio
+import os
+from typing import Dict, Optional
+
+from ..db.pool import get_db_pool
+from ..metrics import metrics
+from ..ws.hub import manager
+from .admission import admission
+from .fair_scheduler import set_current_room
+from .inflight import inflight
+from .pipeline import group_listeners, order_target_langs
+from .router import LanguageRouter
+from .transcript_store import transcript_store
+from .translation_memory import translation_memory
+
+
+class SpeculativeTranslator:
+    def __init__(self):
+        self.enabled = os.getenv("SPECULATIVE_TRANSLATE_ENABLED", "true").lower() == "true"
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self, transcript_id: str, room_id: str, speaker_id: str, text: str, source_lang: Optional[str]):
+        # 系統忙碌時不做預先翻譯（確認後仍會正常翻譯）
+        if not self.enabled or admission.drop_partials():
+            return
+        task = asyncio.create_task(self._translate(transcript_id, room_id, speaker_id, text, source_lang))
+        self._tasks[transcript_id] = task
+        # 房間沒人時一併取消
+        inflight.watch(room_id, task)
+        task.add_done_callback(lambda _: self._tasks.pop(transcript_id, None)
+                               if self._tasks.get(transcript_id) is task else None)
+
+    async def _translate(self, transcript_id: str, room_id: str, speaker_id: str,
+                         text: str, source_lang: Optional[str]) -> Optional[Dict[str, Dict]]:
+        set_current_room(room_id)
+        try:
+            pool = await get_db_pool()
+            user_ids = await manager.get_room_users(room_id)
+            async with pool.acquire() as db:
+                listeners = await group_listeners(db, user_ids)
+                board_lang = await LanguageRouter(db).get_board_language(room_id, speaker_id)
+            translations = await translation_memory.batch_translate(
+                room_id, text, order_target_langs(board_lang, listeners), source_lang
+            )
+
+            stored = await transcript_store.get(transcript_id)
+            if stored:
+                await transcript_store.update(transcript_id, {**stored, "translations": translations})
+            return translations
+        except Exception as e:
+            print(f"⚠️ 預先翻譯失敗: {type(e).__name__}: {e}")
+            return None
+
+    async def take(self, transcript_id: str, stored: Dict, confirmed_text: str,
+                   source_lang: Optional[str]) -> Optional[Dict[str, Dict]]:
+        """
+        取得預先翻譯結果；確認文字或來源語言與辨識結果不同時取消並回傳 None
+        本行程的預先翻譯尚未完成時等它完成（仍比重新翻譯快）
+        """
+        task = self._tasks.pop(transcript_id, None)
+        if confirmed_text != stored["transcript"] or source_lang != stored["detected_lang"]:
+            if task is not None:
+                task.cancel()
+            metrics.inc("speculative_translation", result="edited")
+            return None
+
+        translations = stored.get("translations")
+        if translations is None and task is not None:
+            # 不用 await task：房間清空時任務可能已被取消，這時改為重新翻譯
+            await asyncio.wait({task})
+            translations = None if task.cancelled() else task.result()
+
+        metrics.inc("speculative_translation", result="hit" if translations else "miss")
+        return translations
+
+    def cancel(self, transcript_id: str):
+        """說話者取消暫存結果：停止還在進行的預先翻譯"""
+        task = self._tasks.pop(transcript_id, None)
+        if task is not None and not task.done():
+            task.cancel()
+            metrics.inc("provider_calls_avoided", reason="transcript_cancelled")
+
+# 全域預先翻譯實例
+speculative_translator = SpeculativeTranslator()
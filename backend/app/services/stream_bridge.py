@@ -0,0 +1,61 @@
+"""
+串流橋接
+把 asyncio 的音頻來源接到在專用執行緒上執行的阻塞式串流 API（例如 gRPC streaming_recognize），
+供應商回傳的結果再以 call_soon_threadsafe 送回事件迴圈
+"""
+
+import asyncio
+import queue
+import threading
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator
+
+_END = object()
+
+
+async def bridge_stream(blocking_fn: Callable[[Iterator[bytes]], Iterable[Dict]],
+                        audio_source: AsyncIterator[bytes], name: str = "stream") -> AsyncIterator[Dict]:
+    """
+    在專用執行緒執行 blocking_fn(音頻迭代器)，逐一產出它回傳的結果
+    音頻來源結束時送出結束標記，讓供應商的請求迭代器自然收尾
+    """
+    loop = asyncio.get_running_loop()
+    audio_queue: "queue.Queue" = queue.Queue()
+    results: asyncio.Queue = asyncio.Queue()
+
+    def audio_iterator() -> Iterator[bytes]:
+        while True:
+            chunk = audio_queue.get()
+            if chunk is _END:
+                return
+            yield chunk
+
+    def worker():
+        try:
+            for result in blocking_fn(audio_iterator()):
+                loop.call_soon_threadsafe(results.put_nowait, result)
+        except Exception as e:
+            loop.call_soon_threadsafe(results.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(results.put_nowait, _END)
+
+    async def pump():
+        try:
+            async for chunk in audio_source:
+                audio_queue.put(chunk)
+        finally:
+            audio_queue.put(_END)
+
+    thread = threading.Thread(target=worker, name=f"{name}-stream", daemon=True)
+    thread.start()
+    pump_task = asyncio.create_task(pump())
+    try:
+        while True:
+            item = await results.get()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        pump_task.cancel()
+        audio_queue.put(_END)
@@ -0,0 +1,254 @@
+"""
+串流語音辨識引擎
+WebSocket 收到的音頻片段送進供應商的串流 API（Google v1 gRPC 在專用執行緒上執行），
+中間結果立即以即時字幕推送給聽眾，最終結果寫入資料庫並交給翻譯流程
+不支援串流的供應商：音頻即時解碼為 PCM，以 VAD 偵測到的停頓切出最終結果並清空緩衝，
+中間結果只重新辨識尚未結束的這一段（長度有上限），費用與串流長度成線性
+"""
+
+import asyncio
+import os
+import time
+from typing import AsyncIterator, Dict, Optional
+
+from fastapi import WebSocket
+
+from ..db.pool import get_db_pool
+from ..db.repo import MessageRepo
+from ..metrics import metrics
+from .admission import admission
+from .audio_normalize import audio_normalizer, pcm_to_wav
+from .lang_detect import resolve_lang
+from .live_caption import live_caption_service
+from .translation_queue import translation_queue
+from .stt import stt_service
+from .transcript_filter import transcript_filter
+from .vad import SAMPLE_RATE, detect_speech, vad_service
+
+
+class StreamingSTTService:
+    def __init__(self):
+        self.interim_interval_s = float(os.getenv("STT_STREAM_INTERIM_MS", "1500")) / 1000
+        # 停頓超過此長度即切出最終結果
+        self.silence_ms = int(os.getenv("STT_STREAM_SILENCE_MS", "700"))
+        # 一直沒有停頓時，每段最長秒數
+        self.max_segment_s = float(os.getenv("STT_STREAM_MAX_SEGMENT_S", "15"))
+        # 無法解碼為 PCM 時（沒有 ffmpeg）累積音頻的上限，超過即結束串流
+        self.max_buffer_bytes = int(os.getenv("STT_STREAM_MAX_BUFFER_KB", "1024")) * 1024
+        # 單一串流的最長時間
+        self.max_stream_s = float(os.getenv("STT_STREAM_MAX_S", "3600"))
+
+    def recognize(self, audio_source: AsyncIterator[bytes], language_code: str,
+                  content_type: str) -> AsyncIterator[Dict]:
+        """依 STT_PROVIDER 選擇串流方式，產出 {"text", "is_final", "language", ...}"""
+        if stt_service.use_mock or stt_service.provider == "free":
+            from .free_stt import free_speech_service
+            return free_speech_service.stream_transcribe(audio_source, language_code)
+        if stt_service.provider == "google_v1":
+            from .google_speech_v1 import google_speech_v1_service
+            # 解碼為 PCM 後才能在供應商的串流時間上限前換新連線
+            if audio_normalizer.can_decode_stream(content_type):
+                audio_source, content_type = audio_normalizer.decode_stream(audio_source, content_type), "audio/l16"
+            return google_speech_v1_service.streaming_recognize(audio_source, language_code, content_type)
+        if audio_normalizer.can_decode_stream(content_type):
+            return self._segmented_recognize(audio_normalizer.decode_stream(audio_source, content_type), language_code)
+        return self._windowed_recognize(audio_source, language_code, content_type)
+
+    def _cut_point(self, segment: bytearray):
+        """
+        回傳 (最終結果的結束位置, 可丟棄的開頭長度)，單位為 bytes
+        語音後的停頓達 STT_STREAM_SILENCE_MS 或整段達上限時切出最終結果；一直沒有語音時只保留最後一小段
+        """
+        silence_bytes = SAMPLE_RATE * self.silence_ms // 1000 * 2
+        usable = len(segment) // 2 * 2
+        if usable >= int(SAMPLE_RATE * self.max_segment_s) * 2:
+            return usable, 0
+        if not vad_service.enabled or usable < silence_bytes:
+            return None, 0
+
+        import numpy as np
+        bounds = detect_speech(np.frombuffer(bytes(segment[:usable]), dtype=np.int16), **vad_service.params)
+        if bounds is None:
+            return None, max(0, usable - silence_bytes)
+        end = bounds[1] * 2
+        if usable - end >= silence_bytes:
+            return end, 0
+        return None, 0
+
+    async def _segmented_recognize(self, pcm_source: AsyncIterator[bytes], language_code: str) -> AsyncIterator[Dict]:
+        """批次供應商：以 PCM 切段，每段結束時辨識一次作為最終結果，期間定期辨識這一段作為中間結果"""
+        segment = bytearray()
+        last_started = 0.0
+        pending: Optional[asyncio.Task] = None
+        try:
+            async for chunk in pcm_source:
+                segment.extend(chunk)
+                if pending is not None and pending.done():
+                    result = pending.result()
+                    pending = None
+                    yield {**result, "is_final": False}
+
+                end, drop = self._cut_point(segment)
+                if drop:
+                    del segment[:drop]
+                if end is not None:
+                    if pending is not None:
+                        pending.cancel()
+                        pending = None
+                    audio = bytes(segment[:end])
+                    del segment[:end]
+                    metrics.observe("stream_segment_ms", len(audio) / 2 / SAMPLE_RATE * 1000)
+                    result = await stt_service.transcribe_audio(pcm_to_wav(audio), "audio/wav", language_code)
+                    yield {**result, "is_final": True}
+                    continue
+
+                # 系統忙碌時不做中間結果的重新辨識，只在段落結束時辨識一次
+                if pending is None and time.time() - last_started >= self.interim_interval_s \
+                        and not admission.drop_partials():
+                    last_started = time.time()
+                    pending = asyncio.create_task(stt_service.transcribe_audio(
+                        pcm_to_wav(bytes(segment[:len(segment) // 2 * 2])), "audio/wav", language_code
+                    ))
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+
+        if len(segment) >= 2:
+            result = await stt_service.transcribe_audio(
+                pcm_to_wav(bytes(segment[:len(segment) // 2 * 2])), "audio/wav", language_code
+            )
+            yield {**result, "is_final": True}
+
+    async def _windowed_recognize(self, audio_source: AsyncIterator[bytes], language_code: str,
+                                  content_type: str) -> AsyncIterator[Dict]:
+        """
+        無法解碼為 PCM 時的替代方案：每隔 STT_STREAM_INTERIM_MS 以累積音頻重新辨識一次
+        壓縮容器無法從中間切開，累積達 STT_STREAM_MAX_BUFFER_KB 時送出最終結果並結束串流
+        """
+        accumulated = bytearray()
+        last_started = 0.0
+        pending: Optional[asyncio.Task] = None
+        try:
+            async for chunk in audio_source:
+                accumulated.extend(chunk)
+                if len(accumulated) >= self.max_buffer_bytes:
+                    print(f"⚠️ 串流音頻達 {len(accumulated) // 1024} KB 上限（無 ffmpeg 無法分段），結束串流")
+                    metrics.inc("stream_buffer_limit_reached")
+                    break
+                if pending is not None and pending.done():
+                    result = pending.result()
+                    pending = None
+                    yield {**result, "is_final": False}
+                # 系統忙碌時不做中間結果的重新辨識，只在結束時辨識一次
+                if pending is None and time.time() - last_started >= self.interim_interval_s \
+                        and not admission.drop_partials():
+                    last_started = time.time()
+                    pending = asyncio.create_task(
+                        stt_service.transcribe_audio(bytes(accumulated), content_type, language_code)
+                    )
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+
+        if accumulated:
+            result = await stt_service.transcribe_audio(bytes(accumulated), content_type, language_code)
+            yield {**result, "is_final": True}
+
+    async def handle_websocket(self, websocket: WebSocket, room_id: str, speaker_id: str,
+                               language_code: str, content_type: str):
+        """接收二進位音頻片段直到收到 "stop" 或斷線，等最終結果送出後結束"""
+        audio_queue: asyncio.Queue = asyncio.Queue()
+
+        async def audio_source():
+            while True:
+                chunk = await audio_queue.get()
+                if chunk is None:
+                    return
+                yield chunk
+
+        session = asyncio.create_task(
+            self._run_session(websocket, room_id, speaker_id, audio_source(), language_code, content_type)
+        )
+        started_at = time.time()
+        try:
+            while True:
+                # 辨識已結束（錯誤或達緩衝上限）或超過最長時間時停止接收
+                if session.done():
+                    break
+                if time.time() - started_at > self.max_stream_s:
+                    await self._send(websocket, {"type": "error", "message": "Stream duration limit reached"})
+                    break
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    audio_queue.put_nowait(message["bytes"])
+                elif message.get("text") == "stop":
+                    break
+        finally:
+            audio_queue.put_nowait(None)
+        await session
+
+    async def _run_session(self, websocket: WebSocket, room_id: str, speaker_id: str,
+                           audio_source: AsyncIterator[bytes], language_code: str, content_type: str):
+        started_at = time.time()
+        first_hypothesis = True
+        try:
+            async for result in self.recognize(audio_source, language_code, content_type):
+                text = (result.get("text") or "").strip()
+                is_final = result.get("is_final", False)
+                if is_final:
+                    # 最終結果與上傳的語音一樣過濾幻覺；整句被過濾時結束即時字幕，不寫入資料庫也不翻譯
+                    text = transcript_filter.filter(text, result.get("segments"))
+                    if not text:
+                        live_caption_service.finish(room_id, speaker_id)
+                        continue
+                if not text:
+                    continue
+                source_lang = resolve_lang(result.get("language"), language_code)
+
+                if first_hypothesis:
+                    metrics.observe("stream_first_hypothesis_ms", (time.time() - started_at) * 1000)
+                    first_hypothesis = False
+
+                if is_final:
+                    await self._finalize(room_id, speaker_id, text, source_lang)
+                else:
+                    # 中間結果走即時字幕：記憶體內、防抖翻譯、只送變動尾段
+                    live_caption_service.update(room_id, speaker_id, text, source_lang)
+
+                await self._send(websocket, {
+                    "type": "stt.final" if is_final else "stt.interim",
+                    "text": text,
+                    "confidence": result.get("confidence"),
+                    "language": source_lang
+                })
+        except Exception as e:
+            print(f"❌ 串流語音辨識錯誤: {type(e).__name__}: {e}")
+            live_caption_service.finish(room_id, speaker_id)
+            await self._send(websocket, {"type": "error", "message": str(e)})
+
+    async def _finalize(self, room_id: str, speaker_id: str, text: str, source_lang: str):
+        """最終結果寫入資料庫，翻譯流程在背景執行，不阻塞後續音頻"""
+        pool = await get_db_pool()
+        async with pool.acquire() as db:
+            message_id = await MessageRepo(db).create_message(
+                room_id=room_id, speaker_id=speaker_id, text=text, source_lang=source_lang, is_final=True
+            )
+        utterance_id = live_caption_service.finish(room_id, speaker_id)
+        await translation_queue.submit(
+            None, message_id, room_id, speaker_id, text, source_lang,
+            source="speech_stream", utterance_id=utterance_id
+        )
+
+    async def _send(self, websocket: WebSocket, message: dict):
+        try:
+            message.setdefault("timestamp", None)
+            from ..ws.hub import manager
+            await manager.send_to_websocket(websocket, message)
+        except Exception:
+            # 說話者已斷線時仍繼續完成辨識與翻譯
+            pass
+
+# 全域串流語音辨識實例
+streaming_stt_service = StreamingSTTService()
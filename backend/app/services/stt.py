@@ -24,6 +24,20 @@ class STTService:
     async def transcribe_audio(self, audio_data: bytes, content_type: str = "audio/webm", 
                              language_code: str = "zh-TW") -> Dict:
         """轉錄音頻為文字"""
+        # 正規化為 16kHz 單聲道並裁掉前後靜音；沒有語音就不呼叫任何供應商
+        from .audio_normalize import audio_normalizer
+        prepared = await audio_normalizer.prepare(audio_data, content_type, "free" if self.use_mock else self.provider)
+        if not prepared["has_speech"]:
+            return {
+                "text": "",
+                "confidence": 0.0,
+                "language": language_code,
+                "latency_ms": 0,
+                "provider": "vad",
+                "no_speech": True
+            }
+        audio_data, content_type, sample_rate = prepared["audio"], prepared["content_type"], prepared["sample_rate"]
+        
         if self.use_mock:
             return await self._mock_transcribe(audio_data, language_code)
         
@@ -33,16 +47,19 @@ class STTService:
             if self.provider == "groq":
                 from .groq_stt import groq_stt_service
                 return await groq_stt_service.transcribe_audio(audio_data, content_type, language_code)
+            elif self.provider == "local_whisper":
+                from .local_whisper import local_whisper_service
+                return await local_whisper_service.transcribe_audio(audio_data, content_type, language_code)
             elif self.provider == "free":
                 from .free_stt import free_speech_service
                 return await free_speech_service.transcribe_audio(audio_data, content_type, language_code)
             elif self.provider == "google_v1":
                 from .google_speech_v1 import google_speech_v1_service
-                return await google_speech_v1_service.transcribe_audio(audio_data, content_type, language_code)
+                return await google_speech_v1_service.transcribe_audio(audio_data, content_type, language_code, sample_rate)
             elif self.provider == "google":
-                result = await self._google_speech_to_text(audio_data, content_type, language_code)
+                result = await self._google_speech_to_text(audio_data, content_type, language_code, sample_rate)
             elif self.provider == "azure":
-                result = await self._azure_speech_to_text(audio_data, content_type, language_code)
+                result = await self._azure_speech_to_text(audio_data, content_type, language_code, sample_rate)
             else:
                 raise ValueError(f"Unsupported STT provider: {self.provider}")
             
@@ -61,35 +78,44 @@ class STTService:
                 "provider": self.provider
             }
     
-    async def _google_speech_to_text(self, audio_data: bytes, content_type: str, language_code: str) -> Dict:
+    async def _google_speech_to_text(self, audio_data: bytes, content_type: str, language_code: str,
+                                     sample_rate: Optional[int] = None) -> Dict:
         """使用 Google Speech-to-Text API"""
         if not self.google_api_key:
             raise ValueError("Google API key not configured")
         
-        # 將音頻轉為 base64
-        audio_base64 = base64.b64encode(audio_data).decode('utf-8')
-        
-        # 根據 content_type 設定編碼格式
-        encoding = "WEBM_OPUS" if "webm" in content_type else "LINEAR16"
+        # 根據 content_type 設定編碼格式，取樣率沿用正規化後的值
+        if "flac" in content_type:
+            encoding = "FLAC"
+        elif "ogg" in content_type:
+            encoding = "OGG_OPUS"
+        elif "webm" in content_type:
+            encoding = "WEBM_OPUS"
+        else:
+            encoding = "LINEAR16"
         
         url = f"https://speech.googleapis.com/v1/speech:recognize?key={self.google_api_key}"
         
-        payload = {
-            "config": {
-                "encoding": encoding,
-                "sampleRateHertz": 48000,
-                "languageCode": language_code,
-                "alternativeLanguageCodes": ["en-US", "zh-CN", "ja-JP"],
-                "enableAutomaticPunctuation": True,
-                "model": "latest_long"
-            },
-            "audio": {
-                "content": audio_base64
-            }
+        config = {
+            "encoding": encoding,
+            "sampleRateHertz": sample_rate or 48000,
+            "languageCode": language_code,
+            "alternativeLanguageCodes": ["en-US", "zh-CN", "ja-JP"],
+            "enableAutomaticPunctuation": True,
+            "model": "latest_long"
         }
         
+        # REST API 需要 base64：直接把編碼後的位元組拼進請求本文，
+        # 避免 base64 字串再經過 decode 與 json.dumps 各複製一次
+        body = b"".join([
+            b'{"config":', json.dumps(config).encode("utf-8"),
+            b',"audio":{"content":"', base64.b64encode(audio_data), b'"}}'
+        ])
+        
         async with httpx.AsyncClient() as client:
-            response = await client.post(url, json=payload, timeout=30.0)
+            response = await client.post(
+                url, content=body, headers={"Content-Type": "application/json"}, timeout=30.0
+            )
             response.raise_for_status()
             
             data = response.json()
@@ -112,7 +138,8 @@ class STTService:
                     "provider": "google"
                 }
     
-    async def _azure_speech_to_text(self, audio_data: bytes, content_type: str, language_code: str) -> Dict:
+    async def _azure_speech_to_text(self, audio_data: bytes, content_type: str, language_code: str,
+                                    sample_rate: Optional[int] = None) -> Dict:
         """使用 Azure Speech Services"""
         if not self.azure_key or not self.azure_region:
             raise ValueError("Azure Speech credentials not configured")
@@ -121,7 +148,7 @@ class STTService:
         
         headers = {
             "Ocp-Apim-Subscription-Key": self.azure_key,
-            "Content-Type": content_type,
+            "Content-Type": f"audio/wav; codecs=audio/pcm; samplerate={sample_rate}" if sample_rate and "wav" in content_type else content_type,
             "Accept": "application/json"
         }
         
@@ -212,6 +239,10 @@ class STTService:
         if self.provider == "free":
             return False
         
+        # 本地 Whisper 自行處理缺少套件時的回退
+        if self.provider == "local_whisper":
+            return False
+        
         # 如果是 Google v1 但沒有 Google Cloud 設定
         if self.provider == "google_v1":
             if not os.getenv("GOOGLE_CLOUD_PROJECT"):
@@ -0,0 +1,137 @@
+"""
+語音辨識幻覺過濾
+Whisper 在靜音或雜訊時常輸出固定的片尾語（「謝謝大家」「請不吝點贊訂閱…」），
+先依每段的 no_speech_prob / avg_logprob / compression_ratio 丟掉可疑分段，
+再以預先編譯好的片語集合與單一正則比對整句
+片語與門檻可寫在 TRANSCRIPT_FILTER_FILE (JSON) 中，檔案變更後自動重新載入，不需重新部署
+"""
+
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from ..metrics import metrics
+
+DEFAULT_CONFIG: Dict[str, Any] = {
+    # 完整比對（繁體和簡體都包含）
+    "exact": [
+        "請不吝點贊 訂閱 轉發 打賞支持明鏡與點點欄目", "请不吝点赞 订阅 转发 打赏支持明镜与点点栏目",
+        "謝謝大家", "谢谢大家", "明鏡與點點欄目", "明镜与点点栏目",
+        "歡迎訂閱我的頻道", "欢迎订阅我的频道", "感謝收看", "感谢收看",
+        "下次再見", "下次再见", "記得訂閱", "记得订阅",
+        "按讚分享", "按赞分享", "支持頻道", "支持频道",
+    ],
+    # 模糊比對（從句首比對，不分大小寫）
+    "patterns": [
+        r".*點贊.*訂閱.*轉發.*打賞.*明鏡.*", r".*点赞.*订阅.*转发.*打赏.*明镜.*",
+        r".*支持.*明鏡.*點點.*欄目.*", r".*支持.*明镜.*点点.*栏目.*",
+        r".*字幕.*製作.*", r".*字幕.*制作.*",
+        r"^\.+$", r"^，+$", r"^。+$", r"^\s*$",
+    ],
+    # 與 Whisper 本身判定靜音的規則相同：沒有語音的機率高且平均對數機率低
+    "no_speech_prob": 0.6,
+    "avg_logprob": -1.0,
+    # 壓縮率過高代表重複輸出同一句
+    "compression_ratio": 2.4,
+}
+
+
+def _field(segment: Any, name: str) -> Optional[float]:
+    """分段可能是 dict（verbose_json）或物件（SDK 型別）"""
+    value = segment.get(name) if isinstance(segment, dict) else getattr(segment, name, None)
+    return None if value is None else float(value)
+
+
+def _text(segment: Any) -> str:
+    return (segment.get("text") if isinstance(segment, dict) else getattr(segment, "text", "")) or ""
+
+
+class TranscriptFilter:
+    def __init__(self):
+        self.config_file = os.getenv("TRANSCRIPT_FILTER_FILE")
+        self.reload_interval_s = float(os.getenv("TRANSCRIPT_FILTER_RELOAD_S", "5"))
+        self._loaded_mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self._compile(DEFAULT_CONFIG)
+        self._maybe_reload()
+
+    def _compile(self, config: Dict[str, Any]):
+        self.exact = frozenset(phrase.strip() for phrase in config["exact"])
+        patterns = config["patterns"]
+        # 所有模式合併成一個正則，一次比對
+        self.pattern = re.compile("|".join(f"(?:{p})" for p in patterns), re.IGNORECASE) if patterns else None
+        self.no_speech_prob = config["no_speech_prob"]
+        self.avg_logprob = config["avg_logprob"]
+        self.compression_ratio = config["compression_ratio"]
+
+    def _maybe_reload(self):
+        """最多每 TRANSCRIPT_FILTER_RELOAD_S 秒檢查一次設定檔的修改時間"""
+        if not self.config_file or time.time() - self._checked_at < self.reload_interval_s:
+            return
+        self._checked_at = time.time()
+        try:
+            mtime = os.path.getmtime(self.config_file)
+            if mtime == self._loaded_mtime:
+                return
+            with open(self.config_file, encoding="utf-8") as file:
+                overrides = json.load(file)
+            self._compile({**DEFAULT_CONFIG, **overrides})
+            self._loaded_mtime = mtime
+            print(f"🔄 已載入辨識過濾設定 {self.config_file}")
+        except Exception as e:
+            # 設定檔有誤時沿用目前規則
+            print(f"⚠️ 辨識過濾設定載入失敗，沿用目前規則: {e}")
+            self._loaded_mtime = None
+
+    def is_hallucinated_segment(self, segment: Any, patterns: bool = True) -> bool:
+        no_speech_prob = _field(segment, "no_speech_prob")
+        avg_logprob = _field(segment, "avg_logprob")
+        compression_ratio = _field(segment, "compression_ratio")
+        if no_speech_prob is not None and avg_logprob is not None:
+            if no_speech_prob > self.no_speech_prob and avg_logprob < self.avg_logprob:
+                return True
+        if compression_ratio is not None and compression_ratio > self.compression_ratio:
+            return True
+        return self.is_default_phrase(_text(segment).strip(), patterns)
+
+    def is_default_phrase(self, text: str, patterns: bool = True) -> bool:
+        if text in self.exact:
+            return True
+        return patterns and self.pattern is not None and self.pattern.match(text) is not None
+
+    def filter(self, text: str, segments: Optional[List[Any]] = None, min_chars: int = 1,
+               patterns: bool = True) -> str:
+        """
+        回傳過濾後的辨識文字；整句都是幻覺或雜訊時回傳空字串
+        segments 為 Whisper 的分段結果（含 no_speech_prob 等分數），有提供時逐段過濾
+        patterns 為 False 時只用分段分數與完整片語，不套用模糊比對的正則
+        """
+        self._maybe_reload()
+        if not text or not text.strip():
+            return ""
+
+        original = text.strip()
+        if segments:
+            kept = [segment for segment in segments if not self.is_hallucinated_segment(segment, patterns)]
+            if len(kept) != len(segments):
+                metrics.inc("transcript_segments_dropped", len(segments) - len(kept))
+                text = "".join(_text(segment) for segment in kept)
+
+        text_cleaned = text.strip()
+        if not text_cleaned:
+            reason = "segments"
+        elif self.is_default_phrase(text_cleaned, patterns):
+            reason = "phrase"
+        elif len(text_cleaned) < min_chars:
+            reason = "too_short"
+        else:
+            return text_cleaned
+
+        print(f"🚫 過濾辨識結果 ({reason}): '{original}'")
+        metrics.inc("transcript_filtered", reason=reason)
+        return ""
+
+# 全域辨識過濾實例
+transcript_filter = TranscriptFilter()
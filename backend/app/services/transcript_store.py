@@ -0,0 +1,164 @@
+"""
+分段語音的暫存辨識結果
+/stt-only 寫入、/translate-stt 或取消時刪除；未確認的結果在 TTL 後過期
+TRANSCRIPT_STORE=redis 時存在 Redis（多個 worker 共用），否則存在行程內並受筆數與記憶體上限約束
+Redis 無法連線時暫時改存在行程內（只有同一個 worker 讀得到），請求不會因此失敗
+"""
+
+import importlib.util
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from ..metrics import metrics
+
+
+class MemoryTranscriptStore:
+    """行程內 LRU：過期的結果先移除，超過筆數／位元組上限時淘汰最久沒讀取的結果"""
+
+    def __init__(self, ttl_s: float, max_entries: int, max_bytes: int):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple[float, int, Dict]]" = OrderedDict()
+        self._bytes = 0
+
+    async def put(self, transcript_id: str, data: Dict):
+        size = len(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        self._remove(transcript_id)
+        self._entries[transcript_id] = (time.time() + self.ttl_s, size, data)
+        self._bytes += size
+        metrics.inc("transcript_store_stored")
+        self._evict()
+
+    async def update(self, transcript_id: str, data: Dict) -> bool:
+        """只更新仍存在的結果，不延長過期時間"""
+        entry = self._entries.get(transcript_id)
+        if entry is None:
+            return False
+        size = len(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        self._entries[transcript_id] = (entry[0], size, data)
+        self._bytes += size - entry[1]
+        self._evict()
+        return True
+
+    async def get(self, transcript_id: str) -> Optional[Dict]:
+        self._evict()
+        entry = self._entries.get(transcript_id)
+        if entry is None:
+            return None
+        self._entries.move_to_end(transcript_id)
+        return entry[2]
+
+    async def delete(self, transcript_id: str) -> bool:
+        removed = self._remove(transcript_id)
+        self._update_gauges()
+        return removed
+
+    def _remove(self, transcript_id: str) -> bool:
+        entry = self._entries.pop(transcript_id, None)
+        if entry is None:
+            return False
+        self._bytes -= entry[1]
+        return True
+
+    def _evict(self):
+        now = time.time()
+        # 讀取會把結果移到最後，過期時間不再依序排列，因此逐筆檢查（筆數有上限）
+        expired = [transcript_id for transcript_id, (expires_at, _, _) in self._entries.items() if expires_at < now]
+        for transcript_id in expired:
+            self._remove(transcript_id)
+            metrics.inc("transcript_store_evicted", reason="ttl")
+        # 最久沒讀取的在前
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            metrics.inc("transcript_store_evicted", reason="size")
+        self._update_gauges()
+
+    def _update_gauges(self):
+        metrics.set("transcript_store_entries", len(self._entries))
+        metrics.set("transcript_store_bytes", self._bytes)
+
+
+class RedisTranscriptStore:
+    """
+    存在 Redis，過期交給 Redis 的 EX 處理，記憶體上限由 Redis 的 maxmemory 設定
+    Redis 出錯時改用 fallback（行程內）存取，回復後新結果再寫回 Redis
+    """
+
+    def __init__(self, url: str, ttl_s: float, fallback: MemoryTranscriptStore):
+        import redis.asyncio as redis
+        from redis.exceptions import RedisError
+
+        timeout_s = float(os.getenv("TRANSCRIPT_STORE_REDIS_TIMEOUT_S", "1"))
+        self.client = redis.from_url(url, socket_timeout=timeout_s, socket_connect_timeout=timeout_s)
+        self.errors = RedisError
+        self.fallback = fallback
+        self.ttl_s = int(ttl_s)
+        self.prefix = "staged_transcript:"
+
+    def _degraded(self, operation: str, error: Exception):
+        metrics.inc("transcript_store_errors", operation=operation)
+        print(f"⚠️ Redis 暫存辨識結果{operation}失敗，改用行程內暫存: {type(error).__name__}: {error}")
+
+    async def put(self, transcript_id: str, data: Dict):
+        try:
+            await self.client.set(self.prefix + transcript_id, json.dumps(data, ensure_ascii=False), ex=self.ttl_s)
+        except self.errors as e:
+            self._degraded("寫入", e)
+            await self.fallback.put(transcript_id, data)
+            return
+        metrics.inc("transcript_store_stored")
+
+    async def update(self, transcript_id: str, data: Dict) -> bool:
+        """只更新仍存在的結果，不延長過期時間"""
+        if await self.fallback.update(transcript_id, data):
+            return True
+        try:
+            return bool(await self.client.set(
+                self.prefix + transcript_id, json.dumps(data, ensure_ascii=False), xx=True, keepttl=True
+            ))
+        except self.errors as e:
+            self._degraded("更新", e)
+            return False
+
+    async def get(self, transcript_id: str) -> Optional[Dict]:
+        # Redis 故障期間寫入的結果只在行程內
+        data = await self.fallback.get(transcript_id)
+        if data is not None:
+            return data
+        try:
+            value = await self.client.get(self.prefix + transcript_id)
+        except self.errors as e:
+            self._degraded("讀取", e)
+            return None
+        return json.loads(value) if value else None
+
+    async def delete(self, transcript_id: str) -> bool:
+        removed = await self.fallback.delete(transcript_id)
+        try:
+            return bool(await self.client.delete(self.prefix + transcript_id)) or removed
+        except self.errors as e:
+            self._degraded("刪除", e)
+            return removed
+
+
+def create_transcript_store():
+    ttl_s = float(os.getenv("TRANSCRIPT_STORE_TTL_S", "600"))
+    memory_store = MemoryTranscriptStore(
+        ttl_s,
+        max_entries=int(os.getenv("TRANSCRIPT_STORE_MAX_ENTRIES", "1000")),
+        max_bytes=int(float(os.getenv("TRANSCRIPT_STORE_MAX_MB", "16")) * 1024 * 1024),
+    )
+    if os.getenv("TRANSCRIPT_STORE", "memory") == "redis":
+        if importlib.util.find_spec("redis") is None:
+            print("⚠️  未安裝 redis，暫存辨識結果改存在行程內")
+        else:
+            print("✅ 暫存辨識結果使用 Redis")
+            return RedisTranscriptStore(os.getenv("REDIS_URL", "redis://localhost:6379"), ttl_s, memory_store)
+    return memory_store
+
+# 全域暫存辨識結果實例
+transcript_store = create_transcript_store()
@@ -0,0 +1,403 @@
+"""
+長音檔轉錄工作
+上傳的完整錄音存到磁碟後，在靜音處切成前後重疊的分段，分段平行送 STT（受供應商限流約束），
+接起分段並附上時間戳，再依語言批次翻譯；進度透過房間 WebSocket 推送
+工作狀態與分段結果存在資料庫，行程重啟或當掉後，租約過期的工作由定期掃描接手續跑
+"""
+
+import asyncio
+import io
+import os
+import re
+import subprocess
+import time
+import uuid
+import wave
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import UploadFile
+
+from ..db.pool import get_db_pool
+from ..db.repo import TranscriptionJobRepo
+from ..metrics import metrics
+from ..ws.hub import manager
+from .audio_normalize import audio_normalizer
+from .fair_scheduler import set_current_room
+from .lang_detect import resolve_lang
+from .stt import stt_service
+from .transcript_filter import transcript_filter
+from .translate import translation_service
+from .vad import SAMPLE_RATE
+
+_FRAME_MS = 30
+# 中日韓文字逐字比對，其他語言以空白分隔的字詞比對
+_TOKEN = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff\uac00-\ud7af]|[^\s\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff\uac00-\ud7af]+")
+_NON_WORD = re.compile(r"[\W_]+")
+_LEADING_PUNCTUATION = " ,.;:!?，。、；：！？…"
+
+
+# ── 工作行程內執行的同步函式 ──────────────────────────────────────
+def _read_pcm(path: str, ffmpeg: Optional[str], start_s: float = 0.0, duration_s: Optional[float] = None):
+    """讀取檔案（或其中一段）為 16kHz 單聲道 int16"""
+    import numpy as np
+
+    if ffmpeg:
+        args = [ffmpeg, "-hide_banner", "-loglevel", "error", "-ss", f"{start_s:.3f}"]
+        if duration_s is not None:
+            args += ["-t", f"{duration_s:.3f}"]
+        args += ["-i", path, "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"]
+        completed = subprocess.run(args, capture_output=True)
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.decode("utf-8", "ignore").strip())
+        return np.frombuffer(completed.stdout, dtype=np.int16)
+
+    with wave.open(path) as wav:
+        if wav.getsampwidth() != 2 or wav.getframerate() != SAMPLE_RATE:
+            raise ValueError("Without ffmpeg only 16kHz 16-bit WAV files are supported")
+        channels = wav.getnchannels()
+        wav.setpos(min(wav.getnframes(), int(start_s * SAMPLE_RATE)))
+        frames = wav.getnframes() if duration_s is None else int(duration_s * SAMPLE_RATE)
+        samples = np.frombuffer(wav.readframes(frames), dtype=np.int16)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples
+
+
+def plan_chunks(path: str, ffmpeg: Optional[str], chunk_s: float, search_s: float) -> List[Tuple[int, int]]:
+    """在每個目標長度附近找能量最低的音框作為切點，回傳不重疊的分段範圍 (毫秒)"""
+    import numpy as np
+
+    samples = _read_pcm(path, ffmpeg)
+    frame_len = SAMPLE_RATE * _FRAME_MS // 1000
+    frame_count = len(samples) // frame_len
+    if frame_count == 0:
+        return []
+
+    frames = samples[:frame_count * frame_len].astype(np.float32).reshape(frame_count, frame_len)
+    energy = np.sqrt(np.mean(frames ** 2, axis=1))
+    chunk_frames = int(chunk_s * 1000 / _FRAME_MS)
+    search_frames = int(search_s * 1000 / _FRAME_MS)
+
+    boundaries = [0]
+    while frame_count - boundaries[-1] > chunk_frames + search_frames:
+        target = boundaries[-1] + chunk_frames
+        low, high = target - search_frames, min(frame_count, target + search_frames)
+        boundaries.append(low + int(np.argmin(energy[low:high])))
+    boundaries.append(frame_count)
+    return [(start * _FRAME_MS, end * _FRAME_MS) for start, end in zip(boundaries, boundaries[1:])]
+
+
+def extract_chunk(path: str, ffmpeg: Optional[str], start_ms: int, end_ms: int) -> bytes:
+    """取出一段音頻並編碼為 16kHz 單聲道 WAV"""
+    samples = _read_pcm(path, ffmpeg, start_ms / 1000, (end_ms - start_ms) / 1000)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def _overlap_tokens(text: str) -> List[Tuple[str, int]]:
+    """切成比對用的字詞：(去除標點的小寫字詞, 字詞在原文的結束位置)，純標點略過"""
+    tokens = []
+    for match in _TOKEN.finditer(text):
+        key = _NON_WORD.sub("", match.group().lower())
+        if key:
+            tokens.append((key, match.end()))
+    return tokens
+
+
+def strip_overlap(previous: str, text: str, max_tokens: int = 30, slack: int = 2,
+                  min_ratio: float = 0.6, min_match: int = 3) -> str:
+    """
+    去掉與前一段結尾重複的開頭（分段重疊造成的重複字詞）
+    兩段對重疊音頻的辨識結果常有些微差異（標點、大小寫、切點上的半個字），
+    因此以字詞序列對齊前段結尾與本段開頭，大部分字詞對得上就視為重疊
+    """
+    previous_tokens = _overlap_tokens(previous)[-max_tokens:]
+    tokens = _overlap_tokens(text)[:max_tokens]
+    if not previous_tokens or not tokens:
+        return text.lstrip()
+
+    matcher = SequenceMatcher(None, [key for key, _ in previous_tokens], [key for key, _ in tokens], autojunk=False)
+    blocks = [block for block in matcher.get_matching_blocks() if block.size]
+    # 重疊必須延伸到前段結尾（容許切點上幾個辨識不同的字詞）
+    if not blocks or len(previous_tokens) - (blocks[-1].a + blocks[-1].size) > slack:
+        return text.lstrip()
+
+    cut = blocks[-1].b + blocks[-1].size
+    matched = 0
+    overlap = 0
+    for block in reversed(blocks):
+        matched += block.size
+        # 對齊的範圍從本段開頭附近開始，且兩邊大部分字詞對得上
+        span = max(len(previous_tokens) - block.a, cut)
+        if block.b <= slack and matched >= min_match and matched >= min_ratio * span:
+            overlap = cut
+    if not overlap:
+        return text.lstrip()
+    return text[tokens[overlap - 1][1]:].lstrip(_LEADING_PUNCTUATION)
+
+
+def stitch_segments(segments: List[Dict]) -> Dict[int, str]:
+    """依序接起分段原文，去掉重疊造成的重複開頭；回傳 {分段序號: 文字}（空白分段略過）"""
+    texts: Dict[int, str] = {}
+    previous = ""
+    for segment in segments:
+        text = strip_overlap(previous, segment["text"] or "")
+        if text:
+            texts[segment["idx"]] = text
+            previous = segment["text"]
+    return texts
+
+
+async def _run_all(coros) -> List:
+    """平行執行；任一個失敗時取消其餘（不再浪費 STT／翻譯呼叫）並拋出第一個例外"""
+    try:
+        async with asyncio.TaskGroup() as group:
+            tasks = [group.create_task(coro) for coro in coros]
+    except ExceptionGroup as e:
+        raise e.exceptions[0] from None
+    return [task.result() for task in tasks]
+
+
+class TranscriptionJobService:
+    def __init__(self):
+        self.storage_dir = os.getenv("JOB_STORAGE_DIR", "/tmp/realtime-translate/jobs")
+        self.max_bytes = int(float(os.getenv("JOB_MAX_MB", "500")) * 1024 * 1024)
+        self.chunk_s = float(os.getenv("JOB_CHUNK_S", "30"))
+        self.search_s = float(os.getenv("JOB_CHUNK_SEARCH_S", "5"))
+        self.overlap_ms = int(float(os.getenv("JOB_CHUNK_OVERLAP_S", "1")) * 1000)
+        self.concurrency = int(os.getenv("JOB_CHUNK_CONCURRENCY", "4"))
+        self.segment_retries = int(os.getenv("JOB_SEGMENT_RETRIES", "2"))
+        self.lease_s = float(os.getenv("JOB_LEASE_S", "60"))
+        self.sweep_s = float(os.getenv("JOB_SWEEP_S", str(self.lease_s)))
+        self._running: Dict[str, asyncio.Task] = {}
+
+    async def save_upload(self, upload: UploadFile) -> str:
+        """以固定大小區塊寫入磁碟，不把整個檔案讀進記憶體"""
+        os.makedirs(self.storage_dir, exist_ok=True)
+        suffix = os.path.splitext(upload.filename or "")[1] or ".bin"
+        path = os.path.join(self.storage_dir, f"{uuid.uuid4()}{suffix}")
+        size = 0
+        try:
+            with open(path, "wb") as file:
+                while chunk := await upload.read(1024 * 1024):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise ValueError(f"Audio file too large (max {self.max_bytes // (1024 * 1024)}MB)")
+                    file.write(chunk)
+        except Exception:
+            os.unlink(path)
+            raise
+        return path
+
+    async def submit(self, room_id: str, user_id: str, upload: UploadFile,
+                     language_code: Optional[str], target_langs: List[str]) -> str:
+        path = await self.save_upload(upload)
+        pool = await get_db_pool()
+        async with pool.acquire() as db:
+            job_id = await TranscriptionJobRepo(db).create_job(
+                room_id, user_id, path, upload.content_type, language_code, target_langs
+            )
+        self.start(job_id)
+        return job_id
+
+    def start(self, job_id: str):
+        if job_id in self._running:
+            return
+        task = asyncio.create_task(self._run(job_id))
+        self._running[job_id] = task
+        task.add_done_callback(lambda _: self._running.pop(job_id, None))
+
+    async def run_sweeper(self):
+        """定期接手租約過期的未完成工作（含其他行程當掉後留下的工作），啟動時先跑一次"""
+        while True:
+            await self.resume_pending()
+            await asyncio.sleep(self.sweep_s)
+
+    async def resume_pending(self):
+        """接手沒有行程持有租約的未完成工作"""
+        try:
+            pool = await get_db_pool()
+            async with pool.acquire() as db:
+                job_ids = await TranscriptionJobRepo(db).get_resumable_job_ids()
+        except Exception as e:
+            print(f"⚠️ 無法查詢未完成的轉錄工作: {e}")
+            return
+        for job_id in job_ids:
+            print(f"🔁 續跑轉錄工作 {job_id}")
+            self.start(job_id)
+
+    async def _run(self, job_id: str):
+        pool = await get_db_pool()
+        async with pool.acquire() as db:
+            repo = TranscriptionJobRepo(db)
+            if not await repo.claim(job_id, self.lease_s):
+                return
+            job = await repo.get_job(job_id)
+        room_id = str(job["room_id"])
+        set_current_room(room_id)
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        start_time = time.time()
+        try:
+            if job["status"] in ("queued", "splitting"):
+                await self._split(job_id, job)
+            if job["status"] in ("queued", "splitting", "transcribing"):
+                await self._transcribe(job_id, job, room_id)
+            await self._translate(job_id, job, room_id)
+
+            async with pool.acquire() as db:
+                await TranscriptionJobRepo(db).update_status(job_id, "completed")
+            self._remove_file(job["file_path"])
+            metrics.observe("transcription_job_ms", (time.time() - start_time) * 1000)
+            await self._notify(room_id, {"type": "job.completed", "jobId": job_id})
+            print(f"✅ 轉錄工作完成 {job_id} (耗時: {time.time() - start_time:.1f} 秒)")
+        except Exception as e:
+            print(f"❌ 轉錄工作失敗 {job_id}: {type(e).__name__}: {e}")
+            async with pool.acquire() as db:
+                await TranscriptionJobRepo(db).update_status(job_id, "failed", str(e))
+            # 失敗的工作不會再續跑，錄音檔不必留在磁碟上
+            self._remove_file(job["file_path"])
+            await self._notify(room_id, {"type": "job.failed", "jobId": job_id, "error": str(e)})
+        finally:
+            heartbeat.cancel()
+            async with pool.acquire() as db:
+                await TranscriptionJobRepo(db).release(job_id)
+
+    def _remove_file(self, path: str):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    async def _heartbeat(self, job_id: str):
+        pool = await get_db_pool()
+        while True:
+            await asyncio.sleep(self.lease_s / 3)
+            try:
+                async with pool.acquire() as db:
+                    await TranscriptionJobRepo(db).renew_lease(job_id, self.lease_s)
+            except Exception as e:
+                print(f"⚠️ 轉錄工作租約更新失敗 {job_id}: {e}")
+
+    async def _split(self, job_id: str, job: Dict):
+        await self._set_status(job_id, "splitting")
+        spans = await audio_normalizer.pool.run(
+            plan_chunks, job["file_path"], audio_normalizer.ffmpeg, self.chunk_s, self.search_s
+        )
+        pool = await get_db_pool()
+        async with pool.acquire() as db:
+            await TranscriptionJobRepo(db).create_segments(job_id, spans)
+        print(f"✂️ 轉錄工作 {job_id} 切成 {len(spans)} 段")
+
+    async def _transcribe(self, job_id: str, job: Dict, room_id: str):
+        await self._set_status(job_id, "transcribing")
+        pool = await get_db_pool()
+        async with pool.acquire() as db:
+            segments = await TranscriptionJobRepo(db).get_segments(job_id)
+
+        total = len(segments)
+        done = sum(1 for segment in segments if segment["text"] is not None)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def transcribe_segment(segment: Dict):
+            nonlocal done
+            async with semaphore:
+                # 前後各多取一小段重疊，避免切點上的字被截斷
+                audio = await audio_normalizer.pool.run(
+                    extract_chunk, job["file_path"], audio_normalizer.ffmpeg,
+                    max(0, segment["start_ms"] - self.overlap_ms), segment["end_ms"] + self.overlap_ms
+                )
+                for attempt in range(self.segment_retries + 1):
+                    result = await stt_service.transcribe_audio(audio, "audio/wav", job["language_code"])
+                    # 供應商失敗後的回退文字不是真正的辨識結果，與錯誤一樣重試，仍失敗時整個工作失敗
+                    if not result.get("error") and not result.get("fallback"):
+                        break
+                    if attempt < self.segment_retries:
+                        metrics.inc("transcription_segment_retries")
+                        await asyncio.sleep(2 ** attempt)
+                else:
+                    raise RuntimeError(f"Segment {segment['idx']} failed: {result.get('error') or 'provider fallback'}")
+            # 分段中的靜音或片尾常被辨識成幻覺語句，寫入前先過濾（整段被過濾時存成空字串，接合時略過）
+            text = transcript_filter.filter(result["text"], result.get("segments"))
+            async with pool.acquire() as db:
+                await TranscriptionJobRepo(db).save_segment_text(
+                    job_id, segment["idx"], text,
+                    resolve_lang(result.get("language"), job["language_code"])
+                )
+            done += 1
+            await self._notify(room_id, {"type": "job.progress", "jobId": job_id,
+                                         "stage": "transcribing", "done": done, "total": total})
+
+        await _run_all(transcribe_segment(segment) for segment in segments if segment["text"] is None)
+
+    async def _translate(self, job_id: str, job: Dict, room_id: str):
+        await self._set_status(job_id, "translating")
+        pool = await get_db_pool()
+        async with pool.acquire() as db:
+            segments = await TranscriptionJobRepo(db).get_segments(job_id)
+
+        texts = stitch_segments(segments)
+        languages = {segment["idx"]: segment["language"] for segment in segments}
+        translated_langs = {segment["idx"]: segment["translations"] for segment in segments}
+
+        # 翻譯供應商只提供單一文字的呼叫，因此每個分段、每個語言各呼叫一次，以 JOB_CHUNK_CONCURRENCY 限制併發
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def translate_one(idx: int, target_lang: str) -> Tuple[int, str]:
+            async with semaphore:
+                result = await translation_service.translate_text(texts[idx], target_lang, languages.get(idx))
+            return idx, result["text"]
+
+        for index, target_lang in enumerate(job["target_langs"]):
+            # 已翻譯過的語言（重啟前完成）不再重跑
+            pending = [idx for idx in texts if target_lang not in translated_langs[idx]]
+            if pending:
+                translated = dict(await _run_all(translate_one(idx, target_lang) for idx in pending))
+                async with pool.acquire() as db:
+                    await TranscriptionJobRepo(db).save_segment_translations(job_id, target_lang, translated)
+            await self._notify(room_id, {"type": "job.progress", "jobId": job_id, "stage": "translating",
+                                         "done": index + 1, "total": len(job["target_langs"]),
+                                         "targetLang": target_lang})
+
+    async def get_result(self, job_id: str) -> Optional[Dict]:
+        pool = await get_db_pool()
+        async with pool.acquire() as db:
+            repo = TranscriptionJobRepo(db)
+            job = await repo.get_job(job_id)
+            if not job:
+                return None
+            segments = await repo.get_segments(job_id)
+        texts = stitch_segments(segments)
+        return {
+            "job_id": job_id,
+            "room_id": str(job["room_id"]),
+            "status": job["status"],
+            "error": job["error"],
+            "total_chunks": job["total_chunks"],
+            "done_chunks": sum(1 for segment in segments if segment["text"] is not None),
+            "target_langs": job["target_langs"],
+            "segments": [
+                {"start_ms": segment["start_ms"], "end_ms": segment["end_ms"], "text": texts[segment["idx"]],
+                 "language": segment["language"], "translations": segment["translations"]}
+                for segment in segments if segment["idx"] in texts
+            ] if job["status"] == "completed" else []
+        }
+
+    async def _set_status(self, job_id: str, status: str):
+        pool = await get_db_pool()
+        async with pool.acquire() as db:
+            await TranscriptionJobRepo(db).update_status(job_id, status)
+
+    async def _notify(self, room_id: str, message: Dict):
+        try:
+            await manager.broadcast_to_room(room_id, {**message, "timestamp": None})
+        except Exception as e:
+            print(f"Error broadcasting job progress: {e}")
+
+# 全域轉錄工作服務實例
+transcription_job_service = TranscriptionJobService()
@@ -2,8 +2,9 @@ import httpx
 import os
 from typing import Dict, List, Optional
 import asyncio
-from langdetect import detect
 import time
+from .lang_detect import detect_language_with_confidence, is_same_language
+from .limiter import get_limiter
 
 class TranslationService:
     def __init__(self):
@@ -14,9 +15,63 @@ class TranslationService:
         
         # 檢查是否需要使用模擬模式
         self.use_mock = self._should_use_mock()
+        
+        # 設定備援供應商時啟用供應商池（延遲追蹤、對沖與失敗切換）
+        self.pool = self._build_pool()
+    
+    def _build_pool(self):
+        """依 TRANSLATE_FALLBACK_PROVIDERS 建立供應商池，未設定時回傳 None"""
+        fallback = [p.strip() for p in os.getenv("TRANSLATE_FALLBACK_PROVIDERS", "").split(",") if p.strip()]
+        if not fallback:
+            return None
+        
+        from .provider_pool import ProviderPool
+        names = [] if self.use_mock else [self.provider]
+        names += [name for name in fallback if name not in names]
+        providers = [(name, self._provider_fn(name)) for name in names]
+        print(f"✅ 翻譯供應商池: {' → '.join(names)}")
+        return ProviderPool(providers)
+    
+    def _provider_fn(self, name: str):
+        """取得單一供應商的翻譯呼叫"""
+        if name == "free":
+            from .free_translate import free_translate_service
+            return free_translate_service.translate_text
+        if name == "google_v3":
+            from .google_translate_v3 import google_translate_v3_service
+            return google_translate_v3_service.translate_text
+        if name == "local":
+            from .local_translate import local_translate_service
+            return local_translate_service.translate_text
+        if name == "mock":
+            from .mock_translate import mock_translation_service
+            
+            async def call_mock(text: str, target_lang: str, source_lang: Optional[str] = None) -> Dict:
+                async with get_limiter("mock").slot():
+                    return await mock_translation_service.translate_text(text, target_lang, source_lang)
+            return call_mock
+        if name in ("google", "azure"):
+            method = self._google_translate if name == "google" else self._azure_translate
+            
+            async def call(text: str, target_lang: str, source_lang: Optional[str] = None) -> Dict:
+                start_time = time.time()
+                result = await method(text, target_lang, source_lang)
+                return {
+                    "text": result["text"],
+                    "source_lang": result.get("source_lang", source_lang),
+                    "target_lang": target_lang,
+                    "latency_ms": int((time.time() - start_time) * 1000),
+                    "quality": result.get("quality", 1.0),
+                    "provider": name
+                }
+            return call
+        raise ValueError(f"Unsupported translation provider: {name}")
     
     async def translate_text(self, text: str, target_lang: str, source_lang: Optional[str] = None) -> Dict:
         """翻譯文字"""
+        if self.pool:
+            return await self._pool_translate(text, target_lang, source_lang)
+        
         # 如果使用模擬模式，委託給模擬服務
         if self.use_mock:
             from .mock_translate import mock_translation_service
@@ -28,6 +83,9 @@ class TranslationService:
             if self.provider == "free":
                 from .free_translate import free_translate_service
                 return await free_translate_service.translate_text(text, target_lang, source_lang)
+            elif self.provider == "local":
+                from .local_translate import local_translate_service
+                return await local_translate_service.translate_text(text, target_lang, source_lang)
             elif self.provider == "google_v3":
                 from .google_translate_v3 import google_translate_v3_service
                 return await google_translate_v3_service.translate_text(text, target_lang, source_lang)
@@ -58,6 +116,22 @@ class TranslationService:
                 "error": str(e)
             }
     
+    async def _pool_translate(self, text: str, target_lang: str, source_lang: Optional[str] = None) -> Dict:
+        """透過供應商池翻譯，全部失敗時回傳原文"""
+        start_time = time.time()
+        try:
+            return await self.pool.translate_text(text, target_lang, source_lang)
+        except Exception as e:
+            print(f"❌ 所有翻譯供應商皆失敗 {target_lang}: {e}")
+            return {
+                "text": text,
+                "source_lang": source_lang,
+                "target_lang": target_lang,
+                "latency_ms": int((time.time() - start_time) * 1000),
+                "quality": 0.0,
+                "error": str(e)
+            }
+    
     async def _google_translate(self, text: str, target_lang: str, source_lang: Optional[str] = None) -> Dict:
         """使用 Google Translate API"""
         if not self.google_api_key:
@@ -74,7 +148,7 @@ class TranslationService:
         if source_lang:
             payload["source"] = source_lang
         
-        async with httpx.AsyncClient() as client:
+        async with get_limiter("google").slot(), httpx.AsyncClient() as client:
             response = await client.post(url, json=payload)
             response.raise_for_status()
             
@@ -109,7 +183,7 @@ class TranslationService:
         
         body = [{"text": text}]
         
-        async with httpx.AsyncClient() as client:
+        async with get_limiter("azure").slot(), httpx.AsyncClient() as client:
             response = await client.post(url, params=params, headers=headers, json=body)
             response.raise_for_status()
             
@@ -128,20 +202,22 @@ class TranslationService:
     
     async def batch_translate(self, text: str, target_langs: List[str], source_lang: Optional[str] = None) -> Dict[str, Dict]:
         """批次翻譯到多個目標語言 - 已優化避免重複翻譯"""
-        # 如果使用模擬模式，委託給模擬服務
-        if self.use_mock:
-            from .mock_translate import mock_translation_service
-            return await mock_translation_service.batch_translate(text, target_langs, source_lang)
-        
-        # 如果使用免費翻譯，使用其批次翻譯
-        if self.provider == "free":
-            from .free_translate import free_translate_service
-            return await free_translate_service.batch_translate(text, target_langs, source_lang)
-        
-        # 如果使用 Google v3，使用其優化的批次翻譯
-        if self.provider == "google_v3":
-            from .google_translate_v3 import google_translate_v3_service
-            return await google_translate_v3_service.batch_translate(text, target_langs, source_lang)
+        # 供應商池啟用時走下方的通用路徑，每個語言各自對沖與切換
+        if not self.pool:
+            # 如果使用模擬模式，委託給模擬服務
+            if self.use_mock:
+                from .mock_translate import mock_translation_service
+                return await mock_translation_service.batch_translate(text, target_langs, source_lang)
+            
+            # 如果使用免費翻譯，使用其批次翻譯
+            if self.provider == "free":
+                from .free_translate import free_translate_service
+                return await free_translate_service.batch_translate(text, target_langs, source_lang)
+            
+            # 如果使用 Google v3，使用其優化的批次翻譯
+            if self.provider == "google_v3":
+                from .google_translate_v3 import google_translate_v3_service
+                return await google_translate_v3_service.batch_translate(text, target_langs, source_lang)
         
         # 🚀 效能優化：去重和跳過相同語言翻譯
         unique_target_langs = list(set(target_langs))  # 去除重複的目標語言
@@ -157,8 +233,8 @@ class TranslationService:
         translate_count = 0
         
         for target_lang in unique_target_langs:
-            # 🎯 優化：跳過源語言 = 目標語言的翻譯
-            if target_lang == source_lang:
+            # 🎯 優化：跳過源語言 = 目標語言的翻譯（偵測信心足夠時以偵測結果為準）
+            if is_same_language(text, target_lang, source_lang):
                 print(f"⏭️  跳過翻譯 {source_lang} → {target_lang} (相同語言)")
                 skipped_langs[target_lang] = {
                     "text": text,
@@ -217,6 +293,61 @@ class TranslationService:
         
         return final_results
     
+    async def iter_translate(self, text: str, target_langs: List[str], source_lang: Optional[str] = None,
+                             lang_tasks: Optional[Dict[str, asyncio.Task]] = None):
+        """
+        逐語言產出翻譯結果 (target_lang, result)，先完成的先產出
+        列表越前面的語言越早排程，呼叫端可把主板語言放在第一位
+        lang_tasks 會記錄每個語言的翻譯任務；被呼叫端取消的語言不會產出
+        """
+        # 免費供應商的 source_lang 可能是錯的，只相信偵測器
+        trust_source = self.provider != "free"
+        
+        skipped = []
+        tasks: Dict[asyncio.Task, str] = {}
+        for target_lang in dict.fromkeys(target_langs):
+            if is_same_language(text, target_lang, source_lang, trust_source=trust_source):
+                skipped.append(target_lang)
+            else:
+                tasks[asyncio.create_task(self.translate_text(text, target_lang, source_lang))] = target_lang
+        if lang_tasks is not None:
+            lang_tasks.update({target_lang: task for task, target_lang in tasks.items()})
+        
+        try:
+            for target_lang in skipped:
+                yield target_lang, {
+                    "text": text,
+                    "source_lang": source_lang,
+                    "target_lang": target_lang,
+                    "latency_ms": 0,
+                    "quality": 1.0
+                }
+            
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    target_lang = tasks[task]
+                    if task.cancelled():
+                        continue
+                    if task.exception() is not None:
+                        print(f"❌ 翻譯失敗 {target_lang}: {task.exception()}")
+                        yield target_lang, {
+                            "text": text,
+                            "source_lang": source_lang,
+                            "target_lang": target_lang,
+                            "latency_ms": 0,
+                            "quality": 0.0,
+                            "error": str(task.exception())
+                        }
+                    else:
+                        yield target_lang, task.result()
+        finally:
+            # 呼叫端提前結束（例如被取消）時，不再等待剩餘的翻譯
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
     def _should_use_mock(self) -> bool:
         """檢查是否應該使用模擬翻譯服務"""
         # 如果明確設定為 mock 模式
@@ -246,11 +377,9 @@ class TranslationService:
         return False
 
 def detect_language(text: str) -> str:
-    """檢測文字語言"""
-    try:
-        return detect(text)
-    except:
-        return "en"  # 預設為英文
+    """檢測文字語言（依文字系統分類，結果可重現且已快取）"""
+    lang, _ = detect_language_with_confidence(text)
+    return lang
 
 # 全域翻譯服務實例
 translation_service = TranslationService()
\ No newline at end of file
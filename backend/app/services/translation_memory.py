@@ -0,0 +1,156 @@
+"""
+翻譯記憶 (Translation Memory)
+已儲存的翻譯寫入 translation_memory 表，之後相同或近似的原文
+（pg_trgm 相似度達門檻）直接由記憶回傳，不再呼叫翻譯供應商
+查詢時只短暫取用資料庫連線，呼叫翻譯供應商期間不佔用連線
+"""
+
+import asyncio
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import asyncpg
+
+from ..db.pool import get_db_pool
+from ..db.repo import TranslationMemoryRepo
+from .translate import translation_service
+
+_PUNCTUATION = re.compile(r"[\s\.,!?;:，。！？；：、…\"'「」『』（）()]+")
+
+
+def normalize_source(text: str) -> str:
+    """正規化原文作為比對鍵：小寫、去除標點並壓縮空白"""
+    return _PUNCTUATION.sub(" ", text.lower()).strip()
+
+
+class TranslationMemory:
+    def __init__(self):
+        self.enabled = os.getenv("TM_ENABLED", "true").lower() == "true"
+        self.threshold = float(os.getenv("TM_SIMILARITY_THRESHOLD", "0.9"))
+        self.prewarm_limit = int(os.getenv("TM_PREWARM_LIMIT", "500"))
+        # 房間 -> (正規化原文, 目標語言) -> 翻譯，房間開始時預熱
+        self.warm: Dict[str, Dict[Tuple[str, str], Dict]] = {}
+
+    def _hit(self, text: str, target_lang: str, source_lang: Optional[str],
+             translated: str, quality: Optional[float], score: float) -> Dict:
+        return {
+            "text": translated,
+            "source_lang": source_lang,
+            "target_lang": target_lang,
+            "latency_ms": 0,
+            "quality": quality if quality is not None else 1.0,
+            "provider": "translation_memory",
+            "tm_score": round(score, 3)
+        }
+
+    async def lookup(self, room_id: Optional[str], text: str,
+                     target_langs: List[str], source_lang: Optional[str] = None) -> Dict[str, Dict]:
+        """查詢翻譯記憶：先查房間預熱快取，再以 trigram 查資料庫"""
+        if not self.enabled or not target_langs:
+            return {}
+
+        source_norm = normalize_source(text)
+        if not source_norm:
+            return {}
+
+        hits = {}
+        warm = self.warm.get(room_id, {})
+        for target_lang in target_langs:
+            entry = warm.get((source_norm, target_lang))
+            if entry:
+                hits[target_lang] = self._hit(text, target_lang, source_lang, entry["text"], entry["quality"], 1.0)
+
+        remaining = [lang for lang in target_langs if lang not in hits]
+        if remaining:
+            try:
+                pool = await get_db_pool()
+                async with pool.acquire() as db:
+                    repo = TranslationMemoryRepo(db)
+                    for row in await repo.find_matches(source_norm, remaining, self.threshold):
+                        hits[row["target_lang"]] = self._hit(
+                            text, row["target_lang"], source_lang, row["text"], row["quality"], row["score"]
+                        )
+                    if hits:
+                        await repo.record_hits(source_norm, list(hits.keys()))
+            except Exception as e:
+                print(f"⚠️ 翻譯記憶查詢失敗: {e}")
+
+        if hits:
+            print(f"📚 翻譯記憶命中 {len(hits)}/{len(target_langs)} 個語言: {list(hits.keys())}")
+        return hits
+
+    async def iter_translate(self, room_id: Optional[str], text: str,
+                             target_langs: List[str], source_lang: Optional[str] = None,
+                             lang_tasks: Optional[Dict[str, asyncio.Task]] = None):
+        """先產出翻譯記憶命中的語言，再依完成順序產出供應商翻譯的語言（lang_tasks 見 TranslationService.iter_translate）"""
+        start_time = time.time()
+        hits = await self.lookup(room_id, text, target_langs, source_lang)
+        for target_lang in target_langs:
+            if target_lang in hits:
+                hits[target_lang]["latency_ms"] = int((time.time() - start_time) * 1000)
+                yield target_lang, hits[target_lang]
+
+        misses = [lang for lang in target_langs if lang not in hits]
+        if misses:
+            async for target_lang, result in translation_service.iter_translate(text, misses, source_lang, lang_tasks):
+                yield target_lang, result
+
+    async def batch_translate(self, room_id: Optional[str], text: str,
+                              target_langs: List[str], source_lang: Optional[str] = None) -> Dict[str, Dict]:
+        """先從翻譯記憶取得結果，只把未命中的語言送給翻譯供應商"""
+        return {
+            target_lang: result
+            async for target_lang, result in self.iter_translate(room_id, text, target_langs, source_lang)
+        }
+
+    async def remember(self, db: asyncpg.Connection, room_id: Optional[str], text: str,
+                       source_lang: Optional[str], translations: Dict[str, Dict]):
+        """把成功的供應商翻譯寫入記憶（略過記憶命中、模擬、失敗與原文照搬的結果）"""
+        if not self.enabled:
+            return
+
+        source_norm = normalize_source(text)
+        if not source_norm:
+            return
+
+        repo = TranslationMemoryRepo(db)
+        warm = self.warm.get(room_id)
+        for target_lang, translation in translations.items():
+            if (translation.get("provider") in ("translation_memory", "mock") or translation.get("error")
+                    or translation["text"] == text):
+                continue
+            try:
+                await repo.upsert(room_id, source_lang, text, source_norm, target_lang,
+                                  translation["text"], translation.get("quality"))
+            except Exception as e:
+                print(f"⚠️ 翻譯記憶寫入失敗: {e}")
+                return
+            if warm is not None:
+                warm[(source_norm, target_lang)] = {"text": translation["text"], "quality": translation.get("quality")}
+
+    async def prewarm_room(self, room_id: str):
+        """房間開始時載入常用翻譯記憶，讓重複出現的句子不必再查詢"""
+        if not self.enabled or room_id in self.warm:
+            return
+
+        self.warm[room_id] = {}
+        try:
+            pool = await get_db_pool()
+            async with pool.acquire() as db:
+                entries = await TranslationMemoryRepo(db).get_room_entries(room_id, self.prewarm_limit)
+            for entry in entries:
+                self.warm[room_id][(entry["source_norm"], entry["target_lang"])] = {
+                    "text": entry["text"], "quality": entry["quality"]
+                }
+            print(f"📚 房間 {room_id[:8]}... 預熱翻譯記憶 {len(entries)} 筆")
+        except Exception as e:
+            print(f"⚠️ 翻譯記憶預熱失敗: {e}")
+
+    def evict_room(self, room_id: str):
+        """房間結束時釋放預熱快取"""
+        self.warm.pop(room_id, None)
+
+# 全域翻譯記憶實例
+translation_memory = TranslationMemory()
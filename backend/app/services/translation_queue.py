@@ -0,0 +1,157 @@
+"""
+翻譯工作佇列
+TRANSLATION_QUEUE=inline（預設）時翻譯流程在收到請求的 web 行程背景執行；
+TRANSLATION_QUEUE=postgres 時寫入 translation_job 表，由獨立的 worker 行程（python -m app.worker）
+以 FOR UPDATE SKIP LOCKED 取得工作執行，結果經 relay 轉回持有 WebSocket 的 web 行程
+同一房間的工作依序執行（等待重試的工作不阻塞後續工作）；執行中定期延長租約，worker 中斷時租約過期後由其他 worker 重跑（至少一次）
+worker 不在翻譯期間佔用資料庫連線，LISTEN 使用連線池外的專用連線
+inline 模式下同一房間的翻譯平行執行，送進流程時取得房間內序號，由 hub 依序送出字幕
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set
+
+from fastapi import BackgroundTasks
+
+from ..db.pool import ACQUIRE_TIMEOUT_S, connect_listener, get_db_pool
+from ..db.repo import TranslationJobRepo
+from ..metrics import metrics
+from ..ws.hub import manager
+from .pipeline import run_translation_pipeline
+
+
+class TranslationQueue:
+    def __init__(self):
+        self.mode = os.getenv("TRANSLATION_QUEUE", "inline")
+        self.lease_s = float(os.getenv("TRANSLATION_JOB_LEASE_S", "60"))
+        self.max_attempts = int(os.getenv("TRANSLATION_JOB_MAX_ATTEMPTS", "5"))
+        self.concurrency = int(os.getenv("TRANSLATION_WORKER_CONCURRENCY", "4"))
+        self.poll_s = float(os.getenv("TRANSLATION_WORKER_POLL_S", "2"))
+        self.retention_h = float(os.getenv("TRANSLATION_JOB_RETENTION_H", "24"))
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def durable(self) -> bool:
+        return self.mode == "postgres"
+
+    async def submit(self, background_tasks: Optional[BackgroundTasks], message_id: str, room_id: str,
+                     speaker_id: str, text: str, source_lang: Optional[str], **options):
+        """交付一則訊息的翻譯流程；options 與 run_translation_pipeline 的關鍵字參數相同"""
+        kwargs = dict(message_id=message_id, room_id=room_id, speaker_id=speaker_id,
+                      text=text, source_lang=source_lang, **options)
+        if not self.durable:
+            kwargs["sequence"] = manager.next_sequence(room_id)
+            if background_tasks is not None:
+                background_tasks.add_task(run_translation_pipeline, **kwargs)
+            else:
+                task = asyncio.create_task(run_translation_pipeline(**kwargs))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            return
+
+        # 延遲從收到請求開始計算（包含佇列等待時間）
+        kwargs.setdefault("received_at", time.time())
+        pool = await get_db_pool()
+        async with pool.acquire() as db:
+            if await TranslationJobRepo(db).enqueue(message_id, room_id, kwargs):
+                metrics.inc("translation_jobs_enqueued")
+            else:
+                metrics.inc("translation_jobs_duplicate")
+
+    # ── worker 行程 ──────────────────────────────────────────────
+    async def run_worker(self):
+        """執行 TRANSLATION_WORKER_CONCURRENCY 個消費者，直到行程結束"""
+        wake = asyncio.Event()
+        pool = await get_db_pool()
+        if pool.get_max_size() <= self.concurrency:
+            print(f"⚠️ 連線池上限 {pool.get_max_size()} 不大於 worker 併發 {self.concurrency}，"
+                  f"建議把 DB_POOL_MAX_SIZE 設為 {self.concurrency + 2} 以上")
+        listen_conn = await connect_listener()
+        await listen_conn.add_listener("translation_job", lambda *args: wake.set())
+        print(f"👷 翻譯 worker 啟動 (併發: {self.concurrency}, 租約: {self.lease_s:.0f} 秒)")
+        try:
+            await asyncio.gather(*[self._consume(wake) for _ in range(self.concurrency)], self._purge_loop())
+        finally:
+            await listen_conn.close()
+
+    async def _consume(self, wake: asyncio.Event):
+        pool = await get_db_pool()
+        while True:
+            try:
+                async with pool.acquire(timeout=ACQUIRE_TIMEOUT_S) as db:
+                    job = await TranslationJobRepo(db).claim(self.lease_s)
+            except Exception as e:
+                print(f"⚠️ 取得翻譯工作失敗: {e}")
+                job = None
+
+            if job is None:
+                # 沒有工作時等待 NOTIFY 喚醒，同時定期輪詢（處理重試延後與租約過期的工作）
+                wake.clear()
+                try:
+                    await asyncio.wait_for(wake.wait(), self.poll_s)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._execute(job)
+
+    async def _execute(self, job: Dict):
+        waited_ms = (datetime.now(timezone.utc) - job["created_at"]).total_seconds() * 1000
+        metrics.observe("translation_job_wait_ms", waited_ms)
+        pool = await get_db_pool()
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        try:
+            await run_translation_pipeline(**job["payload"], raise_errors=True)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            async with pool.acquire(timeout=ACQUIRE_TIMEOUT_S) as db:
+                repo = TranslationJobRepo(db)
+                if job["attempts"] >= self.max_attempts:
+                    await repo.fail(job["id"], error)
+                    metrics.inc("translation_jobs_failed")
+                    print(f"❌ 翻譯工作 {job['id']} 重試 {job['attempts']} 次仍失敗: {error}")
+                else:
+                    await repo.retry_later(job["id"], min(60, 2 ** job["attempts"]), error)
+                    metrics.inc("translation_jobs_retried")
+            return
+        finally:
+            heartbeat.cancel()
+
+        async with pool.acquire(timeout=ACQUIRE_TIMEOUT_S) as db:
+            await TranslationJobRepo(db).complete(job["id"])
+        metrics.inc("translation_jobs_completed")
+        if job["attempts"] > 1:
+            # 重跑的工作可能重複送出字幕，前端以 messageId 就地取代
+            metrics.inc("translation_jobs_redelivered")
+
+    async def _heartbeat(self, job: Dict):
+        """執行期間每隔租約的三分之一延長一次，執行超過租約的工作不會被其他 worker 重跑"""
+        pool = await get_db_pool()
+        while True:
+            await asyncio.sleep(self.lease_s / 3)
+            try:
+                async with pool.acquire(timeout=ACQUIRE_TIMEOUT_S) as db:
+                    renewed = await TranslationJobRepo(db).renew_lease(job["id"], job["attempts"], self.lease_s)
+                if not renewed:
+                    print(f"⚠️ 翻譯工作 {job['id']} 的租約已失效")
+                    return
+            except Exception as e:
+                print(f"⚠️ 翻譯工作租約更新失敗 {job['id']}: {e}")
+
+    async def _purge_loop(self):
+        while True:
+            await asyncio.sleep(3600)
+            try:
+                pool = await get_db_pool()
+                async with pool.acquire() as db:
+                    purged = await TranslationJobRepo(db).purge_finished(self.retention_h)
+                if purged:
+                    print(f"🧹 已清除 {purged} 筆結束的翻譯工作")
+            except Exception as e:
+                print(f"⚠️ 清除翻譯工作失敗: {e}")
+
+# 全域翻譯佇列實例
+translation_queue = TranslationQueue()
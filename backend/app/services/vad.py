@@ -0,0 +1,70 @@
+"""
+語音活動偵測 (VAD)
+以 NumPy 計算 16kHz PCM 每個音框的能量，找出語音範圍以裁掉前後靜音；
+完全沒有語音的片段由 audio_normalize 直接拒絕，不呼叫任何供應商
+"""
+
+import importlib.util
+import os
+from typing import Dict, Optional, Tuple
+
+SAMPLE_RATE = 16000
+
+
+def detect_speech(samples, frame_ms: int, margin_db: float, min_dbfs: float, max_dbfs: float,
+                  min_speech_ms: int, pad_ms: int) -> Optional[Tuple[int, int]]:
+    """回傳語音範圍 (起始樣本, 結束樣本)，沒有足夠語音時回傳 None"""
+    import numpy as np
+
+    frame_len = SAMPLE_RATE * frame_ms // 1000
+    frame_count = len(samples) // frame_len
+    if frame_count == 0:
+        return None
+
+    frames = samples[:frame_count * frame_len].astype(np.float32).reshape(frame_count, frame_len) / 32768.0
+    rms = np.sqrt(np.mean(frames ** 2, axis=1))
+    energy_db = 20 * np.log10(np.maximum(rms, 1e-6))
+
+    # 以最安靜的 10% 音框估計背景噪音
+    noise_floor = float(np.percentile(energy_db, 10))
+    threshold = min(max(noise_floor + margin_db, min_dbfs), max_dbfs)
+    voiced = np.flatnonzero(energy_db > threshold)
+    if len(voiced) * frame_ms < min_speech_ms:
+        return None
+
+    pad = SAMPLE_RATE * pad_ms // 1000
+    start = max(0, int(voiced[0]) * frame_len - pad)
+    end = min(len(samples), (int(voiced[-1]) + 1) * frame_len + pad)
+    return start, end
+
+
+class VADService:
+    def __init__(self):
+        self.frame_ms = int(os.getenv("VAD_FRAME_MS", "30"))
+        # 門檻 = 背景噪音 + margin，限制在 [VAD_MIN_DBFS, VAD_MAX_DBFS] 之間；
+        # 上限讓整段都在說話（沒有安靜音框可估噪音）時不會被誤判為靜音
+        self.margin_db = float(os.getenv("VAD_MARGIN_DB", "10"))
+        self.min_dbfs = float(os.getenv("VAD_MIN_DBFS", "-50"))
+        self.max_dbfs = float(os.getenv("VAD_MAX_DBFS", "-30"))
+        self.min_speech_ms = int(os.getenv("VAD_MIN_SPEECH_MS", "250"))
+        self.pad_ms = int(os.getenv("VAD_PAD_MS", "200"))
+        self.enabled = self._is_enabled()
+
+    @property
+    def params(self) -> Dict:
+        """傳給工作行程的偵測參數"""
+        return {
+            "frame_ms": self.frame_ms, "margin_db": self.margin_db, "min_dbfs": self.min_dbfs,
+            "max_dbfs": self.max_dbfs, "min_speech_ms": self.min_speech_ms, "pad_ms": self.pad_ms
+        }
+
+    def _is_enabled(self) -> bool:
+        if os.getenv("VAD_ENABLED", "true").lower() != "true":
+            return False
+        if importlib.util.find_spec("numpy") is None:
+            print("⚠️  未安裝 numpy，停用語音活動偵測")
+            return False
+        return True
+
+# 全域語音活動偵測實例
+vad_service = VADService()
@@ -0,0 +1,102 @@
+"""
+常駐行程池與微批次工具
+本地模型（離線翻譯、本地語音辨識）在每個工作行程只載入一次，
+同時抵達的請求依 key 合併成一批送進行程池
+"""
+
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+def _ping(delay_s: float) -> int:
+    # 讓每個工作行程都被啟動並執行 initializer（模型載入）
+    time.sleep(delay_s)
+    return multiprocessing.current_process().pid
+
+
+class WarmProcessPool:
+    """以 spawn 啟動的行程池，initializer 負責在工作行程內載入模型"""
+
+    def __init__(self, name: str, workers: int, initializer: Optional[Callable] = None,
+                 initargs: Tuple = ()):
+        self.name = name
+        self.workers = max(1, workers)
+        self.initializer = initializer
+        self.initargs = initargs
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # 使用 spawn 避免 fork 時複製事件迴圈與執行緒狀態
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self.initializer,
+                initargs=self.initargs,
+            )
+        return self._executor
+
+    async def run(self, fn: Callable, *args) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    async def warm_up(self):
+        """預先啟動所有工作行程，避免第一個請求承擔模型載入時間"""
+        start_time = time.time()
+        pids = await asyncio.gather(*[self.run(_ping, 0.2) for _ in range(self.workers)])
+        print(f"🔥 {self.name} 行程池已預熱 {len(set(pids))} 個工作行程，耗時 {time.time() - start_time:.2f} 秒")
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class MicroBatcher:
+    """
+    依 key 收集請求，累積到 max_batch 筆或等待 max_wait_ms 後一起交給 handler
+    handler(key, items) 需回傳與 items 等長的結果列表
+    """
+
+    def __init__(self, handler: Callable[[Hashable, List[Any]], Awaitable[List[Any]]],
+                 max_batch: int = 16, max_wait_ms: float = 10):
+        self.handler = handler
+        self.max_batch = max_batch
+        self.max_wait_s = max_wait_ms / 1000
+        self._pending: Dict[Hashable, List[Tuple[Any, asyncio.Future]]] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+
+    async def submit(self, key: Hashable, item: Any) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        batch = self._pending.setdefault(key, [])
+        batch.append((item, future))
+
+        if len(batch) >= self.max_batch:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = asyncio.get_running_loop().call_later(self.max_wait_s, self._flush, key)
+        return await future
+
+    def _flush(self, key: Hashable):
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        if batch:
+            asyncio.create_task(self._run(key, batch))
+
+    async def _run(self, key: Hashable, batch: List[Tuple[Any, asyncio.Future]]):
+        try:
+            results = await self.handler(key, [item for item, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
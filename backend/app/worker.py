@@ -0,0 +1,42 @@
+"""
+翻譯 worker 行程
+從 translation_job 佇列取得工作執行翻譯流程，字幕經 relay 轉回 web 行程
+啟動方式：TRANSLATION_QUEUE=postgres python -m app.worker（可同時啟動多個行程）
+"""
+
+import asyncio
+import os
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+async def main():
+    from .db.pool import close_db, init_db
+    from .services.translation_queue import translation_queue
+    from .ws.hub import manager
+
+    if not translation_queue.durable:
+        print("❌ 翻譯 worker 需要 TRANSLATION_QUEUE=postgres")
+        sys.exit(1)
+
+    await init_db()
+    # 本行程沒有 WebSocket 連線，送出的訊息一律轉給 web 行程
+    manager.remote = True
+    if os.getenv("TRANSLATE_PROVIDER") == "local" or "local" in os.getenv("TRANSLATE_FALLBACK_PROVIDERS", ""):
+        from .services.local_translate import local_translate_service
+        await local_translate_service.warm_up()
+    try:
+        await translation_queue.run_worker()
+    finally:
+        from .services.executors import shutdown_executors
+        shutdown_executors()
+        if "app.services.local_translate" in sys.modules:
+            sys.modules["app.services.local_translate"].local_translate_service.shutdown()
+        await close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,9 +1,12 @@
 from fastapi import WebSocket, WebSocketDisconnect
 from typing import Dict, List, Set
+import asyncio
 import json
 from datetime import datetime
 from jose import jwt, JWTError
 import os
+from .relay import relay
+from .reorder import ReorderBuffer
 
 class ConnectionManager:
     def __init__(self):
@@ -11,6 +14,10 @@ class ConnectionManager:
         self.rooms: Dict[str, Dict[str, WebSocket]] = {}
         # WebSocket -> (room_id, user_id) 的反向對映
         self.connections: Dict[WebSocket, tuple] = {}
+        # 翻譯 worker 行程沒有連線：送出的訊息改由 relay 轉給 web 行程
+        self.remote = False
+        # 同一房間的字幕依訊息序號送出
+        self.reorder = ReorderBuffer(self._deliver_frame)
     
     async def connect(self, websocket: WebSocket, room_id: str, user_id: str, token: str):
         """建立 WebSocket 連線"""
@@ -24,6 +31,9 @@ class ConnectionManager:
         # 初始化房間
         if room_id not in self.rooms:
             self.rooms[room_id] = {}
+            # 房間開始時在背景預熱翻譯記憶
+            from ..services.translation_memory import translation_memory
+            asyncio.create_task(translation_memory.prewarm_room(room_id))
         
         # 斷開該使用者的舊連線（如果存在）
         if user_id in self.rooms[room_id]:
@@ -38,6 +48,11 @@ class ConnectionManager:
         # 建立新連線
         self.rooms[room_id][user_id] = websocket
         self.connections[websocket] = (room_id, user_id)
+        if relay.enabled:
+            try:
+                await relay.join(room_id, user_id)
+            except Exception as e:
+                print(f"⚠️ 在線名單寫入失敗: {e}")
         
         # 發送連線成功訊息
         await self.send_to_websocket(websocket, {
@@ -67,6 +82,11 @@ class ConnectionManager:
         
         if room_id in self.rooms and user_id in self.rooms[room_id]:
             del self.rooms[room_id][user_id]
+            if relay.enabled:
+                try:
+                    await relay.leave(room_id, user_id)
+                except Exception as e:
+                    print(f"⚠️ 在線名單移除失敗: {e}")
             
             # 廣播用戶斷線訊息給房間內其他用戶（在刪除用戶之後但房間還存在時）
             if self.rooms[room_id]:  # 如果房間還有其他用戶
@@ -79,21 +99,42 @@ class ConnectionManager:
                     "timestamp": datetime.utcnow().isoformat()
                 })
             
+            # 丟棄該使用者尚未完成的即時字幕
+            from ..services.live_caption import live_caption_service
+            live_caption_service.finish(room_id, user_id)
+            live_caption_service.listener_left(room_id, user_id)
+            
+            # 取消沒人會看到的翻譯（啟用 relay 時其他行程可能仍有連線，只處理個別聽眾）
+            from ..services.inflight import inflight
+            if self.rooms[room_id] or relay.enabled:
+                inflight.listener_left(room_id, user_id)
+            else:
+                inflight.room_emptied(room_id)
+            
             # 如果房間沒有人了，清除房間
             if not self.rooms[room_id]:
                 del self.rooms[room_id]
+                from ..services.translation_memory import translation_memory
+                translation_memory.evict_room(room_id)
+                self.reorder.forget_room(room_id)
         
         remaining_users = len(self.rooms.get(room_id, {}))
         print(f"User {user_id} disconnected from room {room_id} (剩餘人數: {remaining_users})")
     
     async def send_to_user(self, room_id: str, user_id: str, message: dict):
         """發送訊息給特定使用者"""
+        if self.remote:
+            await relay.publish(room_id, message, user_id)
+            return
         if room_id in self.rooms and user_id in self.rooms[room_id]:
             websocket = self.rooms[room_id][user_id]
             await self.send_to_websocket(websocket, message)
     
     async def broadcast_to_room(self, room_id: str, message: dict):
         """廣播訊息給房間內所有使用者"""
+        if self.remote:
+            await relay.publish(room_id, message)
+            return
         if room_id in self.rooms:
             # 只保留簡單的廣播日誌
             if message.get('type') == 'board.post':
@@ -112,6 +153,29 @@ class ConnectionManager:
             for websocket, room_id, user_id in disconnected:
                 await self.disconnect(websocket, room_id, user_id)
     
+    def next_sequence(self, room_id: str):
+        """新訊息進入翻譯流程前取得房間內的序號（None 代表不排序）"""
+        return self.reorder.next_sequence(room_id)
+    
+    async def send_ordered(self, room_id: str, sequence, message: dict, user_id: str = None):
+        """依訊息序號送出（user_id 為 None 時廣播給房間）"""
+        if sequence is None:
+            await self._deliver_frame(room_id, (user_id, message))
+        else:
+            await self.reorder.send(room_id, sequence, (user_id, message))
+    
+    async def finish_sequence(self, room_id: str, sequence, target_lang: str = None):
+        """訊息的字幕已全部送出（指定 target_lang 時只有該語言），放行房間內的下一則訊息"""
+        if sequence is not None:
+            await self.reorder.finish(room_id, sequence, target_lang)
+    
+    async def _deliver_frame(self, room_id: str, frame: tuple):
+        user_id, message = frame
+        if user_id:
+            await self.send_to_user(room_id, user_id, message)
+        else:
+            await self.broadcast_to_room(room_id, message)
+    
     async def send_to_websocket(self, websocket: WebSocket, message: dict):
         """發送訊息給 WebSocket 連線"""
         try:
@@ -133,6 +197,9 @@ class ConnectionManager:
             if message_type == "client.prefLang.update":
                 # 處理使用者語言偏好更新
                 await self._handle_pref_lang_update(websocket, message)
+            elif message_type == "caption.partial":
+                # 說話者的中間稿：只更新記憶體中的即時字幕，不寫入資料庫
+                await self._handle_caption_partial(websocket, message)
             elif message_type == "ping":
                 # 處理心跳
                 await self.send_to_websocket(websocket, {"type": "pong"})
@@ -148,11 +215,23 @@ class ConnectionManager:
             })
     
     async def get_room_users(self, room_id: str) -> List[str]:
-        """取得房間內的使用者列表"""
+        """取得房間內的使用者列表（啟用 relay 時包含所有行程的連線）"""
+        if relay.enabled:
+            try:
+                return await relay.room_users(room_id)
+            except Exception as e:
+                print(f"⚠️ 在線名單查詢失敗，改用本行程連線: {e}")
         if room_id in self.rooms:
             return list(self.rooms[room_id].keys())
         return []
     
+    async def deliver_relayed(self, event: dict):
+        """送出 worker 行程經 relay 轉來的訊息給本行程的連線"""
+        if event.get("user"):
+            await self.send_to_user(event["room"], event["user"], event["message"])
+        else:
+            await self.broadcast_to_room(event["room"], event["message"])
+    
     async def get_room_count(self, room_id: str) -> int:
         """取得房間內的使用者數量"""
         if room_id in self.rooms:
@@ -172,6 +251,23 @@ class ConnectionManager:
         except JWTError:
             return False
     
+    async def _handle_caption_partial(self, websocket: WebSocket, message: dict):
+        """處理說話者透過 WebSocket 送出的中間稿"""
+        if websocket not in self.connections or not message.get("text"):
+            return
+        room_id, user_id = self.connections[websocket]
+        source_lang = message.get("sourceLang")
+        if not source_lang:
+            from ..services.lang_detect import detect_language_with_confidence
+            source_lang, _ = detect_language_with_confidence(message["text"])
+        
+        from ..services.live_caption import live_caption_service
+        utterance_id = live_caption_service.update(room_id, user_id, message["text"], source_lang)
+        await self.send_to_websocket(websocket, {
+            "type": "caption.partial.ack",
+            "messageId": utterance_id
+        })
+    
     async def _handle_pref_lang_update(self, websocket: WebSocket, message: dict):
         """處理使用者語言偏好更新"""
         # 這裡可以觸發重新翻譯最近的訊息，或通知其他服務
@@ -0,0 +1,94 @@
+"""
+跨行程的 WebSocket 轉送
+翻譯 worker 行程沒有 WebSocket 連線：要送出的訊息以 Postgres NOTIFY 發佈，
+持有連線的 web 行程 LISTEN 後送給本地的使用者；在線名單記在 room_presence 表
+只在 TRANSLATION_QUEUE=postgres 時啟用
+"""
+
+import asyncio
+import json
+import os
+import socket
+from typing import Awaitable, Callable, List, Optional
+
+from ..db.pool import ACQUIRE_TIMEOUT_S, connect_listener, get_db_pool
+from ..db.repo import PresenceRepo
+
+CHANNEL = "hub_events"
+# NOTIFY 的 payload 上限為 8000 bytes
+MAX_PAYLOAD_BYTES = 7900
+
+
+class HubRelay:
+    def __init__(self):
+        self.enabled = os.getenv("TRANSLATION_QUEUE", "inline") == "postgres"
+        self.instance_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stale_s = float(os.getenv("PRESENCE_STALE_S", "90"))
+        self._listen_conn = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self, deliver: Callable[[dict], Awaitable]):
+        """web 行程：LISTEN 轉送頻道並定期更新本行程連線的存活時間（LISTEN 使用連線池外的專用連線）"""
+        self._listen_conn = await connect_listener()
+        # 依收到的順序逐一送出，維持同一房間內的訊息順序
+        events: asyncio.Queue = asyncio.Queue()
+
+        def on_notify(connection, pid, channel, payload):
+            events.put_nowait(json.loads(payload))
+
+        async def deliver_loop():
+            while True:
+                event = await events.get()
+                try:
+                    await deliver(event)
+                except Exception as e:
+                    print(f"Error delivering relayed message: {e}")
+
+        await self._listen_conn.add_listener(CHANNEL, on_notify)
+        self._tasks = [asyncio.create_task(deliver_loop()), asyncio.create_task(self._touch_loop())]
+        print(f"📮 已訂閱跨行程轉送 ({self.instance_id})")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        if self._listen_conn is not None:
+            await self._listen_conn.close()
+            self._listen_conn = None
+
+    async def _touch_loop(self):
+        while True:
+            await asyncio.sleep(self.stale_s / 3)
+            try:
+                pool = await get_db_pool()
+                async with pool.acquire() as db:
+                    await PresenceRepo(db).touch(self.instance_id)
+            except Exception as e:
+                print(f"⚠️ 在線名單更新失敗: {e}")
+
+    async def publish(self, room_id: str, message: dict, user_id: Optional[str] = None):
+        """worker 行程：發佈訊息給房間（或房間內的特定使用者）"""
+        payload = json.dumps({"room": room_id, "user": user_id, "message": message}, ensure_ascii=False)
+        if len(payload.encode("utf-8")) > MAX_PAYLOAD_BYTES:
+            print(f"⚠️ 轉送訊息過大 ({message.get('type')})，略過；內容仍已寫入資料庫")
+            return
+        pool = await get_db_pool()
+        async with pool.acquire(timeout=ACQUIRE_TIMEOUT_S) as db:
+            await db.execute("SELECT pg_notify($1, $2)", CHANNEL, payload)
+
+    async def join(self, room_id: str, user_id: str):
+        pool = await get_db_pool()
+        async with pool.acquire() as db:
+            await PresenceRepo(db).join(room_id, user_id, self.instance_id)
+
+    async def leave(self, room_id: str, user_id: str):
+        pool = await get_db_pool()
+        async with pool.acquire() as db:
+            await PresenceRepo(db).leave(room_id, user_id, self.instance_id)
+
+    async def room_users(self, room_id: str) -> List[str]:
+        pool = await get_db_pool()
+        async with pool.acquire() as db:
+            return await PresenceRepo(db).get_room_users(room_id, self.stale_s)
+
+# 全域跨行程轉送實例
+relay = HubRelay()
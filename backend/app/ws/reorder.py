@@ -0,0 +1,166 @@
+"""
+房間內依序送出字幕
+同一房間的訊息在送進翻譯流程時取得遞增序號，翻譯仍平行執行；
+送出時依目標語言分開排序：同一語言中序號較新的訊息先暫存，等較舊的訊息在該語言送完（或整則完成）才放行，
+避免短句的字幕跑到長句前面，也不讓較慢的語言擋住其他語言的字幕
+較舊的訊息在某個語言超過 ORDERED_EMIT_TIMEOUT_S 仍未送出時，該語言跳過它，不讓卡住的訊息擋住整個房間
+"""
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from ..metrics import metrics
+
+# (user_id，None 代表廣播給房間, 訊息)
+Frame = Tuple[Optional[str], dict]
+
+
+class LaneOrder:
+    """房間內單一目標語言的排序狀態"""
+
+    def __init__(self):
+        # 在這個語言已送完（或逾時跳過）的序號
+        self.finished: Set[int] = set()
+        self.pending: Dict[int, List[Tuple[Frame, float]]] = {}
+        self.timer: Optional[asyncio.Task] = None
+
+
+class RoomOrder:
+    def __init__(self):
+        self.assigned = 0
+        # 最舊的未完成序號（更舊的訊息所有語言都已完成）
+        self.head = 1
+        self.finished: Set[int] = set()
+        self.lanes: Dict[Optional[str], LaneOrder] = {}
+        # 房間已沒有連線：最後一則訊息完成後清除狀態
+        self.closed = False
+
+    def lane_head(self, lane: LaneOrder) -> int:
+        """此語言目前允許送出的最舊序號"""
+        head = self.head
+        while head in self.finished or head in lane.finished:
+            head += 1
+        return head
+
+    @property
+    def idle(self) -> bool:
+        return self.head > self.assigned and not any(lane.pending for lane in self.lanes.values())
+
+
+class ReorderBuffer:
+    def __init__(self, deliver: Callable[[str, Frame], Awaitable]):
+        self.deliver = deliver
+        self.enabled = os.getenv("ORDERED_EMIT_ENABLED", "true").lower() == "true"
+        self.timeout_s = float(os.getenv("ORDERED_EMIT_TIMEOUT_S", "3"))
+        self.rooms: Dict[str, RoomOrder] = {}
+
+    def next_sequence(self, room_id: str) -> Optional[int]:
+        """為房間的新訊息取得序號；停用時回傳 None（不排序）"""
+        if not self.enabled:
+            return None
+        order = self.rooms.setdefault(room_id, RoomOrder())
+        order.closed = False
+        order.assigned += 1
+        return order.assigned
+
+    async def send(self, room_id: str, sequence: int, frame: Frame):
+        """輪到此序號（在訊息的目標語言中）時直接送出，否則暫存到較舊的訊息完成（或逾時）"""
+        order = self.rooms.get(room_id)
+        if order is None or sequence < order.head:
+            await self._deliver(room_id, [frame])
+            return
+        lang = frame[1].get("targetLang")
+        lane = order.lanes.get(lang) or LaneOrder()
+        if sequence <= order.lane_head(lane):
+            await self._deliver(room_id, [frame])
+            return
+        order.lanes[lang] = lane
+        lane.pending.setdefault(sequence, []).append((frame, time.monotonic()))
+        metrics.inc("ordered_emit_buffered")
+        self._arm_timer(room_id, order, lang, lane)
+
+    async def finish(self, room_id: str, sequence: int, lang: Optional[str] = None):
+        """
+        訊息的字幕已送出，放行下一個序號
+        lang 為 None 時代表整則訊息完成（所有語言），否則只放行該語言
+        """
+        order = self.rooms.get(room_id)
+        if order is None or sequence < order.head:
+            return
+        if lang is not None:
+            lane = order.lanes.setdefault(lang, LaneOrder())
+            lane.finished.add(sequence)
+            await self._flush(room_id, order, lang, lane)
+            return
+
+        order.finished.add(sequence)
+        while order.head in order.finished:
+            order.finished.discard(order.head)
+            order.head += 1
+        for lang, lane in list(order.lanes.items()):
+            lane.finished = {finished for finished in lane.finished if finished >= order.head}
+            await self._flush(room_id, order, lang, lane)
+        self._cleanup(room_id, order)
+
+    async def _flush(self, room_id: str, order: RoomOrder, lang: Optional[str], lane: LaneOrder):
+        frames: List[Frame] = []
+        head = order.lane_head(lane)
+        for sequence in sorted(lane.pending):
+            if sequence > head:
+                break
+            frames.extend(self._take(lane, sequence))
+        if lane.timer is not None:
+            lane.timer.cancel()
+            lane.timer = None
+        if lane.pending:
+            self._arm_timer(room_id, order, lang, lane)
+        elif not lane.finished and order.lanes.get(lang) is lane:
+            del order.lanes[lang]
+        await self._deliver(room_id, frames)
+
+    def _take(self, lane: LaneOrder, sequence: int) -> List[Frame]:
+        now = time.monotonic()
+        frames = []
+        for frame, buffered_at in lane.pending.pop(sequence, []):
+            metrics.observe("ordered_emit_hold_ms", (now - buffered_at) * 1000)
+            frames.append(frame)
+        return frames
+
+    def _arm_timer(self, room_id: str, order: RoomOrder, lang: Optional[str], lane: LaneOrder):
+        if lane.timer is None:
+            lane.timer = asyncio.create_task(self._expire(room_id, order, lang, lane, order.lane_head(lane)))
+
+    async def _expire(self, room_id: str, order: RoomOrder, lang: Optional[str], lane: LaneOrder, head: int):
+        await asyncio.sleep(self.timeout_s)
+        lane.timer = None
+        if order.lane_head(lane) != head:
+            return
+        # 最舊的訊息在這個語言逾時：此語言視為已送完，之後它送出的字幕不再排序
+        metrics.inc("ordered_emit_timeouts")
+        print(f"⏱️ 房間 {room_id[:8]}... 的第 {head} 則訊息 ({lang}) 逾時未完成，跳過以免阻塞後續字幕")
+        lane.finished.add(head)
+        await self._flush(room_id, order, lang, lane)
+        self._cleanup(room_id, order)
+
+    async def _deliver(self, room_id: str, frames: List[Frame]):
+        for frame in frames:
+            try:
+                await self.deliver(room_id, frame)
+            except Exception as e:
+                print(f"Error sending ordered frame: {e}")
+
+    def _cleanup(self, room_id: str, order: RoomOrder):
+        if order.closed and order.idle and self.rooms.get(room_id) is order:
+            for lane in order.lanes.values():
+                if lane.timer is not None:
+                    lane.timer.cancel()
+            del self.rooms[room_id]
+
+    def forget_room(self, room_id: str):
+        """房間關閉時清除狀態；仍有訊息在翻譯時等最後一則完成後再清除，避免序號重新開始"""
+        order = self.rooms.get(room_id)
+        if order is not None:
+            order.closed = True
+            self._cleanup(room_id, order)
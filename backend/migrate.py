@@ -56,6 +56,78 @@ CREATE TABLE IF NOT EXISTS message_translation (
 CREATE INDEX IF NOT EXISTS idx_message_room_id ON message(room_id);
 CREATE INDEX IF NOT EXISTS idx_message_created_at ON message(created_at);
 CREATE INDEX IF NOT EXISTS idx_message_translation_message_id ON message_translation(message_id);
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE TABLE IF NOT EXISTS translation_memory (
+  id BIGSERIAL PRIMARY KEY,
+  room_id UUID REFERENCES room(id) ON DELETE SET NULL,
+  source_lang TEXT,
+  source_text TEXT NOT NULL,
+  source_norm TEXT NOT NULL,
+  target_lang TEXT NOT NULL,
+  text TEXT NOT NULL,
+  quality REAL,
+  hits INTEGER NOT NULL DEFAULT 0,
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  UNIQUE (source_norm, target_lang)
+);
+
+CREATE INDEX IF NOT EXISTS idx_translation_memory_trgm ON translation_memory USING GIN (source_norm gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_translation_memory_room ON translation_memory(room_id, hits DESC);
+
+CREATE TABLE IF NOT EXISTS transcription_job (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  room_id UUID REFERENCES room(id) ON DELETE CASCADE,
+  user_id UUID REFERENCES app_user(id) ON DELETE SET NULL,
+  file_path TEXT NOT NULL,
+  content_type TEXT,
+  language_code TEXT,
+  target_langs TEXT[] NOT NULL DEFAULT '{}',
+  status TEXT NOT NULL DEFAULT 'queued',
+  total_chunks INTEGER NOT NULL DEFAULT 0,
+  error TEXT,
+  lease_until TIMESTAMPTZ,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS transcription_job_segment (
+  job_id UUID REFERENCES transcription_job(id) ON DELETE CASCADE,
+  idx INTEGER NOT NULL,
+  start_ms INTEGER NOT NULL,
+  end_ms INTEGER NOT NULL,
+  text TEXT,
+  language TEXT,
+  translations JSONB NOT NULL DEFAULT '{}',
+  PRIMARY KEY(job_id, idx)
+);
+
+CREATE INDEX IF NOT EXISTS idx_transcription_job_pending ON transcription_job(status) WHERE status NOT IN ('completed', 'failed');
+
+CREATE TABLE IF NOT EXISTS translation_job (
+  id BIGSERIAL PRIMARY KEY,
+  message_id UUID NOT NULL UNIQUE REFERENCES message(id) ON DELETE CASCADE,
+  room_id UUID NOT NULL REFERENCES room(id) ON DELETE CASCADE,
+  payload JSONB NOT NULL,
+  status TEXT NOT NULL DEFAULT 'queued',
+  attempts INTEGER NOT NULL DEFAULT 0,
+  available_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  lease_until TIMESTAMPTZ,
+  error TEXT,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_translation_job_active ON translation_job(room_id, id) WHERE status IN ('queued', 'running');
+
+CREATE TABLE IF NOT EXISTS room_presence (
+  room_id UUID NOT NULL,
+  user_id UUID NOT NULL,
+  instance_id TEXT NOT NULL,
+  seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY(room_id, user_id)
+);
 """
 
 
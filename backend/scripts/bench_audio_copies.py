@@ -0,0 +1,93 @@
+"""
+上傳音頻到 STT 供應商的記憶體與延遲基準（user-035）
+以 10 MB 的音頻比較改版前後準備供應商請求的成本（不實際呼叫外部 API）：
+- Groq：改版前寫入 NamedTemporaryFile 再開檔讀出；改版後直接以 ("audio.webm", bytes) 交給 SDK
+- Google REST：改版前 base64 → str → json.dumps → bytes；改版後把 base64 位元組直接拼進請求本文
+記憶體為 tracemalloc 量到的尖峰配置量（不含原始音頻本身）
+
+用法（在 backend/ 執行）：
+    python scripts/bench_audio_copies.py --mb 10 --repeat 20
+"""
+
+import argparse
+import base64
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+GOOGLE_CONFIG = {
+    "encoding": "WEBM_OPUS",
+    "sampleRateHertz": 48000,
+    "languageCode": "zh-TW",
+    "alternativeLanguageCodes": ["en-US", "zh-CN", "ja-JP"],
+    "enableAutomaticPunctuation": True,
+    "model": "latest_long",
+}
+
+
+def groq_before(audio: bytes) -> int:
+    """改版前：寫入暫存檔，SDK 再從檔案讀出上傳"""
+    with tempfile.NamedTemporaryFile(suffix=".webm", delete=False) as temp_file:
+        temp_file.write(audio)
+        path = temp_file.name
+    try:
+        with open(path, "rb") as file:
+            return len(file.read())
+    finally:
+        os.unlink(path)
+
+
+def groq_after(audio: bytes) -> int:
+    """改版後：記憶體中的檔案 tuple，SDK 直接使用同一份 bytes"""
+    _, content = ("audio.webm", audio)
+    return len(content)
+
+
+def google_before(audio: bytes) -> int:
+    payload = {"config": GOOGLE_CONFIG, "audio": {"content": base64.b64encode(audio).decode("utf-8")}}
+    # httpx 的 json= 會先 json.dumps 再編碼為 bytes
+    return len(json.dumps(payload).encode("utf-8"))
+
+
+def google_after(audio: bytes) -> int:
+    body = b"".join([
+        b'{"config":', json.dumps(GOOGLE_CONFIG).encode("utf-8"),
+        b',"audio":{"content":"', base64.b64encode(audio), b'"}}'
+    ])
+    return len(body)
+
+
+def measure(fn, audio: bytes, repeat: int):
+    """回傳 (延遲中位數毫秒, 尖峰配置 MB)"""
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(audio)
+        latencies.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    fn(audio)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(latencies), peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=10, help="音頻大小 (MB)")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    audio = os.urandom(int(args.mb * 1024 * 1024))
+
+    print(f"{args.mb:g} MB 音頻，重複 {args.repeat} 次")
+    print("路徑           版本      延遲 p50(ms)  尖峰配置(MB)")
+    for label, before, after in (("Groq", groq_before, groq_after), ("Google REST", google_before, google_after)):
+        for version, fn in (("改版前", before), ("改版後", after)):
+            latency_ms, peak_mb = measure(fn, audio, args.repeat)
+            print(f"{label:14} {version}  {latency_ms:12.2f}  {peak_mb:12.1f}")
+
+
+if __name__ == "__main__":
+    main()
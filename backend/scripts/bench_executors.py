@@ -0,0 +1,109 @@
+"""
+混合負載下的執行緒池吞吐量基準（user-028）
+模擬翻譯突發流量與 STT 同時進行：供應商呼叫以阻塞的 time.sleep 代表 HTTP 往返，
+比較「全部共用事件迴圈預設執行緒池」與「每個供應商各自的有上限執行緒池」（app.services.executors）
+下 STT 的延遲與整體吞吐量；若安裝了 deep_translator，另外比較每次建立與快取 GoogleTranslator 的成本
+
+用法（在 backend/ 執行）：
+    python scripts/bench_executors.py --translations 200 --stt 20
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.executors import get_executor, shutdown_executors  # noqa: E402
+
+
+def _blocking_call(duration_s: float):
+    time.sleep(duration_s)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct * (len(ordered) - 1))))]
+
+
+async def run_mix(args, translate_executor, stt_executor):
+    """同時送出翻譯突發與 STT 請求，回傳 (STT 延遲列表, 翻譯延遲列表, 總耗時)"""
+    loop = asyncio.get_running_loop()
+
+    async def timed(executor, duration_s):
+        start = time.perf_counter()
+        await loop.run_in_executor(executor, _blocking_call, duration_s)
+        return (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    translations = [timed(translate_executor, args.translate_s) for _ in range(args.translations)]
+    # STT 在突發開始後陸續抵達
+    async def stt_stream():
+        latencies = []
+        for _ in range(args.stt):
+            latencies.append(asyncio.ensure_future(timed(stt_executor, args.stt_s)))
+            await asyncio.sleep(args.stt_interval_s)
+        return await asyncio.gather(*latencies)
+
+    translate_ms, stt_ms = await asyncio.gather(asyncio.gather(*translations), stt_stream())
+    return stt_ms, translate_ms, time.perf_counter() - start
+
+
+def report(label, stt_ms, translate_ms, elapsed_s, total_calls):
+    print(f"{label}")
+    print(f"  STT  p50 {statistics.median(stt_ms):8.0f}ms  p95 {_percentile(stt_ms, 0.95):8.0f}ms  "
+          f"max {max(stt_ms):8.0f}ms")
+    print(f"  翻譯 p50 {statistics.median(translate_ms):8.0f}ms  p95 {_percentile(translate_ms, 0.95):8.0f}ms")
+    print(f"  吞吐量 {total_calls / elapsed_s:7.1f} 次/秒（總耗時 {elapsed_s:.2f} 秒）")
+
+
+def bench_translator_cache(iterations: int):
+    try:
+        from deep_translator import GoogleTranslator
+    except ImportError:
+        print("（未安裝 deep_translator，略過翻譯器實例快取的比較）")
+        return
+    start = time.perf_counter()
+    for _ in range(iterations):
+        GoogleTranslator(source="zh-TW", target="en")
+    per_call_us = (time.perf_counter() - start) / iterations * 1e6
+    cached = GoogleTranslator(source="zh-TW", target="en")
+    cache = {("zh-TW", "en"): cached}
+    start = time.perf_counter()
+    for _ in range(iterations):
+        cache[("zh-TW", "en")]
+    cached_us = (time.perf_counter() - start) / iterations * 1e6
+    print(f"GoogleTranslator 每次建立 {per_call_us:.1f}µs，快取取用 {cached_us:.2f}µs")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--translations", type=int, default=200, help="翻譯突發的請求數")
+    parser.add_argument("--stt", type=int, default=20, help="同時段內的 STT 請求數")
+    parser.add_argument("--translate-s", type=float, default=0.2, help="單次翻譯呼叫的阻塞秒數")
+    parser.add_argument("--stt-s", type=float, default=0.5, help="單次 STT 呼叫的阻塞秒數")
+    parser.add_argument("--stt-interval-s", type=float, default=0.05, help="STT 請求抵達間隔")
+    args = parser.parse_args()
+    total = args.translations + args.stt
+
+    # 改版前：所有供應商共用事件迴圈的預設執行緒池（大小同 Python 預設）
+    shared = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4))
+    stt_ms, translate_ms, elapsed = await run_mix(args, shared, shared)
+    shared.shutdown()
+    report(f"共用預設執行緒池 ({shared._max_workers} 個執行緒)", stt_ms, translate_ms, elapsed, total)
+
+    # 改版後：翻譯 (free) 與 STT (groq) 各自的執行緒池
+    stt_ms, translate_ms, elapsed = await run_mix(args, get_executor("free"), get_executor("groq"))
+    report(f"供應商專用執行緒池 (free {get_executor('free')._max_workers} / groq {get_executor('groq')._max_workers})",
+           stt_ms, translate_ms, elapsed, total)
+    shutdown_executors()
+
+    bench_translator_cache(200)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""
+離線本地翻譯的吞吐量與延遲基準（user-031）
+在沒有 GPU 的 Linux 主機上量測 local 供應商（CTranslate2 int8 + 常駐行程池）：
+預熱時間、逐句延遲，以及不同併發下有／無微批次的吞吐量
+需要安裝 ctranslate2、sentencepiece 並準備 LOCAL_MT_MODEL_DIR/<語言對> 模型
+
+用法（在 backend/ 執行）：
+    LOCAL_MT_MODEL_DIR=/models/mt python scripts/bench_local_translate.py --pair en-zh --requests 200
+"""
+
+import argparse
+import asyncio
+import os
+import platform
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.local_translate import local_translate_service  # noqa: E402
+from app.services.warm_pool import MicroBatcher  # noqa: E402
+
+SENTENCES = {
+    "en": [
+        "The meeting starts at nine.",
+        "Can you share the slides with the team?",
+        "We need to finish the budget review before Friday.",
+        "Thank you for joining the call today.",
+        "I think we should move this discussion to next week.",
+        "The new version fixes the login problem on mobile devices.",
+    ],
+    "zh": [
+        "會議九點開始。",
+        "可以把投影片分享給團隊嗎？",
+        "我們需要在星期五之前完成預算審查。",
+        "謝謝大家今天參加會議。",
+        "我覺得這個討論可以移到下週。",
+        "新版本修正了手機上的登入問題。",
+    ],
+}
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct * (len(ordered) - 1))))]
+
+
+async def run_load(requests: int, concurrency: int, source: str, target: str):
+    """以固定併發送出 requests 個翻譯請求，回傳 (延遲列表毫秒, 總秒數)"""
+    sentences = SENTENCES.get(source, SENTENCES["en"])
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(index: int):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await local_translate_service.translate_text(sentences[index % len(sentences)], target, source)
+            if result.get("error"):
+                raise RuntimeError(result["error"])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(index) for index in range(requests)])
+    return latencies, time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pair", default="en-zh", help="模型語言對（對應模型目錄名稱）")
+    parser.add_argument("--requests", type=int, default=200, help="每種設定送出的請求數")
+    parser.add_argument("--concurrency", default="1,8,32", help="以逗號分隔的併發數")
+    args = parser.parse_args()
+
+    if local_translate_service.use_mock:
+        print("❌ 本地翻譯模型不可用（見上方訊息），無法量測")
+        sys.exit(1)
+    source, target = args.pair.split("-", 1)
+
+    print(f"主機: {platform.processor() or platform.machine()}，{os.cpu_count()} 核心；"
+          f"工作行程 {local_translate_service.pool.workers}，"
+          f"每行程執行緒 {os.getenv('LOCAL_MT_THREADS', '2')}，{os.getenv('LOCAL_MT_COMPUTE_TYPE', 'int8')}")
+    start = time.perf_counter()
+    await local_translate_service.warm_up()
+    # 第一次翻譯會載入語言對模型
+    await local_translate_service.translate_text(SENTENCES.get(source, SENTENCES["en"])[0], target, source)
+    print(f"預熱與模型載入 {time.perf_counter() - start:.2f} 秒\n")
+
+    batched = local_translate_service.batcher
+    unbatched = MicroBatcher(local_translate_service._run_batch, max_batch=1, max_wait_ms=0)
+    print("設定              併發   p50(ms)  p95(ms)  句/秒")
+    for label, batcher in (("微批次", batched), ("逐句", unbatched)):
+        local_translate_service.batcher = batcher
+        for concurrency in [int(value) for value in args.concurrency.split(",")]:
+            latencies, elapsed = await run_load(args.requests, concurrency, source, target)
+            print(f"{label:14} {concurrency:6} {statistics.median(latencies):9.0f} "
+                  f"{_percentile(latencies, 0.95):8.0f} {args.requests / elapsed:7.1f}")
+    local_translate_service.batcher = batched
+    local_translate_service.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+"""
+離線本地 Whisper 的即時率 (RTF) 基準（user-039）
+依核心數設定工作行程（核心數 ÷ 每行程執行緒數），同時送出多段音頻，量測：
+- 單段 RTF：辨識延遲 ÷ 音頻長度（含排隊）
+- 整體 RTF：總耗時 ÷ 音頻總長度（< 1 代表處理速度快於即時）
+預設比較 4 核與 16 核主機的設定；核心數超過本機時結果只反映本機上限
+需要安裝 faster-whisper 並可取得 LOCAL_WHISPER_MODEL 模型
+
+用法（在 backend/ 執行）：
+    python scripts/bench_local_whisper.py --cores 4,16 --clips 32
+    python scripts/bench_local_whisper.py --dir recordings/ --threads 4
+"""
+
+import argparse
+import asyncio
+import os
+import platform
+import statistics
+import sys
+import time
+import wave
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np  # noqa: E402
+
+from app.services.audio_normalize import pcm_to_wav  # noqa: E402
+from app.services.local_whisper import LocalWhisperService  # noqa: E402
+from app.services.vad import SAMPLE_RATE  # noqa: E402
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct * (len(ordered) - 1))))]
+
+
+def synthetic_clips(count: int, seconds: float):
+    """以音節包絡調變的諧波模擬語音；辨識文字沒有意義，只用來量測速度"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    clips = []
+    for _ in range(count):
+        pitch = rng.uniform(100, 220)
+        voice = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+        samples = voice * (0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)) * 3000 + rng.normal(0, 30, len(t))
+        clips.append((pcm_to_wav(samples.astype(np.int16).tobytes()), seconds))
+    return clips
+
+
+def directory_clips(path: str, count: int):
+    """讀取目錄中的 WAV 檔，不足 count 段時循環使用"""
+    files = []
+    for name in sorted(os.listdir(path)):
+        if name.lower().endswith(".wav"):
+            with open(os.path.join(path, name), "rb") as file:
+                audio = file.read()
+            with wave.open(os.path.join(path, name)) as wav:
+                files.append((audio, wav.getnframes() / wav.getframerate()))
+    return [files[index % len(files)] for index in range(count)] if files else []
+
+
+async def run_config(cores: int, threads: int, clips, language: str):
+    workers = max(1, cores // threads)
+    os.environ["LOCAL_WHISPER_WORKERS"] = str(workers)
+    os.environ["LOCAL_WHISPER_THREADS"] = str(threads)
+    service = LocalWhisperService()
+
+    start = time.perf_counter()
+    await service.warm_up()
+    warm_s = time.perf_counter() - start
+
+    rtfs = []
+
+    async def one(audio: bytes, audio_s: float):
+        clip_start = time.perf_counter()
+        result = await service.transcribe_audio(audio, "audio/wav", language)
+        if result.get("error"):
+            raise RuntimeError(result["error"])
+        rtfs.append((time.perf_counter() - clip_start) / audio_s)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(audio, audio_s) for audio, audio_s in clips])
+    elapsed = time.perf_counter() - start
+    service.shutdown()
+
+    total_audio = sum(audio_s for _, audio_s in clips)
+    print(f"{cores:4} {workers:6} {threads:6} {warm_s:8.1f} {statistics.median(rtfs):9.2f} "
+          f"{_percentile(rtfs, 0.95):8.2f} {elapsed / total_audio:9.3f} {total_audio / elapsed:10.1f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cores", default="4,16", help="以逗號分隔的模擬核心數")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("LOCAL_WHISPER_THREADS", "4")),
+                        help="每個工作行程的 CPU 執行緒數")
+    parser.add_argument("--clips", type=int, default=32, help="同時送出的音頻段數")
+    parser.add_argument("--seconds", type=float, default=5.0, help="合成音頻每段秒數")
+    parser.add_argument("--dir", help="WAV 錄音目錄；未指定時使用合成音頻")
+    parser.add_argument("--language", default="en")
+    args = parser.parse_args()
+
+    probe = LocalWhisperService()
+    if probe.use_mock:
+        print("❌ 本地 Whisper 不可用（見上方訊息），無法量測")
+        sys.exit(1)
+
+    clips = directory_clips(args.dir, args.clips) if args.dir else synthetic_clips(args.clips, args.seconds)
+    if not clips:
+        print("❌ 沒有可處理的 WAV 音頻")
+        sys.exit(1)
+
+    print(f"主機: {platform.processor() or platform.machine()}，{os.cpu_count()} 核心；"
+          f"模型 {probe.model}，{os.getenv('LOCAL_WHISPER_COMPUTE_TYPE', 'int8')}，{len(clips)} 段音頻\n")
+    print("核心  工作行程 執行緒  預熱(s)  RTF p50  RTF p95  整體 RTF  音頻秒/秒")
+    for cores in [int(value) for value in args.cores.split(",")]:
+        if cores > (os.cpu_count() or 1):
+            print(f"⚠️ 本機只有 {os.cpu_count()} 核心，{cores} 核的結果會受限於本機")
+        await run_config(cores, args.threads, clips, args.language)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
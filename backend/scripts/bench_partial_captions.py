@@ -0,0 +1,127 @@
+"""
+即時字幕的資料表成長與 DB 負載基準（user-034）
+模擬一小時的會議：每位講者持續說話，每句話逐字成長並送出多次即時（interim）字幕，最後一次為定稿
+比較改版前（interim 與定稿都寫入 message 表、送完整字幕）與改版後（只寫定稿、即時字幕只送差異）的：
+message 列數、INSERT 次數、WebSocket 傳輸量；指定 --db 時另外在 Postgres 暫存表實際寫入，
+量測表加索引的成長量與寫入耗時（使用 POSTGRES_URL，不寫入正式資料表）
+
+用法（在 backend/ 執行）：
+    python scripts/bench_partial_captions.py --speakers 4 --minutes 60
+    POSTGRES_URL=postgres://... python scripts/bench_partial_captions.py --db
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.live_caption import caption_delta  # noqa: E402
+
+WORDS = ("我們 今天 要 討論 下一季 的 產品 規劃 以及 預算 分配 請 大家 先 看 這份 報告 "
+         "如果 有 問題 可以 隨時 提出 來 接下來 由 業務 部門 說明 目前 的 進度").split()
+
+
+def simulate_session(speakers: int, minutes: int, words_per_utterance: int, interim_every: int, seed: int):
+    """回傳 [(講者序號, [逐次成長的字幕...（最後一個是定稿）])]"""
+    rng = random.Random(seed)
+    # 平均每位講者每分鐘 4 句，約佔會議時間的一半
+    utterances = []
+    for _ in range(speakers * minutes * 4):
+        length = max(3, int(rng.gauss(words_per_utterance, words_per_utterance / 3)))
+        words = [rng.choice(WORDS) for _ in range(length)]
+        captions = ["".join(words[:end]) for end in range(interim_every, length, interim_every)]
+        utterances.append((rng.randrange(speakers), captions + ["".join(words)]))
+    return utterances
+
+
+def ws_bytes(utterances, listeners: int):
+    """改版前每次送完整字幕，改版後即時字幕只送差異（定稿兩者相同）"""
+    full = delta = 0
+    for _, captions in utterances:
+        previous = ""
+        for index, caption in enumerate(captions):
+            is_final = index == len(captions) - 1
+            full_frame = {"type": "personal.subtitle", "messageId": str(uuid.uuid4()), "text": caption}
+            full += len(json.dumps(full_frame, ensure_ascii=False).encode("utf-8"))
+            if is_final:
+                delta += len(json.dumps(full_frame, ensure_ascii=False).encode("utf-8"))
+            else:
+                keep, suffix = caption_delta(previous, caption)
+                frame = {"type": "caption.delta", "utteranceId": str(uuid.uuid4()), "keep": keep, "text": suffix}
+                delta += len(json.dumps(frame, ensure_ascii=False).encode("utf-8"))
+            previous = caption
+    return full * listeners, delta * listeners
+
+
+async def measure_db(utterances, speakers: int):
+    """在暫存表（含 message 的所有索引）實際寫入兩種模式，回傳 {模式: (列數, 成長位元組, 耗時秒)}"""
+    import asyncpg
+
+    conn = await asyncpg.connect(os.environ["POSTGRES_URL"], ssl="require")
+    room_id = str(uuid.uuid4())
+    speaker_ids = [str(uuid.uuid4()) for _ in range(speakers)]
+    results = {}
+    try:
+        for mode in ("before", "after"):
+            table = f"bench_message_{mode}"
+            await conn.execute(f"CREATE TEMP TABLE {table} (LIKE message INCLUDING ALL)")
+            initial = await conn.fetchval("SELECT pg_total_relation_size($1::regclass)", table)
+            rows = 0
+            start = time.perf_counter()
+            for speaker, captions in utterances:
+                pending = captions if mode == "before" else captions[-1:]
+                for index, caption in enumerate(pending):
+                    # 與 MessageRepo.create_message 相同的寫入
+                    await conn.execute(
+                        f"INSERT INTO {table} (id, room_id, speaker_id, source_lang, text, is_final) "
+                        "VALUES ($1, $2, $3, $4, $5, $6)",
+                        str(uuid.uuid4()), room_id, speaker_ids[speaker], "zh-TW", caption,
+                        index == len(pending) - 1
+                    )
+                    rows += 1
+            elapsed = time.perf_counter() - start
+            size = await conn.fetchval("SELECT pg_total_relation_size($1::regclass)", table)
+            results[mode] = (rows, size - initial, elapsed)
+    finally:
+        await conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--speakers", type=int, default=4)
+    parser.add_argument("--minutes", type=int, default=60)
+    parser.add_argument("--listeners", type=int, default=10, help="每則字幕送給的聽眾數")
+    parser.add_argument("--words", type=int, default=12, help="每句平均詞數")
+    parser.add_argument("--interim-every", type=int, default=2, help="每幾個詞送一次即時字幕")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", action="store_true", help="在 Postgres 暫存表實際寫入並量測成長量")
+    args = parser.parse_args()
+
+    utterances = simulate_session(args.speakers, args.minutes, args.words, args.interim_every, args.seed)
+    finals = len(utterances)
+    interims = sum(len(captions) - 1 for _, captions in utterances)
+    full_bytes, delta_bytes = ws_bytes(utterances, args.listeners)
+
+    print(f"{args.minutes} 分鐘、{args.speakers} 位講者：{finals} 句定稿、{interims} 次即時字幕")
+    print(f"message 寫入   改版前 {finals + interims:8} 列   改版後 {finals:8} 列 "
+          f"（減少 {interims / (finals + interims):.0%}）")
+    print(f"WebSocket 傳輸 改版前 {full_bytes / 1e6:8.1f} MB  改版後 {delta_bytes / 1e6:8.1f} MB "
+          f"（{args.listeners} 位聽眾，減少 {1 - delta_bytes / full_bytes:.0%}）")
+
+    if args.db:
+        results = asyncio.run(measure_db(utterances, args.speakers))
+        for mode, label in (("before", "改版前"), ("after", "改版後")):
+            rows, grown, elapsed = results[mode]
+            print(f"Postgres {label}: {rows} 列，表加索引成長 {grown / 1e6:.1f} MB，"
+                  f"寫入耗時 {elapsed:.1f} 秒（{rows / elapsed:.0f} INSERT/秒）")
+
+
+if __name__ == "__main__":
+    main()
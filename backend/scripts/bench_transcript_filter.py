@@ -0,0 +1,104 @@
+"""
+辨識幻覺過濾的準確度與延遲基準（user-042）
+以 tests/fixtures/transcript_filter_samples.jsonl 的標註語料報告：
+- 預設規則（上傳語音、串流、長音檔）與 patterns=False（分段確認端點）的精確率與召回率，並列出誤判的句子
+- 每次呼叫延遲：目前的合併正則與片語集合，對比改版前逐一以 re.match 比對清單
+
+用法（在 backend/ 執行）：
+    python scripts/bench_transcript_filter.py --repeat 200
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.services.transcript_filter import DEFAULT_CONFIG, TranscriptFilter  # noqa: E402
+
+SAMPLES_PATH = os.path.join(os.path.dirname(__file__), "..", "tests", "fixtures", "transcript_filter_samples.jsonl")
+
+
+def load_samples():
+    with open(SAMPLES_PATH, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def list_filter(text: str) -> str:
+    """改版前：每次呼叫逐一比對完整片語清單與模式清單"""
+    text = text.strip()
+    for phrase in DEFAULT_CONFIG["exact"]:
+        if text == phrase:
+            return ""
+    for pattern in DEFAULT_CONFIG["patterns"]:
+        if re.match(pattern, text, re.IGNORECASE):
+            return ""
+    return text
+
+
+def report(name: str, outputs, samples):
+    false_positives, false_negatives, true_positives = [], [], 0
+    for sample, output in zip(samples, outputs):
+        filtered = output == ""
+        hallucination = sample["label"] == "hallucination"
+        if filtered and hallucination:
+            true_positives += 1
+        elif filtered:
+            false_positives.append(sample["text"])
+        elif hallucination:
+            false_negatives.append(sample["text"])
+    precision = true_positives / max(1, true_positives + len(false_positives))
+    recall = true_positives / max(1, true_positives + len(false_negatives))
+    print(f"{name:24} 精確率 {precision:6.1%}  召回率 {recall:6.1%}")
+    for text in false_positives:
+        print(f"    誤刪: {text}")
+    for text in false_negatives:
+        print(f"    漏掉: {text}")
+
+
+def time_calls(fn, samples, repeat):
+    """回傳每次呼叫的延遲（微秒）"""
+    latencies = []
+    for _ in range(repeat):
+        for sample in samples:
+            start = time.perf_counter()
+            fn(sample)
+            latencies.append((time.perf_counter() - start) * 1e6)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="每個樣本重複計時的次數")
+    args = parser.parse_args()
+
+    samples = load_samples()
+    transcript_filter = TranscriptFilter()
+    default = lambda sample: transcript_filter.filter(sample["text"], sample.get("segments"))  # noqa: E731
+    staged = lambda sample: transcript_filter.filter(sample["text"], sample.get("segments"), patterns=False)  # noqa: E731
+    before = lambda sample: list_filter(sample["text"])  # noqa: E731
+
+    hallucinations = sum(1 for sample in samples if sample["label"] == "hallucination")
+    print(f"語料 {len(samples)} 句（幻覺 {hallucinations}、正常 {len(samples) - hallucinations}）\n")
+    # 過濾時的日誌不列入輸出
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = [(name, fn, [fn(sample) for sample in samples]) for name, fn in
+                   (("預設規則", default), ("patterns=False", staged), ("改版前（只比對文字）", before))]
+        timings = {name: time_calls(fn, samples, args.repeat) for name, fn, _ in results}
+    for name, _, outputs in results:
+        report(name, outputs, samples)
+
+    print("\n延遲（每次呼叫）")
+    for name, latencies in timings.items():
+        print(f"{name:24} p50 {statistics.median(latencies):7.1f}µs  "
+              f"p99 {sorted(latencies)[int(len(latencies) * 0.99)]:7.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
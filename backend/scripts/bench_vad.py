@@ -0,0 +1,138 @@
+"""
+VAD 語料報告（user-036）
+對一批錄音執行與線上相同的 prepare_audio（解碼 → VAD → 裁切 → 依供應商編碼），統計：
+- 省下的 STT 呼叫：整段沒有語音而直接拒絕的片段數
+- 省下的上傳位元組：原始音頻大小減去實際送往供應商的大小（被拒絕的片段整段省下）
+- 裁掉的靜音長度
+未指定 --dir 時產生合成語料（純背景噪音、前後帶靜音的語音、整段語音），不需要任何錄音檔
+非 WAV 檔需要 ffmpeg；沒有 ffmpeg 時一律輸出 WAV
+
+用法（在 backend/ 執行）：
+    python scripts/bench_vad.py                        # 合成語料
+    python scripts/bench_vad.py --dir recordings/ --provider groq
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np  # noqa: E402
+
+from app.services.audio_normalize import DEFAULT_PROVIDER_FORMATS, pcm_to_wav, prepare_audio  # noqa: E402
+from app.services.vad import SAMPLE_RATE, vad_service  # noqa: E402
+
+CONTENT_TYPES = {
+    ".wav": "audio/wav", ".webm": "audio/webm", ".ogg": "audio/ogg", ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4", ".flac": "audio/flac",
+}
+
+
+def _noise(rng: np.random.Generator, ms: int, dbfs: float) -> np.ndarray:
+    return rng.normal(0, 32768 * 10 ** (dbfs / 20), SAMPLE_RATE * ms // 1000)
+
+
+def _speech(rng: np.random.Generator, ms: int) -> np.ndarray:
+    """以音節包絡調變的諧波模擬語音（約 -20 dBFS）"""
+    t = np.arange(SAMPLE_RATE * ms // 1000) / SAMPLE_RATE
+    pitch = rng.uniform(100, 220)
+    voice = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(3, 5) * t)
+    return voice * envelope * 32768 * 0.1
+
+
+def synthetic_corpus(count: int, seed: int):
+    """回傳 [(名稱, 音頻位元組, content_type)]：約三成純噪音、五成前後帶靜音、兩成整段語音"""
+    rng = np.random.default_rng(seed)
+    chooser = random.Random(seed)
+    corpus = []
+    for index in range(count):
+        kind = chooser.choices(["silence", "padded", "speech"], weights=[3, 5, 2])[0]
+        if kind == "silence":
+            samples = _noise(rng, chooser.randint(1000, 5000), -60)
+        elif kind == "padded":
+            lead, speech, tail = chooser.randint(500, 3000), chooser.randint(800, 4000), chooser.randint(500, 3000)
+            samples = np.concatenate([_noise(rng, lead, -60), _speech(rng, speech) + _noise(rng, speech, -60),
+                                      _noise(rng, tail, -60)])
+        else:
+            duration = chooser.randint(1000, 5000)
+            samples = _speech(rng, duration) + _noise(rng, duration, -60)
+        pcm = np.clip(np.round(samples), -32768, 32767).astype(np.int16).tobytes()
+        corpus.append((f"{kind}-{index:03d}", pcm_to_wav(pcm), "audio/wav"))
+    return corpus
+
+
+def directory_corpus(path: str):
+    corpus = []
+    for name in sorted(os.listdir(path)):
+        content_type = CONTENT_TYPES.get(os.path.splitext(name)[1].lower())
+        if content_type is None:
+            continue
+        with open(os.path.join(path, name), "rb") as file:
+            corpus.append((name, file.read(), content_type))
+    return corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", help="錄音檔目錄（wav/webm/ogg/mp3/m4a/flac）；未指定時使用合成語料")
+    parser.add_argument("--count", type=int, default=100, help="合成語料片段數")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--provider", default="groq", choices=sorted(DEFAULT_PROVIDER_FORMATS),
+                        help="決定輸出格式的供應商（見 DEFAULT_PROVIDER_FORMATS）")
+    parser.add_argument("--verbose", action="store_true", help="列出每個片段的結果")
+    args = parser.parse_args()
+
+    corpus = directory_corpus(args.dir) if args.dir else synthetic_corpus(args.count, args.seed)
+    if not corpus:
+        print("❌ 沒有可處理的音頻")
+        return
+    ffmpeg = shutil.which("ffmpeg")
+    audio_format = DEFAULT_PROVIDER_FORMATS[args.provider]
+    opus_bitrate = os.getenv("AUDIO_OPUS_BITRATE", "24k")
+    print(f"語料 {len(corpus)} 段，供應商 {args.provider}（格式 {audio_format or '原樣'}），"
+          f"ffmpeg {'可用' if ffmpeg else '不可用'}，VAD 參數 {vad_service.params}")
+
+    bytes_in = bytes_out = rejected = undecoded = 0
+    total_ms = speech_ms = 0
+    elapsed = []
+    for name, audio, content_type in corpus:
+        start = time.perf_counter()
+        result = prepare_audio(audio, content_type, audio_format, vad_service.params, ffmpeg, opus_bitrate)
+        elapsed.append((time.perf_counter() - start) * 1000)
+        bytes_in += len(audio)
+        if not result["decoded"]:
+            # 線上流程會原樣放行
+            undecoded += 1
+            bytes_out += len(audio)
+            status = "無法解碼，原樣送出"
+        elif not result["has_speech"]:
+            rejected += 1
+            total_ms += result["total_ms"]
+            status = "無語音，不呼叫 STT"
+        else:
+            sent = len(result.get("audio", audio))
+            bytes_out += sent
+            total_ms += result["total_ms"]
+            speech_ms += result["speech_ms"]
+            status = f"保留 {result['speech_ms']}/{result['total_ms']} ms，{len(audio)} → {sent} bytes"
+        if args.verbose:
+            print(f"  {name}: {status}")
+
+    decoded = len(corpus) - undecoded
+    print(f"\n省下的 STT 呼叫: {rejected}/{len(corpus)} ({rejected / len(corpus):.1%})")
+    print(f"上傳位元組: {bytes_in:,} → {bytes_out:,}，省下 {bytes_in - bytes_out:,} ({1 - bytes_out / bytes_in:.1%})")
+    if decoded:
+        print(f"音頻長度: {total_ms / 1000:.1f}s，送往 STT {speech_ms / 1000:.1f}s，"
+              f"裁掉 {(total_ms - speech_ms) / 1000:.1f}s ({1 - speech_ms / max(1, total_ms):.1%})")
+    if undecoded:
+        print(f"⚠️ {undecoded} 段無法解碼（非 WAV 且沒有 ffmpeg）")
+    print(f"處理時間: 平均 {sum(elapsed) / len(elapsed):.1f} ms/段，最長 {max(elapsed):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""FairSemaphore 的性質測試：隨機房間、權重與突發量，以假時鐘模擬服務時間（不實際等待）"""
+
+import asyncio
+import heapq
+import math
+import random
+
+import pytest
+
+from app.services import fair_scheduler
+from app.services.fair_scheduler import FairSemaphore, set_current_room
+
+SEEDS = range(25)
+
+
+class FakeClock:
+    """只在所有任務都在等待時才推進時間；計時器依時間先後喚醒"""
+
+    def __init__(self):
+        self.now = 0.0
+        self._timers = []
+        self._counter = 0
+
+    async def sleep(self, delay: float):
+        future = asyncio.get_running_loop().create_future()
+        self._counter += 1
+        heapq.heappush(self._timers, (self.now + delay, self._counter, future))
+        await future
+
+    async def run(self, tasks):
+        while True:
+            # 讓已就緒的任務都跑到下一個等待點
+            for _ in range(50):
+                await asyncio.sleep(0)
+            if all(task.done() for task in tasks):
+                return
+            assert self._timers, "仍有任務在等待額度但沒有任何計時器：額度洩漏或等待者被遺忘"
+            self.now = self._timers[0][0]
+            while self._timers and self._timers[0][0] == self.now:
+                _, _, future = heapq.heappop(self._timers)
+                if not future.done():
+                    future.set_result(None)
+
+
+class Harness:
+    def __init__(self, capacity: int):
+        self.clock = FakeClock()
+        self.semaphore = FairSemaphore("test", capacity)
+        self.capacity = capacity
+        self.in_use = 0
+        self.max_in_use = 0
+        # 房間 -> [(第幾個請求, 等待時間)]
+        self.waits = {}
+
+    async def request(self, room_id: str, index: int, service_s: float, arrive_s: float = 0.0):
+        set_current_room(room_id)
+        if arrive_s:
+            await self.clock.sleep(arrive_s)
+        requested_at = self.clock.now
+        acquired = False
+        try:
+            await self.semaphore.acquire()
+            acquired = True
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            self.waits.setdefault(room_id, []).append((index, self.clock.now - requested_at))
+            await self.clock.sleep(service_s)
+        finally:
+            # 與 ProviderLimiter.slot() 相同：只有取得額度才歸還
+            if acquired:
+                self.in_use -= 1
+                self.semaphore.release()
+
+    def assert_no_leak(self):
+        assert self.semaphore.available == self.capacity
+        assert self.semaphore.waiting == 0
+        assert not self.semaphore.queues
+        assert not self.semaphore.active
+        assert not self.semaphore.deficit
+        assert self.in_use == 0
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_per_room_wait_is_bounded_by_weights(seed, monkeypatch):
+    """
+    所有房間同時湧入突發請求：房間 r 的第 k 個請求之前，其他房間每輪最多放行 w_j + 1 個，
+    房間 r 需要 ceil(k / w_r) 輪才累積足夠額度，因此等待時間與其他房間的突發量無關，只受權重限制
+    """
+    rng = random.Random(seed)
+    rooms = [f"room-{index}" for index in range(rng.randint(2, 8))]
+    weights = {room: rng.choice([0.5, 1.0, 1.0, 2.0, 3.0]) for room in rooms}
+    monkeypatch.setattr(fair_scheduler, "ROOM_WEIGHTS", weights)
+    bursts = {room: rng.choice([1, 2, 5, 20, 60]) for room in rooms}
+    capacity = rng.randint(1, 6)
+    max_service_s = 1.0
+
+    async def scenario():
+        harness = Harness(capacity)
+        tasks = []
+        for room in rooms:
+            for index in range(1, bursts[room] + 1):
+                service_s = rng.choice([0.25, 0.5, 0.75, 1.0])
+                tasks.append(asyncio.create_task(harness.request(room, index, service_s)))
+        await harness.clock.run(tasks)
+        for task in tasks:
+            task.result()
+        return harness
+
+    harness = asyncio.run(scenario())
+    harness.assert_no_leak()
+    assert harness.max_in_use <= capacity
+
+    for room in rooms:
+        others = sum(weights[other] + 1 for other in rooms if other != room)
+        for index, waited in harness.waits[room]:
+            rounds = math.ceil(index / weights[room]) + 1
+            # 前面最多有 capacity 個直接取得額度的請求，加上 rounds 輪中其他房間與本房間放行的請求
+            grants_before = capacity + index + rounds * others
+            bound = (grants_before // capacity + 1) * max_service_s
+            assert waited <= bound, (room, index, waited, bound, weights, bursts)
+
+
+def test_small_room_is_not_starved_by_large_burst():
+    async def scenario():
+        harness = Harness(2)
+        tasks = [asyncio.create_task(harness.request("big", index, 1.0)) for index in range(1, 201)]
+        tasks.append(asyncio.create_task(harness.request("small", 1, 1.0, arrive_s=0.5)))
+        await harness.clock.run(tasks)
+        return harness
+
+    harness = asyncio.run(scenario())
+    harness.assert_no_leak()
+    # 先到先得時要等 100 秒；公平輪流下下一個釋放的額度就輪到它
+    assert harness.waits["small"][0][1] <= 1.0
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_cancelled_waiters_do_not_leak_permits(seed, monkeypatch):
+    """隨機在等待中、剛被放行或持有額度時取消請求，結束後額度全數歸還且沒有殘留的等待者"""
+    rng = random.Random(seed)
+    rooms = [f"room-{index}" for index in range(rng.randint(2, 6))]
+    monkeypatch.setattr(fair_scheduler, "ROOM_WEIGHTS", {room: rng.choice([0.5, 1.0, 2.0]) for room in rooms})
+    capacity = rng.randint(1, 4)
+
+    async def scenario():
+        harness = Harness(capacity)
+        tasks = []
+        for room in rooms:
+            for index in range(1, rng.randint(1, 30) + 1):
+                # 整數時間讓取消與釋放常落在同一時刻，觸發「剛被放行就被取消」的情況
+                tasks.append(asyncio.create_task(
+                    harness.request(room, index, rng.randint(1, 3), arrive_s=rng.randint(0, 5))
+                ))
+
+        async def cancel_later(task, at_s):
+            await harness.clock.sleep(at_s)
+            task.cancel()
+
+        cancellers = [asyncio.create_task(cancel_later(task, rng.randint(0, 20)))
+                      for task in tasks if rng.random() < 0.4]
+        await harness.clock.run(tasks + cancellers)
+        for task in tasks:
+            if not task.cancelled():
+                task.result()
+        return harness
+
+    harness = asyncio.run(scenario())
+    harness.assert_no_leak()
+    assert harness.max_in_use <= capacity
+
+
+def test_waiter_cancelled_after_grant_returns_permit():
+    """額度已交給等待者、但它還沒恢復執行就被取消：額度要歸還，不能算在被取消的請求上"""
+    async def scenario():
+        semaphore = FairSemaphore("test", 1)
+        await semaphore.acquire()
+        set_current_room("room-b")
+        waiter = asyncio.create_task(semaphore.acquire())
+        await asyncio.sleep(0)
+        semaphore.release()
+        # 放行與取消在同一輪事件迴圈中發生
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return semaphore
+
+    semaphore = asyncio.run(scenario())
+    assert semaphore.available == 1
+    assert not semaphore.queues and not semaphore.active
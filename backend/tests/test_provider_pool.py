@@ -0,0 +1,114 @@
+"""翻譯供應商池：以注入延遲／失敗的 MockTranslationService 驗證對沖與失敗切換"""
+
+import asyncio
+import time
+
+from app.services.limiter import get_limiter
+from app.services.mock_translate import MockTranslationService
+from app.services.provider_pool import ProviderPool
+
+
+class RecordingMock(MockTranslationService):
+    """記錄每次呼叫的開始時間與是否被取消；結果以供應商名稱標記（與真實供應商相同）"""
+
+    def __init__(self, name: str, latency_s: float, failure_rate: float = 0.0):
+        super().__init__(latency_s=latency_s, failure_rate=failure_rate)
+        self.name = name
+        self.started_at = []
+        self.cancelled = 0
+
+    async def translate_text(self, text, target_lang, source_lang=None):
+        self.started_at.append(time.monotonic())
+        try:
+            result = await super().translate_text(text, target_lang, source_lang)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return {**result, "provider": self.name}
+
+
+def make_pool(*providers, hedge_ms: float = 50):
+    return ProviderPool(
+        [(mock.name, mock.translate_text) for mock in providers],
+        default_hedge_ms=hedge_ms, min_samples=5,
+    )
+
+
+def test_hedge_fires_after_delay_and_cancels_loser():
+    slow, fast = RecordingMock("hedge_slow", latency_s=1.0), RecordingMock("hedge_fast", latency_s=0.01)
+    pool = make_pool(slow, fast, hedge_ms=50)
+
+    async def run():
+        start = time.monotonic()
+        result = await pool.translate_text("hello", "ja", "en")
+        # 讓被取消的任務跑完 CancelledError 處理
+        await asyncio.sleep(0)
+        return start, time.monotonic() - start, result
+
+    start, elapsed, result = asyncio.run(run())
+    assert result["provider"] == "hedge_fast"
+    assert result.get("hedged") is True
+    assert "failover" not in result
+    # 對沖請求在期限之後才發出，且不等慢的供應商跑完
+    assert fast.started_at[0] - start >= 0.045
+    assert elapsed < 0.5
+    assert slow.cancelled == 1
+
+
+def test_no_hedge_when_primary_answers_in_time():
+    primary = RecordingMock("ontime_primary", latency_s=0.01)
+    secondary = RecordingMock("ontime_secondary", latency_s=0.01)
+    pool = make_pool(primary, secondary, hedge_ms=200)
+
+    result = asyncio.run(pool.translate_text("hello", "ja", "en"))
+    assert result["provider"] == "ontime_primary"
+    assert "hedged" not in result
+    assert secondary.started_at == []
+
+
+def test_failover_on_primary_error():
+    broken = RecordingMock("failover_broken", latency_s=0.01, failure_rate=1.0)
+    backup = RecordingMock("failover_backup", latency_s=0.01)
+    pool = make_pool(broken, backup, hedge_ms=500)
+
+    async def run():
+        start = time.monotonic()
+        result = await pool.translate_text("hello", "ja", "en")
+        return time.monotonic() - start, result
+
+    elapsed, result = asyncio.run(run())
+    assert result["provider"] == "failover_backup"
+    assert result.get("failover") is True
+    assert "hedged" not in result
+    # 失敗後立刻切換，不等對沖期限
+    assert elapsed < 0.3
+
+
+def test_open_breaker_is_skipped():
+    primary, backup = RecordingMock("breaker_primary", 0.01), RecordingMock("breaker_backup", 0.01)
+    pool = make_pool(primary, backup)
+    breaker = get_limiter("breaker_primary").breaker
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+
+    result = asyncio.run(pool.translate_text("hello", "ja", "en"))
+    assert result["provider"] == "breaker_backup"
+    assert primary.started_at == []
+
+
+def test_all_providers_failing_raises():
+    pool = make_pool(RecordingMock("allfail_a", 0.01, 1.0), RecordingMock("allfail_b", 0.01, 1.0))
+    try:
+        asyncio.run(pool.translate_text("hello", "ja", "en"))
+    except RuntimeError as e:
+        assert "Injected" in str(e)
+    else:
+        raise AssertionError("expected RuntimeError")
+
+
+def test_hedge_delay_follows_observed_percentile():
+    pool = make_pool(RecordingMock("pct_a", 0.01), RecordingMock("pct_b", 0.01), hedge_ms=1500)
+    assert pool.hedge_delay("pct_a", "en", "ja") == 1.5
+    for latency_ms in (100, 110, 120, 130, 400):
+        pool._stats("pct_a", "en", "ja").record(latency_ms, True)
+    assert pool.hedge_delay("pct_a", "en", "ja") == 0.4
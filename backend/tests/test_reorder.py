@@ -0,0 +1,145 @@
+"""ReorderBuffer：各目標語言依序號送出字幕、逾時跳過卡住的訊息、重複完成不影響狀態、關閉的房間釋放狀態"""
+
+import asyncio
+
+import pytest
+
+from app.ws.reorder import ReorderBuffer
+
+ROOM = "room-1"
+
+
+class Recorder:
+    def __init__(self):
+        self.frames = []
+
+    async def __call__(self, room_id, frame):
+        self.frames.append((room_id, frame))
+
+    def sequences(self, lang):
+        return [message["seq"] for _, (_, message) in self.frames if message.get("targetLang") == lang]
+
+
+def frame(sequence, lang):
+    return (None, {"type": "translation", "seq": sequence, "targetLang": lang})
+
+
+@pytest.fixture
+def make_buffer(monkeypatch):
+    def make(timeout_s=3.0):
+        monkeypatch.setenv("ORDERED_EMIT_ENABLED", "true")
+        monkeypatch.setenv("ORDERED_EMIT_TIMEOUT_S", str(timeout_s))
+        recorder = Recorder()
+        return ReorderBuffer(recorder), recorder
+    return make
+
+
+def test_out_of_order_completion_is_delivered_in_sequence_per_language(make_buffer):
+    async def scenario():
+        buffer, recorder = make_buffer()
+        sequences = [buffer.next_sequence(ROOM) for _ in range(3)]
+        assert sequences == [1, 2, 3]
+
+        # 短句（3、2）先翻完，長句（1）最後
+        await buffer.send(ROOM, 3, frame(3, "en"))
+        await buffer.send(ROOM, 2, frame(2, "en"))
+        await buffer.send(ROOM, 2, frame(2, "ja"))
+        assert recorder.frames == []
+
+        await buffer.send(ROOM, 1, frame(1, "en"))
+        await buffer.finish(ROOM, 1, "en")
+        await buffer.finish(ROOM, 2, "en")
+        assert recorder.sequences("en") == [1, 2, 3]
+        # 第 1 則的日文還沒送出，第 2 則的日文繼續等，不受英文進度影響
+        assert recorder.sequences("ja") == []
+
+        await buffer.send(ROOM, 1, frame(1, "ja"))
+        await buffer.finish(ROOM, 1)
+        assert recorder.sequences("ja") == [1, 2]
+
+        for sequence in (2, 3):
+            await buffer.finish(ROOM, sequence)
+        assert buffer.rooms[ROOM].idle
+
+    asyncio.run(scenario())
+
+
+def test_gap_timeout_releases_later_sequences(make_buffer):
+    async def scenario():
+        buffer, recorder = make_buffer(timeout_s=0.05)
+        for _ in range(3):
+            buffer.next_sequence(ROOM)
+
+        # 第 1 則卡住不完成，後面兩則已翻好
+        await buffer.send(ROOM, 2, frame(2, "en"))
+        await buffer.send(ROOM, 3, frame(3, "en"))
+        await buffer.finish(ROOM, 2, "en")
+        assert recorder.frames == []
+
+        await asyncio.sleep(0.2)
+        assert recorder.sequences("en") == [2, 3]
+
+        # 卡住的訊息之後才送出：不再排序，直接送出
+        await buffer.send(ROOM, 1, frame(1, "en"))
+        assert recorder.sequences("en") == [2, 3, 1]
+
+    asyncio.run(scenario())
+
+
+def test_duplicate_finish_does_not_re_add_sequence(make_buffer):
+    async def scenario():
+        buffer, recorder = make_buffer()
+        for _ in range(3):
+            buffer.next_sequence(ROOM)
+        order = buffer.rooms[ROOM]
+
+        await buffer.finish(ROOM, 2)
+        await buffer.finish(ROOM, 2)
+        assert order.head == 1 and order.finished == {2}
+
+        await buffer.finish(ROOM, 1)
+        assert order.head == 3 and order.finished == set()
+
+        # 已放行的序號再完成一次（整則或單一語言）都不會被加回去，也不會放行第 3 則
+        await buffer.finish(ROOM, 1)
+        await buffer.finish(ROOM, 2)
+        await buffer.finish(ROOM, 2, "en")
+        assert order.head == 3 and order.finished == set()
+        assert all(not lane.finished for lane in order.lanes.values())
+
+        buffer.next_sequence(ROOM)
+        await buffer.send(ROOM, 4, frame(4, "en"))
+        assert recorder.frames == []
+        await buffer.finish(ROOM, 3)
+        assert recorder.sequences("en") == [4]
+
+    asyncio.run(scenario())
+
+
+def test_closed_room_state_is_freed(make_buffer):
+    async def scenario():
+        buffer, recorder = make_buffer()
+
+        # 沒有翻譯中的訊息：立即清除
+        buffer.next_sequence(ROOM)
+        await buffer.finish(ROOM, 1)
+        buffer.forget_room(ROOM)
+        assert ROOM not in buffer.rooms
+
+        # 仍有訊息在翻譯：等最後一則完成才清除，期間序號不重新開始
+        assert buffer.next_sequence(ROOM) == 1
+        assert buffer.next_sequence(ROOM) == 2
+        await buffer.send(ROOM, 2, frame(2, "en"))
+        timer = buffer.rooms[ROOM].lanes["en"].timer
+        buffer.forget_room(ROOM)
+        assert ROOM in buffer.rooms
+
+        await buffer.finish(ROOM, 1)
+        assert ROOM in buffer.rooms
+        await buffer.finish(ROOM, 2)
+        assert ROOM not in buffer.rooms
+        assert recorder.sequences("en") == [2]
+        await asyncio.sleep(0)
+        assert timer.done()
+
+    asyncio.run(scenario())
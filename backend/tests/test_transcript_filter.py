@@ -0,0 +1,73 @@
+"""辨識幻覺過濾：以標註語料檢查精確率（正常語句不被丟掉）與召回率（幻覺被過濾）"""
+
+import json
+import os
+
+import pytest
+
+from app.services.transcript_filter import TranscriptFilter
+
+SAMPLES_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "transcript_filter_samples.jsonl")
+
+
+def load_samples():
+    with open(SAMPLES_PATH, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+SAMPLES = load_samples()
+
+
+@pytest.fixture
+def transcript_filter(monkeypatch):
+    # 不讀取部署環境的設定檔，只測預設規則
+    monkeypatch.delenv("TRANSCRIPT_FILTER_FILE", raising=False)
+    return TranscriptFilter()
+
+
+def evaluate(transcript_filter, patterns: bool):
+    """回傳 (精確率, 召回率, 誤刪的正常語句, 漏掉的幻覺)；「被過濾」視為判定為幻覺"""
+    false_positives, false_negatives = [], []
+    true_positives = 0
+    for sample in SAMPLES:
+        filtered = transcript_filter.filter(sample["text"], sample.get("segments"), patterns=patterns) == ""
+        hallucination = sample["label"] == "hallucination"
+        if filtered and hallucination:
+            true_positives += 1
+        elif filtered:
+            false_positives.append(sample["text"])
+        elif hallucination:
+            false_negatives.append(sample["text"])
+    precision = true_positives / max(1, true_positives + len(false_positives))
+    recall = true_positives / max(1, true_positives + len(false_negatives))
+    return precision, recall, false_positives, false_negatives
+
+
+def test_default_rules_precision_and_recall(transcript_filter):
+    precision, recall, false_positives, false_negatives = evaluate(transcript_filter, patterns=True)
+    assert precision >= 0.9, false_positives
+    assert recall >= 0.9, false_negatives
+
+
+def test_without_patterns_never_drops_speech(transcript_filter):
+    """分段確認端點（patterns=False）由使用者檢查文字，寧可漏掉幻覺也不能丟掉正常語句"""
+    precision, recall, false_positives, false_negatives = evaluate(transcript_filter, patterns=False)
+    assert precision == 1.0, false_positives
+    assert recall >= 0.6, false_negatives
+
+
+def test_segment_scores_apply_in_both_modes(transcript_filter):
+    for sample in SAMPLES:
+        if not sample.get("segments"):
+            continue
+        for patterns in (True, False):
+            kept = transcript_filter.filter(sample["text"], sample["segments"], patterns=patterns)
+            assert (kept == "") == (sample["label"] == "hallucination"), (sample["text"], patterns)
+
+
+def test_partial_segments_keep_speech(transcript_filter):
+    segments = [
+        {"text": "會議九點開始。", "no_speech_prob": 0.01, "avg_logprob": -0.2, "compression_ratio": 0.8},
+        {"text": "謝謝大家", "no_speech_prob": 0.8, "avg_logprob": -1.3, "compression_ratio": 0.6},
+    ]
+    assert transcript_filter.filter("會議九點開始。謝謝大家", segments) == "會議九點開始。"
@@ -15,8 +15,9 @@ const getAuthHeaders = () => ({
 export const speechApi = {
   /**
    * 上傳語音文件進行處理
+   * 重試同一段錄音時帶相同的 idempotencyKey，後端會直接回傳第一次的結果
    */
-  async upload(roomId: string, audioBlob: Blob, userLang?: string, speakerName?: string): Promise<any> {
+  async upload(roomId: string, audioBlob: Blob, userLang?: string, speakerName?: string, idempotencyKey?: string): Promise<any> {
     const formData = new FormData()
     formData.append('audio', audioBlob, 'audio.webm')
     formData.append('room_id', roomId)
@@ -30,7 +31,7 @@ export const speechApi = {
     const response = await fetch(`${API_BASE}/speech/upload`, {
       method: 'POST',
       body: formData,
-      headers: getAuthHeaders()
+      headers: idempotencyKey ? { ...getAuthHeaders(), 'Idempotency-Key': idempotencyKey } : getAuthHeaders()
     })
 
     if (!response.ok) {
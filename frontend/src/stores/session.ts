@@ -30,6 +30,8 @@ export interface Message {
   targetLang: string
   timestamp: string
   type: 'personal' | 'board'
+  partial?: boolean
+  replaces?: string
 }
 
 export const useSessionStore = defineStore('session', () => {
@@ -85,6 +87,14 @@ export const useSessionStore = defineStore('session', () => {
   }
   
   function addPersonalSubtitle(message: Message) {
+    // 即時字幕與最終稿就地取代同一句話
+    const index = personalSubtitles.value.findIndex(
+      item => item.id === message.id || (message.replaces !== undefined && item.id === message.replaces)
+    )
+    if (index !== -1) {
+      personalSubtitles.value[index] = message
+      return
+    }
     personalSubtitles.value.push(message)
     // 保持最近 50 條字幕
     if (personalSubtitles.value.length > 50) {
@@ -92,7 +102,30 @@ export const useSessionStore = defineStore('session', () => {
     }
   }
   
+  function applyCaptionDelta(delta: Message & { keep: number; append: string }) {
+    // 即時字幕只傳送變動的尾段：保留前 keep 個字元再接上 append
+    const existing = personalSubtitles.value.find(item => item.id === delta.id)
+    const base = existing ? existing.text.slice(0, delta.keep) : ''
+    addPersonalSubtitle({
+      id: delta.id,
+      speakerId: delta.speakerId,
+      speakerName: delta.speakerName,
+      text: base + delta.append,
+      sourceLang: delta.sourceLang,
+      targetLang: delta.targetLang,
+      timestamp: delta.timestamp,
+      type: 'personal',
+      partial: true
+    })
+  }
+  
   function addBoardMessage(message: Message) {
+    // 翻譯工作重跑時可能收到同一則訊息，就地取代
+    const index = boardMessages.value.findIndex(item => item.id === message.id)
+    if (index !== -1) {
+      boardMessages.value[index] = message
+      return
+    }
     boardMessages.value.push(message)
     // 保持最近 100 條訊息
     if (boardMessages.value.length > 100) {
@@ -157,6 +190,7 @@ export const useSessionStore = defineStore('session', () => {
     loadAuth,
     setRoom,
     addPersonalSubtitle,
+    applyCaptionDelta,
     addBoardMessage,
     clearMessages,
     setWebSocket,